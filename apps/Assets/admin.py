@@ -1,8 +1,9 @@
 from django.contrib import admin
+from django.db.models import Count
 from django.utils.html import format_html
 from unfold.admin import ModelAdmin, TabularInline, StackedInline
 from unfold.decorators import display
-from .models import Category, Product, TechnicalSpec, ProductImage, Maintenance
+from .models import Category, Product, TechnicalSpec, ProductImage, Maintenance, StockMovement
 
 # --- INLINES ---
 
@@ -41,6 +42,7 @@ class ProductImageInline(TabularInline):
 @admin.register(Category)
 class CategoryAdmin(ModelAdmin):
     list_display = ('name', 'parent', 'product_count', 'is_service_badge')
+    list_select_related = ('parent',)
     search_fields = ('name',)
     list_filter = ('is_service',)
     prepopulated_fields = {'slug': ('name',)}
@@ -49,9 +51,13 @@ class CategoryAdmin(ModelAdmin):
     def is_service_badge(self, obj):
         return obj.is_service
 
+    def get_queryset(self, request):
+        # Contagem na mesma query da listagem (não um COUNT por linha)
+        return super().get_queryset(request).annotate(num_products=Count('products'))
+
+    @display(description="Qtd. Produtos", ordering='num_products')
     def product_count(self, obj):
-        return obj.products.count()
-    product_count.short_description = "Qtd. Produtos"
+        return obj.num_products
 
 
 @admin.register(Product)
@@ -181,3 +187,19 @@ class MaintenanceAdmin(ModelAdmin):
             total, obj.labor_cost, obj.parts_cost
         )
     total_estimate_display.short_description = "Total Estimado"
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(ModelAdmin):
+    # Razão só de INSERT: consulta, sem editar nem apagar
+    list_display = ('created_at', 'product', 'kind', 'delta', 'reference')
+    list_filter = ('kind', 'created_at')
+    search_fields = ('product__name', 'product__sku', 'reference')
+    list_select_related = ('product',)
+    date_hierarchy = 'created_at'
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class AssetsConfig(AppConfig):
     name = 'Assets'
+
+    def ready(self):
+        import Assets.signals
@@ -0,0 +1,85 @@
+"""
+Cache dos fragmentos HTMX do catálogo.
+
+Cada combinação de filtros vira uma chave, prefixada pela "versão" atual do
+catálogo. Qualquer mudança em produto, ficha técnica, imagem, categoria ou
+estoque incrementa a versão, e todas as chaves antigas deixam de ser lidas
+(expiram sozinhas pelo timeout). Não há varredura nem delete em massa.
+
+Em produção com vários workers, CACHES precisa ser compartilhado
+(Redis/Memcached/DB); com LocMemCache cada processo tem sua própria versão.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import urlencode
+
+from .facets import CONDITIONS, PRICE_BUCKETS, WATTAGE_BUCKETS, bucket_keys, range_params, number_key
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+ORDERING_CHOICES = (
+    'price_asc', 'price_desc', 'newest', 'relevance',
+    'speed_desc', 'power_desc', 'voltage_desc', 'weight_asc',
+)
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(CATALOG_VERSION_KEY, version, None)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # Chave ainda não existe (cache reiniciado)
+        cache.set(CATALOG_VERSION_KEY, 2, None)
+        return 2
+
+
+def invalidate_catalog():
+    """Agenda o bump para depois do commit (senão um leitor pode cachear dado antigo com a versão nova)."""
+    transaction.on_commit(bump_catalog_version)
+
+
+def normalize_catalog_params(querydict):
+    """Reduz os parâmetros do catálogo à forma canônica (mesma busca = mesma chave)."""
+    product_type = 'PART' if querydict.get('product_type') == 'PART' else 'BIKE'
+    condition = querydict.get('condition', '')
+    ordering = querydict.get('ordering', '')
+    power = querydict.get('power', '')
+    price = querydict.get('price', '')
+    return {
+        'product_type': product_type,
+        'search': ' '.join(querydict.get('search', '').lower().split()),
+        'category': querydict.get('category', '').strip(),
+        'condition': condition if condition in dict(CONDITIONS) else '',
+        'voltage': number_key(querydict.get('voltage', '')),
+        'power': power if power in bucket_keys(WATTAGE_BUCKETS) else '',
+        'price': price if price in bucket_keys(PRICE_BUCKETS[product_type]) else '',
+        'ordering': ordering if ordering in ORDERING_CHOICES else '',
+        'cursor': querydict.get('cursor', ''),
+        # Faixas da ficha técnica (voltage_min, wattage_max...): números canônicos ou ''
+        **{name: number_key(querydict.get(name, '')) for name in range_params()},
+    }
+
+
+def catalog_cache_key(prefix, params):
+    digest = hashlib.md5(urlencode(sorted(params.items())).encode()).hexdigest()
+    return f'catalog:{prefix}:v{get_catalog_version()}:{digest}'
+
+
+def get_cached_fragment(params, render, prefix='fragment'):
+    """Devolve o HTML do fragmento, renderizando (e guardando) só em cache miss."""
+    key = catalog_cache_key(prefix, params)
+    html = cache.get(key)
+    if html is None:
+        html = render()
+        cache.set(key, html, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 600))
+    return html
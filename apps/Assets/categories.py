@@ -0,0 +1,154 @@
+"""
+Árvore de categorias: caminho materializado + cópia em memória por processo.
+
+Category.path guarda os ids da raiz até a categoria ('3/17/42/') e é
+mantido em Category.save; mover uma categoria reescreve o caminho da
+subárvore inteira num único UPDATE. "Categoria e descendentes" vira um
+intervalo no índice category_path_idx (subtree_q), sem recursão nem uma
+query por nível.
+
+A árvore completa (poucas dezenas de linhas) fica em memória em cada
+processo, marcada com o token CATEGORY_TREE_KEY do cache compartilhado.
+Breadcrumbs, a faceta de categoria da sidebar e o __str__ do admin leem
+daqui sem tocar no banco; qualquer save/delete de Category troca o token
+(depois do commit) e os processos recarregam na próxima leitura.
+"""
+import threading
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Concat, Substr
+
+CATEGORY_TREE_KEY = 'catalog:category-tree'
+
+
+def build_path(parent_path, pk):
+    return f'{parent_path}{pk}/'
+
+
+def subtree_q(path, field='path'):
+    """
+    Categoria + descendentes como intervalo: '3/17/' <= path < '3/170'.
+    ('0' é o caractere logo depois de '/', e todo id começa por um dígito.)
+    Ao contrário de LIKE '3/17/%', usa o índice em qualquer banco/collation.
+    """
+    return Q(**{f'{field}__gte': path, f'{field}__lt': path[:-1] + '0'})
+
+
+def move_subtree(old_path, new_path, depth_delta):
+    """Troca o prefixo old_path por new_path em toda a subárvore (um UPDATE)."""
+    from .models import Category
+
+    Category.objects.filter(subtree_q(old_path)).update(
+        path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+        depth=F('depth') + depth_delta,
+    )
+
+
+@dataclass
+class CategoryNode:
+    id: int
+    name: str
+    slug: str
+    parent_id: int | None
+    path: str
+    depth: int
+    icon_class: str
+    children: list = field(default_factory=list)
+
+    @property
+    def ancestor_ids(self):
+        return [int(pk) for pk in self.path.split('/') if pk]
+
+
+class CategoryTree:
+    def __init__(self, rows):
+        self.nodes = {row['id']: CategoryNode(**row) for row in rows}
+        self.by_slug = {node.slug: node for node in self.nodes.values()}
+        children = defaultdict(list)
+        for node in self.nodes.values():
+            children[node.parent_id if node.parent_id in self.nodes else None].append(node)
+        for siblings in children.values():
+            siblings.sort(key=lambda node: node.name.lower())
+        for node in self.nodes.values():
+            node.children = children.get(node.id, [])
+        self.roots = children.get(None, [])
+
+    def get(self, pk):
+        return self.nodes.get(pk)
+
+    def find(self, value):
+        """Pelo slug (URLs novas) ou pelo nome (links antigos ?category=Nome)."""
+        if value in self.by_slug:
+            return self.by_slug[value]
+        return next((node for node in self.nodes.values() if node.name == value), None)
+
+    def ancestors(self, pk):
+        """Da raiz até a própria categoria (breadcrumb)."""
+        node = self.nodes.get(pk)
+        if node is None:
+            return []
+        return [self.nodes[ancestor] for ancestor in node.ancestor_ids if ancestor in self.nodes]
+
+    def descendant_ids(self, pk):
+        """A categoria e todas as subcategorias."""
+        ids, stack = set(), [self.nodes[pk]] if pk in self.nodes else []
+        while stack:
+            node = stack.pop()
+            ids.add(node.id)
+            stack.extend(node.children)
+        return ids
+
+    def walk(self):
+        """Pré-ordem (pai antes dos filhos, irmãos por nome): ordem da sidebar."""
+        stack = list(reversed(self.roots))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def label(self, pk):
+        return ' > '.join(node.name for node in self.ancestors(pk))
+
+
+_lock = threading.Lock()
+_tree = None
+_tree_token = None
+
+
+def _current_token():
+    token = cache.get(CATEGORY_TREE_KEY)
+    if token is None:
+        cache.add(CATEGORY_TREE_KEY, uuid.uuid4().hex, None)
+        token = cache.get(CATEGORY_TREE_KEY)
+    return token
+
+
+def get_category_tree():
+    """Árvore do processo; recarrega (1 SELECT) só quando o token do cache mudou."""
+    global _tree, _tree_token
+    from .models import Category
+
+    token = _current_token()
+    tree = _tree
+    if tree is not None and _tree_token == token:
+        return tree
+    with _lock:
+        if _tree is None or _tree_token != token:
+            rows = Category.objects.values('id', 'name', 'slug', 'parent_id', 'path', 'depth', 'icon_class')
+            _tree, _tree_token = CategoryTree(rows), token
+        return _tree
+
+
+def invalidate_category_tree():
+    """
+    Descarta a cópia local na hora (o próprio processo já enxerga a mudança)
+    e troca o token depois do commit para os outros processos.
+    """
+    global _tree
+    _tree = None
+    transaction.on_commit(lambda: cache.set(CATEGORY_TREE_KEY, uuid.uuid4().hex, None))
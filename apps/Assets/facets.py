@@ -0,0 +1,227 @@
+"""
+Facetas do catálogo (contagens por categoria, condição, voltagem, faixa de
+potência e faixa de preço).
+
+Uma única consulta agrupa os produtos do filtro base (tipo + busca) por
+todas as facetas ao mesmo tempo; as contagens de cada faceta são somadas
+em Python aplicando os filtros ativos das *outras* facetas. Assim, com
+"Usado" marcado, a faceta de condição continua mostrando quantos "Novo"
+existem (contagem disjuntiva, como em lojas grandes), sem uma query por
+faceta.
+
+A faceta de categoria segue a árvore (Assets/categories.py): filtrar
+"Peças & Componentes" traz também Elétrica e Mecânica, e a contagem de
+cada categoria soma as das subcategorias.
+
+Além das facetas, filter_queryset aplica as faixas numéricas da ficha
+técnica (SPEC_RANGES: ?voltage_min=48, ?wattage_min=500&wattage_max=1000),
+atendidas pelos índices de TechnicalSpec. Essas faixas não são facetas:
+valem também para as contagens (filter_spec_ranges no queryset base).
+"""
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Case, CharField, Count, Exists, OuterRef, Q, Value, When
+
+from .categories import get_category_tree
+
+FACETS = ('category', 'condition', 'voltage', 'power', 'price')
+
+CONDITIONS = [
+    ('NEW', 'Novo'),
+    ('USED', 'Seminovo/Usado'),
+    ('OPEN_BOX', 'Open Box'),
+    ('REFURBISHED', 'Recondicionado'),
+]
+
+# (chave na URL, rótulo, mínimo inclusivo, máximo exclusivo)
+WATTAGE_BUCKETS = [
+    ('ate-350', 'Até 350W', None, 350),
+    ('350-750', '350W a 750W', 350, 750),
+    ('750-1500', '750W a 1500W', 750, 1500),
+    ('1500-mais', '1500W ou mais', 1500, None),
+]
+
+PRICE_BUCKETS = {
+    'BIKE': [
+        ('ate-5000', 'Até R$ 5.000', None, 5000),
+        ('5000-8000', 'R$ 5.000 a R$ 8.000', 5000, 8000),
+        ('8000-12000', 'R$ 8.000 a R$ 12.000', 8000, 12000),
+        ('12000-mais', 'R$ 12.000 ou mais', 12000, None),
+    ],
+    'PART': [
+        ('ate-200', 'Até R$ 200', None, 200),
+        ('200-500', 'R$ 200 a R$ 500', 200, 500),
+        ('500-1500', 'R$ 500 a R$ 1.500', 500, 1500),
+        ('1500-mais', 'R$ 1.500 ou mais', 1500, None),
+    ],
+}
+
+
+# Faixas numéricas da ficha técnica: parâmetro -> campo de TechnicalSpec (limites inclusivos)
+SPEC_RANGES = {
+    'voltage': 'voltage',
+    'amperage': 'amperage',
+    'wattage': 'wattage',
+    'speed': 'max_speed',
+    'weight': 'weight',
+}
+
+
+def range_params():
+    return [f'{name}_{bound}' for name in SPEC_RANGES for bound in ('min', 'max')]
+
+
+def number_key(value):
+    """Decimal('48.0') -> '48' (forma canônica usada na URL e na cache key); inválido -> ''."""
+    if value in (None, ''):
+        return ''
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        return ''
+    if not number.is_finite() or not 0 < number < 1_000_000:
+        return ''
+    return format(number.normalize(), 'f')
+
+
+def bucket_keys(buckets):
+    return [key for key, _, _, _ in buckets]
+
+
+def _range_q(field, low, high):
+    condition = Q()
+    if low is not None:
+        condition &= Q(**{f'{field}__gte': low})
+    if high is not None:
+        condition &= Q(**{f'{field}__lt': high})
+    return condition
+
+
+def _bucket_case(field, buckets):
+    return Case(
+        *[When(_range_q(field, low, high), then=Value(key)) for key, _, low, high in buckets],
+        default=Value(''),
+        output_field=CharField(),
+    )
+
+
+def selected_category_ids(params):
+    """Categoria escolhida + descendentes (conjunto vazio se não existir)."""
+    tree = get_category_tree()
+    node = tree.find(params['category'])
+    return tree.descendant_ids(node.id) if node else set()
+
+
+def _spec_ranges_q(params):
+    spec_q = Q()
+    for name, field in SPEC_RANGES.items():
+        if params[f'{name}_min']:
+            spec_q &= Q(**{f'{field}__gte': Decimal(params[f'{name}_min'])})
+        if params[f'{name}_max']:
+            spec_q &= Q(**{f'{field}__lte': Decimal(params[f'{name}_max'])})
+    return spec_q
+
+
+def _filter_specs(queryset, spec_q):
+    from .models import TechnicalSpec
+
+    if spec_q:
+        queryset = queryset.filter(Exists(TechnicalSpec.objects.filter(spec_q, product=OuterRef('pk'))))
+    return queryset
+
+
+def filter_spec_ranges(queryset, params):
+    """Só as faixas da ficha técnica (SPEC_RANGES): o queryset base das facetas."""
+    return _filter_specs(queryset, _spec_ranges_q(params))
+
+
+def filter_queryset(queryset, params):
+    """Aplica os filtros das facetas (o filtro base tipo/busca fica com a view)."""
+    if params['category']:
+        queryset = queryset.filter(category_id__in=selected_category_ids(params))
+    if params['condition']:
+        queryset = queryset.filter(condition=params['condition'])
+    if params['price']:
+        _, _, low, high = next(b for b in PRICE_BUCKETS[params['product_type']] if b[0] == params['price'])
+        queryset = queryset.filter(_range_q('selling_price', low, high))
+
+    # Filtros da ficha técnica num único EXISTS por product_id: o banco segue
+    # pelo índice do catálogo (na ordem da página) e confere cada produto em
+    # spec_product_ranges_idx, em vez de partir de um índice da spec e ordenar tudo
+    spec_q = _spec_ranges_q(params)
+    if params['voltage']:
+        spec_q &= Q(voltage=Decimal(params['voltage']))
+    if params['power']:
+        _, _, low, high = next(b for b in WATTAGE_BUCKETS if b[0] == params['power'])
+        spec_q &= _range_q('wattage', low, high)
+    return _filter_specs(queryset, spec_q)
+
+
+def compute_facets(queryset, params):
+    """
+    queryset: produtos do filtro base e das faixas da ficha técnica
+    (filter_spec_ranges), sem os filtros de faceta.
+    Retorna {faceta: [{'value', 'label', 'count', 'selected'}, ...]}.
+    """
+    price_buckets = PRICE_BUCKETS[params['product_type']]
+    rows = (
+        queryset
+        .annotate(power_bucket=_bucket_case('specs__wattage', WATTAGE_BUCKETS),
+                  price_bucket=_bucket_case('selling_price', price_buckets))
+        .values('category_id', 'condition', 'specs__voltage', 'power_bucket', 'price_bucket')
+        .annotate(total=Count('pk'))
+        .order_by()
+    )
+
+    tree = get_category_tree()
+    active = {facet: params[facet] for facet in FACETS if params[facet]}
+    if params['category']:
+        active['category'] = selected_category_ids(params)
+    counts = {facet: Counter() for facet in FACETS}
+    for row in rows:
+        values = {
+            'category': row['category_id'],
+            'condition': row['condition'],
+            'voltage': number_key(row['specs__voltage']),
+            'power': row['power_bucket'],
+            'price': row['price_bucket'],
+        }
+        for facet in FACETS:
+            # Cada faceta conta com os filtros ativos de todas as outras
+            if all(
+                values[other] in value if other == 'category' else values[other] == value
+                for other, value in active.items() if other != facet
+            ):
+                counts[facet][values[facet]] += row['total']
+
+    # Cada produto conta na sua categoria e em todas as ancestrais
+    category_counts = Counter()
+    for category_id, total in counts['category'].items():
+        for node in tree.ancestors(category_id):
+            category_counts[node.id] += total
+    selected = tree.find(params['category']) if params['category'] else None
+
+    def options(facet, choices):
+        return [
+            {'value': value, 'label': label, 'count': counts[facet][value], 'selected': params[facet] == value}
+            for value, label in choices
+            if counts[facet][value] or params[facet] == value
+        ]
+
+    # O valor selecionado aparece mesmo se zerou com os outros filtros
+    voltages = sorted({v for v in counts['voltage'] if v} | {params['voltage']} - {''}, key=Decimal)
+    return {
+        'category': [
+            {
+                'value': node.slug, 'label': '— ' * node.depth + node.name,
+                'count': category_counts[node.id], 'selected': node is selected,
+            }
+            for node in tree.walk()
+            if category_counts[node.id] or node is selected
+        ],
+        'condition': options('condition', CONDITIONS),
+        'voltage': options('voltage', [(v, f'{v}V') for v in voltages]),
+        'power': options('power', [(key, label) for key, label, _, _ in WATTAGE_BUCKETS]),
+        'price': options('price', [(key, label) for key, label, _, _ in price_buckets]),
+    }
@@ -0,0 +1,188 @@
+"""
+Derivados das fotos de produto (thumbnails JPEG + WebP) para os cards.
+
+Os arquivos gerados têm o hash do conteúdo original no caminho
+(products/derived/<hash>/<largura>.<ext>), então são imutáveis: a mesma
+foto sempre gera os mesmos nomes e uma foto nova nunca reaproveita URL
+antiga (pode ir para CDN com cache "para sempre").
+
+A geração roda fora do request: os signals agendam via on_commit num pool
+de threads (schedule_*), e o comando generate_image_derivatives refaz o
+catálogo inteiro em paralelo com processos.
+"""
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_WIDTHS = (320, 640, 1024)
+DERIVED_DIR = 'products/derived'
+FORMATS = {
+    # formato -> (extensão, opções do Pillow)
+    'jpeg': ('jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('webp', {'quality': 80, 'method': 6}),
+}
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:20]
+
+
+def build_derivatives(name, storage=None, force=False):
+    """
+    Gera (se ainda não existirem) os derivados de uma imagem do storage.
+    Retorna o dict guardado no model:
+        {'source': name, 'hash': ..., 'jpeg': {'320': path, ...}, 'webp': {...}}
+    """
+    storage = storage or default_storage
+    with storage.open(name, 'rb') as original:
+        data = original.read()
+    digest = content_hash(data)
+
+    image = Image.open(io.BytesIO(data))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    result = {'source': name, 'hash': digest, 'jpeg': {}, 'webp': {}}
+    # Nunca amplia: larguras maiores que o original ficam de fora
+    widths = [w for w in DERIVATIVE_WIDTHS if w < image.width] or [image.width]
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = None
+        for fmt, (ext, options) in FORMATS.items():
+            path = f'{DERIVED_DIR}/{digest}/{width}.{ext}'
+            if force or not storage.exists(path):
+                if resized is None:
+                    resized = image.resize((width, height), Image.LANCZOS)
+                frame = resized.convert('RGB') if fmt == 'jpeg' else resized
+                buffer = io.BytesIO()
+                frame.save(buffer, format=fmt.upper(), **options)
+                if storage.exists(path):
+                    storage.delete(path)
+                storage.save(path, ContentFile(buffer.getvalue()))
+            result[fmt][str(width)] = path
+    return result
+
+
+def srcset(derivatives, fmt, source, storage=None):
+    """Monta o atributo srcset ('url 320w, url 640w') se os derivados forem da imagem atual."""
+    if not derivatives or derivatives.get('source') != source:
+        return ''
+    storage = storage or default_storage
+    entries = sorted(derivatives.get(fmt, {}).items(), key=lambda item: int(item[0]))
+    return ', '.join(f'{storage.url(path)} {width}w' for width, path in entries)
+
+
+# --- GERAÇÃO FORA DO REQUEST ---
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_DERIVATIVE_THREADS', 2),
+            thread_name_prefix='image-derivatives',
+        )
+    return _executor
+
+
+def _run_in_background(func, *args):
+    def task():
+        close_old_connections()
+        try:
+            func(*args)
+        except Exception:
+            logger.exception("Falha ao gerar derivados de imagem (%s%s)", func.__name__, args)
+        finally:
+            close_old_connections()
+
+    if getattr(settings, 'IMAGE_DERIVATIVES_SYNC', False):
+        task()
+    else:
+        _get_executor().submit(task)
+
+
+def store_product_derivatives(product_id, name, derivatives):
+    """Grava os derivados da main_image (se ela ainda for a mesma) e atualiza a capa."""
+    from .models import Product
+
+    Product.objects.filter(pk=product_id, main_image=name).update(main_image_derivatives=derivatives)
+    product = Product.objects.filter(pk=product_id).first()
+    if product is not None:
+        product.refresh_cover_image()
+
+
+def store_image_derivatives(image_id, name, derivatives):
+    from .models import Product, ProductImage
+
+    ProductImage.objects.filter(pk=image_id, image=name).update(derivatives=derivatives)
+    product = Product.objects.filter(images__pk=image_id).first()
+    if product is not None:
+        product.refresh_cover_image()
+
+
+def generate_for_product(product_id, force=False):
+    from .cache import bump_catalog_version
+    from .models import Product
+
+    product = Product.objects.filter(pk=product_id).first()
+    if product is None or not product.main_image:
+        return
+    name = product.main_image.name
+    store_product_derivatives(product_id, name, build_derivatives(name, product.main_image.storage, force=force))
+    bump_catalog_version()
+
+
+def generate_for_product_image(image_id, force=False):
+    from .cache import bump_catalog_version
+    from .models import ProductImage
+
+    gallery_image = ProductImage.objects.filter(pk=image_id).first()
+    if gallery_image is None or not gallery_image.image:
+        return
+    name = gallery_image.image.name
+    store_image_derivatives(image_id, name, build_derivatives(name, gallery_image.image.storage, force=force))
+    bump_catalog_version()
+
+
+def build_job(job):
+    """
+    Executado nos processos do comando generate_image_derivatives.
+    Só gera arquivos (CPU + I/O); quem grava no banco é o processo pai.
+    """
+    kind, pk, name, force = job
+    try:
+        return kind, pk, name, build_derivatives(name, force=force), None
+    except Exception as exc:
+        return kind, pk, name, None, str(exc)
+
+
+def init_worker():
+    # Com start method "spawn" (macOS/Windows) o Django precisa ser inicializado no filho
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def schedule_product(product):
+    """Agenda os derivados da main_image se ela mudou desde a última geração."""
+    if product.main_image and product.main_image_derivatives.get('source') != product.main_image.name:
+        transaction.on_commit(lambda: _run_in_background(generate_for_product, product.pk))
+
+
+def schedule_product_image(gallery_image):
+    if gallery_image.image and gallery_image.derivatives.get('source') != gallery_image.image.name:
+        transaction.on_commit(lambda: _run_in_background(generate_for_product_image, gallery_image.pk))
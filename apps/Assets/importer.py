@@ -0,0 +1,368 @@
+"""
+Importação em massa do catálogo (planilha CSV ou JSONL de fornecedor).
+
+O arquivo é lido em streaming e gravado em lotes: cada lote faz um SELECT
+dos SKUs existentes, um bulk_create dos novos e um bulk_update só dos que
+mudaram (e o mesmo para TechnicalSpec) — algumas queries por lote em vez de
+várias por linha (get_or_create + o loop de slug do Product.save).
+
+Cada lote é uma transação curta, então o lock de escrita não fica preso
+durante a importação inteira. Depois do commit, o número de linhas já lidas
+pode ser gravado como checkpoint (comando import_catalog --resume). O upsert
+é por SKU: repetir um lote (queda entre o commit e o checkpoint) não duplica
+nada.
+
+Colunas (CSV) / chaves (JSONL):
+    - sku (obrigatório) e os campos de Product em PRODUCT_FIELDS
+      (name é obrigatório só para produto novo)
+    - os campos de TechnicalSpec em SPEC_FIELDS (no JSONL também aninhados
+      em "specs")
+    - category: slug, nome ou caminho "Pai > Filho" (criada se não existir)
+Célula vazia (ou null) não sobrescreve o valor atual. Números aceitam
+vírgula decimal ("5.890,00").
+
+bulk_create/bulk_update não passam pelo save() nem pelos signals: o slug é
+alocado aqui em lote, o índice de busca e os ajustes do razão de estoque
+são gravados por lote e a versão do catálogo deve subir uma vez no fim (o
+comando faz isso).
+"""
+import csv
+import json
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .categories import get_category_tree
+from .models import Category, Product, StockMovement, TechnicalSpec
+from .search import get_search_backend
+from .stock import record_movements
+
+PRODUCT_FIELDS = (
+    'name', 'product_type', 'condition', 'description', 'short_description',
+    'cost_price', 'selling_price', 'stock_quantity', 'min_stock_alert', 'is_active', 'is_featured',
+)
+SPEC_FIELDS = (
+    'voltage', 'amperage', 'wattage', 'weight', 'dimensions', 'material',
+    'max_speed', 'range_estimate', 'charging_time',
+)
+# Mudanças nestes campos reindexam a busca (ver search.document_for)
+SEARCH_FIELDS = {'name', 'short_description', 'description'}
+
+TRUE_VALUES = {'1', 'true', 't', 'sim', 's', 'yes', 'y', 'x'}
+FALSE_VALUES = {'0', 'false', 'f', 'nao', 'não', 'n', 'no', ''}
+MAX_REPORTED_ERRORS = 20
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_rows(path, fmt=None):
+    """Gera (nº da linha, dict) sem carregar o arquivo inteiro."""
+    fmt = fmt or ('csv' if str(path).lower().endswith('.csv') else 'jsonl')
+    with open(path, newline='', encoding='utf-8-sig') as source:
+        if fmt == 'csv':
+            reader = csv.DictReader(source)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line_number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield line_number, RowError(f"JSON inválido: {exc.msg}")
+
+
+def parse_decimal(value):
+    """'5.890,00' / '5890,5' / '5890.50' / 5890 -> Decimal."""
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value))
+    text = str(value).strip().replace('R$', '').replace(' ', '')
+    if ',' in text:
+        text = text.replace('.', '').replace(',', '.')
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        raise RowError(f"número inválido: {value!r}")
+
+
+def _coerce(model, name, value):
+    model_field = model._meta.get_field(name)
+    if model_field.choices:
+        value = str(value).strip().upper()
+        if value not in dict(model_field.choices):
+            raise RowError(f"{name}: valor inválido {value!r}")
+    internal_type = model_field.get_internal_type()
+    if internal_type == 'BooleanField':
+        text = str(value).strip().lower()
+        if text not in TRUE_VALUES | FALSE_VALUES:
+            raise RowError(f"{name}: booleano inválido {value!r}")
+        return text in TRUE_VALUES
+    if internal_type == 'DecimalField':
+        value = parse_decimal(value)
+    elif internal_type == 'IntegerField':
+        value = parse_decimal(value)
+        if value != value.to_integral_value():
+            raise RowError(f"{name}: inteiro inválido {value!r}")
+    try:
+        value = model_field.to_python(value)
+        if internal_type == 'DecimalField':
+            model_field.run_validators(value)  # max_digits/decimal_places
+    except ValidationError as exc:
+        raise RowError(f"{name}: {' '.join(exc.messages)}")
+    if isinstance(value, str) and model_field.max_length and len(value) > model_field.max_length:
+        raise RowError(f"{name}: mais de {model_field.max_length} caracteres")
+    return value
+
+
+def _present(value):
+    return value is not None and not (isinstance(value, str) and not value.strip())
+
+
+def slug_base(name, sku):
+    """Mesmo formato do Product.save (nome-sku), cortando o nome para caber nos 50 caracteres."""
+    max_length = Product._meta.get_field('slug').max_length
+    sku_part = slugify(sku)[:max_length]
+    name_part = slugify(name)[:max(0, max_length - len(sku_part) - 1)].strip('-')
+    return f'{name_part}-{sku_part}' if name_part else sku_part
+
+
+def _update_rows(model, objects, field_names):
+    """
+    UPDATE ... WHERE id = %s com executemany. O bulk_update do Django monta um
+    CASE WHEN por campo e linha, e resolver essas expressões custava mais que
+    o próprio banco (metade do tempo de um reajuste de preço em massa).
+    """
+    if not objects:
+        return
+    fields = [model._meta.get_field(name) for name in sorted(field_names)]
+    quote = connection.ops.quote_name
+    assignments = ', '.join(f'{quote(f.column)} = %s' for f in fields)
+    sql = f'UPDATE {quote(model._meta.db_table)} SET {assignments} WHERE {quote(model._meta.pk.column)} = %s'
+    params = [
+        [f.get_db_prep_save(getattr(obj, f.attname), connection) for f in fields] + [obj.pk]
+        for obj in objects
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+@dataclass
+class ImportStats:
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    failed: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+class CatalogImporter:
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.stats = ImportStats()
+        self.search = get_search_backend()
+        self._categories = {}
+
+    def import_rows(self, rows, on_batch=None):
+        """
+        rows: iterável de (nº da linha, dict).
+        on_batch(linhas_lidas) é chamado depois do commit de cada lote.
+        """
+        batch = {}
+        for line, raw in rows:
+            self.stats.rows += 1
+            try:
+                sku, product_values, spec_values = self.parse_row(raw)
+            except RowError as exc:
+                self.stats.add_error(line, str(exc))
+            else:
+                # SKU repetido no mesmo lote: a última linha vence (campo a campo)
+                entry = batch.setdefault(sku, {'line': line, 'product': {}, 'specs': {}})
+                entry['line'] = line
+                entry['product'].update(product_values)
+                entry['specs'].update(spec_values)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = {}
+                if on_batch:
+                    on_batch(self.stats.rows)
+        if batch:
+            self._flush(batch)
+        if on_batch:
+            on_batch(self.stats.rows)
+        return self.stats
+
+    def parse_row(self, raw):
+        if isinstance(raw, Exception):
+            raise raw
+        if not isinstance(raw, dict):
+            raise RowError("linha não é um objeto")
+        sku = str(raw.get('sku') or '').strip()
+        if not sku:
+            raise RowError("sku vazio")
+        if len(sku) > Product._meta.get_field('sku').max_length:
+            raise RowError("sku longo demais")
+
+        product_values = {
+            name: _coerce(Product, name, raw[name]) for name in PRODUCT_FIELDS if _present(raw.get(name))
+        }
+        if product_values.get('stock_quantity', 0) < 0:
+            raise RowError("stock_quantity negativo")
+        if 'name' in product_values:
+            product_values['name'] = product_values['name'].strip()
+        if _present(raw.get('category')):
+            product_values['category_id'] = self.category_id(str(raw['category']).strip())
+
+        nested = raw.get('specs') if isinstance(raw.get('specs'), dict) else {}
+        spec_values = {}
+        for name in SPEC_FIELDS:
+            value = nested.get(name, raw.get(name))
+            if _present(value):
+                spec_values[name] = _coerce(TechnicalSpec, name, value)
+        return sku, product_values, spec_values
+
+    def category_id(self, value):
+        """Slug, nome ou "Pai > Filho"; cria as que faltarem. Cacheado por valor."""
+        if value not in self._categories:
+            tree = get_category_tree()
+            node = tree.find(value)
+            if node is None:
+                node = next((n for n in tree.nodes.values() if tree.label(n.id) == value), None)
+            self._categories[value] = node.id if node else self._create_category_path(value)
+        return self._categories[value]
+
+    def _create_category_path(self, value):
+        names = [name.strip() for name in value.split('>') if name.strip()]
+        parent_id = None
+        for depth, name in enumerate(names):
+            tree = get_category_tree()
+            siblings = tree.get(parent_id).children if parent_id else tree.roots
+            node = next((n for n in siblings if n.name == name), None)
+            if node is not None:
+                parent_id = node.id
+                continue
+            # Subcategoria leva o caminho no slug ("Motores" pode existir em mais de um pai)
+            category = Category.objects.create(
+                name=name[:Category._meta.get_field('name').max_length],
+                slug=slugify(' '.join(names[:depth + 1]))[:Category._meta.get_field('slug').max_length],
+                parent_id=parent_id,
+            )
+            parent_id = category.pk
+        return parent_id
+
+    # --- GRAVAÇÃO EM LOTE ---
+
+    def _flush(self, batch):
+        with transaction.atomic():
+            existing = {p.sku: p for p in Product.objects.filter(sku__in=list(batch))}
+            now = timezone.now()
+            created, updated, reindex, changed_fields = [], [], [], set()
+            stock_deltas = {}
+
+            for sku, entry in batch.items():
+                values = entry['product']
+                product = existing.get(sku)
+                if product is None:
+                    if 'name' not in values:
+                        self.stats.add_error(entry['line'], f"{sku}: produto novo sem name")
+                        entry['skip'] = True
+                        continue
+                    product = Product(sku=sku, **values)
+                    product.cover_image, product.cover_derivatives = '', {}
+                    created.append(product)
+                else:
+                    changed = {name for name, value in values.items() if getattr(product, name) != value}
+                    if 'stock_quantity' in changed:
+                        stock_deltas[sku] = values['stock_quantity'] - product.stock_quantity
+                    if changed:
+                        for name in changed:
+                            setattr(product, name, values[name])
+                        product.updated_at = now
+                        changed_fields |= changed
+                        updated.append(product)
+                        if changed & SEARCH_FIELDS:
+                            reindex.append(product)
+                entry['instance'] = product
+
+            self._assign_slugs(created)
+            Product.objects.bulk_create(created)
+            _update_rows(Product, updated, changed_fields | {'updated_at'})
+            specs_changed = self._save_specs(batch, existing)
+            stock_deltas.update((p.sku, p.stock_quantity) for p in created)
+            record_movements(
+                {batch[sku]['instance'].pk: delta for sku, delta in stock_deltas.items()},
+                StockMovement.ADJUSTMENT, "Importação do catálogo",
+            )
+
+            self.search.index_products(created, replace=False)
+            self.search.index_products(reindex)
+
+        self.stats.created += len(created)
+        self.stats.updated += len(updated)
+        touched = {p.pk for p in created} | {p.pk for p in updated} | specs_changed
+        self.stats.unchanged += sum(
+            1 for entry in batch.values()
+            if not entry.get('skip') and entry['instance'].pk not in touched
+        )
+
+    def _save_specs(self, batch, existing):
+        """Upsert das fichas técnicas; retorna os ids de produto com ficha alterada."""
+        rows = {
+            entry['instance'].pk: entry['specs']
+            for entry in batch.values() if entry['specs'] and not entry.get('skip')
+        }
+        if not rows:
+            return set()
+        # Produto recém-criado não tem ficha: só consulta as dos que já existiam
+        existing_ids = {p.pk for p in existing.values()} & rows.keys()
+        current = {s.product_id: s for s in TechnicalSpec.objects.filter(product_id__in=existing_ids)} if existing_ids else {}
+
+        created, updated, changed_fields = [], [], set()
+        for product_id, values in rows.items():
+            spec = current.get(product_id)
+            if spec is None:
+                created.append(TechnicalSpec(product_id=product_id, **values))
+                continue
+            changed = {name for name, value in values.items() if getattr(spec, name) != value}
+            if changed:
+                for name in changed:
+                    setattr(spec, name, values[name])
+                changed_fields |= changed
+                updated.append(spec)
+
+        TechnicalSpec.objects.bulk_create(created)
+        _update_rows(TechnicalSpec, updated, changed_fields)
+        return {s.product_id for s in created} | {s.product_id for s in updated}
+
+    def _assign_slugs(self, products):
+        """Slugs únicos para o lote inteiro com um SELECT (mais um por colisão, raro)."""
+        if not products:
+            return
+        max_length = Product._meta.get_field('slug').max_length
+        bases = {id(p): slug_base(p.name, p.sku) for p in products}
+        taken = set(Product.objects.filter(slug__in=set(bases.values())).values_list('slug', flat=True))
+        for product in products:
+            base = bases[id(product)]
+            slug, counter = base, 1
+            if slug in taken:
+                taken.update(
+                    Product.objects.filter(slug__startswith=base[:max_length - 4]).values_list('slug', flat=True)
+                )
+            while slug in taken:
+                suffix = f'-{counter}'
+                slug = f'{base[:max_length - len(suffix)]}{suffix}'
+                counter += 1
+            taken.add(slug)
+            product.slug = slug
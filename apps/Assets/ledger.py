@@ -0,0 +1,79 @@
+"""
+Razão de estoque: lançamentos só de INSERT + snapshots periódicos por produto.
+
+Cada mudança de estoque grava um StockMovement (venda, estorno, ajuste
+manual/importação, peça usada em OS) na mesma transação que mexe no
+contador Product.stock_quantity — o contador continua sendo quem decide a
+venda (UPDATE condicional de stock.py + constraint >= 0); o razão é o
+histórico, e nunca recebe UPDATE, então não disputa lock com ninguém.
+
+Saldo de um produto em qualquer data:
+
+    último snapshot com taken_at <= data
+    + soma dos lançamentos com taken_at < created_at <= data
+
+O comando snapshot_stock grava os snapshots (cron), então a cauda somada é
+sempre curta e a consulta não depende do tamanho do histórico (duas
+queries, pelo índice (product, created_at)). O snapshot fica SNAPSHOT_LAG
+atrás do relógio: um lançamento de uma transação ainda aberta não pode
+aparecer depois com created_at anterior ao snapshot.
+"""
+from datetime import timedelta
+
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from .models import StockMovement, StockSnapshot
+
+SNAPSHOT_LAG = timedelta(minutes=5)
+
+
+def _last_snapshot(field, until):
+    return Subquery(
+        StockSnapshot.objects.filter(product=OuterRef('product'), taken_at__lte=until)
+        .order_by('-taken_at').values(field)[:1]
+    )
+
+
+def _tails(movements, until):
+    """Soma dos lançamentos até `until` depois do último snapshot de cada produto."""
+    return (
+        movements.filter(created_at__lte=until)
+        .annotate(since=_last_snapshot('taken_at', until))
+        .filter(Q(since__isnull=True) | Q(created_at__gt=F('since')))
+        .values('product').annotate(total=Sum('delta'), movements=Count('id'))
+        .values_list('product', 'total', 'movements')
+    )
+
+
+def _snapshot_quantities(product_ids, until):
+    return dict(
+        StockSnapshot.objects.filter(product_id__in=product_ids, taken_at=_last_snapshot('taken_at', until))
+        .values_list('product_id', 'quantity')
+    )
+
+
+def stock_at(product_ids, when=None):
+    """{product_id: saldo pelo razão} em `when` (padrão: agora)."""
+    when = when or timezone.now()
+    product_ids = list(product_ids)
+    balances = {pk: 0 for pk in product_ids}
+    balances.update(_snapshot_quantities(product_ids, when))
+    for product_id, total, _ in _tails(StockMovement.objects.filter(product_id__in=product_ids), when):
+        balances[product_id] += total
+    return balances
+
+
+def take_snapshots(cutoff=None, min_movements=1):
+    """
+    Grava um snapshot em `cutoff` para cada produto com pelo menos
+    `min_movements` lançamentos desde o anterior. Retorna quantos gravou.
+    """
+    cutoff = cutoff or timezone.now() - SNAPSHOT_LAG
+    tails = [row for row in _tails(StockMovement.objects.all(), cutoff) if row[2] >= min_movements]
+    previous = _snapshot_quantities([product_id for product_id, _, _ in tails], cutoff)
+    StockSnapshot.objects.bulk_create([
+        StockSnapshot(product_id=product_id, quantity=previous.get(product_id, 0) + total, taken_at=cutoff)
+        for product_id, total, _ in tails
+    ], ignore_conflicts=True)
+    return len(tails)
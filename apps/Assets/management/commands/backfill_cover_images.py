@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import JSONField, OuterRef, Subquery
+
+from Assets.cache import bump_catalog_version
+from Assets.models import Product, ProductImage
+
+
+class Command(BaseCommand):
+    help = 'Preenche/corrige Product.cover_image (capa desnormalizada) para todo o catálogo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        gallery = ProductImage.objects.filter(product=OuterRef('pk')).order_by('order', 'id')
+        queryset = (
+            Product.objects.only('id', 'main_image', 'main_image_derivatives', 'cover_image', 'cover_derivatives')
+            .annotate(
+                first_gallery_image=Subquery(gallery.values('image')[:1]),
+                first_gallery_derivatives=Subquery(gallery.values('derivatives')[:1], output_field=JSONField()),
+            )
+            .order_by('id')
+        )
+
+        changed = []
+        checked = updated = 0
+        for product in queryset.iterator(chunk_size=batch_size):
+            checked += 1
+            if product.main_image:
+                cover, derivatives = product.main_image.name, product.main_image_derivatives
+            else:
+                cover, derivatives = product.first_gallery_image or '', product.first_gallery_derivatives
+            derivatives = derivatives or {}
+            if cover != product.cover_image or derivatives != product.cover_derivatives:
+                product.cover_image = cover
+                product.cover_derivatives = derivatives
+                changed.append(product)
+            if len(changed) >= batch_size:
+                updated += self._flush(changed)
+                changed = []
+        updated += self._flush(changed)
+
+        if updated:
+            bump_catalog_version()  # bulk_update não dispara os signals
+        self.stdout.write(self.style.SUCCESS(f'✅ {checked} produtos verificados, {updated} capas atualizadas.'))
+
+    def _flush(self, products):
+        if not products:
+            return 0
+        with transaction.atomic():
+            Product.objects.bulk_update(products, ['cover_image', 'cover_derivatives'])
+        return len(products)
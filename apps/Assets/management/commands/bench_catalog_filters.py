@@ -0,0 +1,157 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from Assets.cache import normalize_catalog_params
+from Assets.models import Product, TechnicalSpec
+from Assets.views import Bikes
+from Common.benchmark import measure, rollback_after, summarize
+
+CATALOG_INDEXES = [index.name for index in TechnicalSpec._meta.indexes + Product._meta.indexes]
+
+# (descrição, parâmetros da URL do catálogo)
+SCENARIOS = [
+    ('48V ou mais', {'voltage_min': '48'}),
+    ('500 a 1000W', {'wattage_min': '500', 'wattage_max': '1000'}),
+    ('72V ou mais (seletivo)', {'voltage_min': '72'}),
+    ('até 18kg + 1000W+', {'weight_max': '18', 'wattage_min': '1000'}),
+    ('72V + 3000W + 75km/h (raro)', {'voltage_min': '72', 'wattage_min': '3000', 'speed_min': '75'}),
+    ('até 20kg', {'weight_max': '20'}),
+    ('60km/h ou mais', {'speed_min': '60'}),
+    ('ordem: destaques (padrão)', {}),
+    ('ordem: maior velocidade', {'ordering': 'speed_desc'}),
+    ('ordem: maior potência, 52V+', {'ordering': 'power_desc', 'voltage_min': '52'}),
+    ('ordem: mais leve, 48V+', {'ordering': 'weight_asc', 'voltage_min': '48'}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede os filtros/ordenações por ficha técnica do catálogo num catálogo sintético '
+        'e mostra o plano de cada consulta (transação desfeita no fim)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--compare', action='store_true',
+                            help='Roda de novo sem os índices do catálogo/ficha técnica para comparar')
+        parser.add_argument('--without', action='append', default=[], metavar='INDEX',
+                            help='Roda de novo sem este índice (pode repetir)')
+
+    def handle(self, *args, **options):
+        total = options['products']
+        with rollback_after():
+            start = time.perf_counter()
+            self._populate(total)
+            self._analyze()
+            self.stdout.write(
+                f'📦 {total} produtos com ficha técnica em {time.perf_counter() - start:.1f}s ({connection.vendor})'
+            )
+
+            scans = self._run('com índices', options['repeat'])
+            dropped = CATALOG_INDEXES if options['compare'] else options['without']
+            if dropped:
+                with connection.cursor() as cursor:
+                    for name in dropped:
+                        cursor.execute(f'DROP INDEX "{name}"')
+                self._analyze()
+                self._run(f"sem {', '.join(dropped)}", options['repeat'])
+
+        if scans:
+            self.stdout.write(self.style.ERROR(f'❌ {scans} consulta(s) com varredura completa de tabela.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ Nenhuma varredura completa de Product/TechnicalSpec.'))
+
+    def _run(self, title, repeat):
+        self.stdout.write(f'\n--- {title} ---')
+        self.stdout.write(f"{'cenário':<30} {'pág.1 p50':>10} {'pág.1 p99':>10} {'pág.5 p50':>10}  plano")
+        view = Bikes()
+        scans = 0
+        for label, query in SCENARIOS:
+            params = normalize_catalog_params(query)
+
+            def page(cursor=''):
+                return view.get_catalog_context({**params, 'cursor': cursor})['bikes']
+
+            # Cursor da 5ª página (navegação "Próxima" a partir da primeira)
+            cursor = ''
+            for _ in range(4):
+                cursor = page(cursor).next_cursor or ''
+
+            plan = []
+            for page_cursor in ('', cursor):
+                with CaptureQueriesContext(connection) as queries:
+                    page(page_cursor)
+                plan += self._plan(queries[-1]['sql'])
+            table_scans = [line for line in plan if self._is_table_scan(line)]
+            scans += len(table_scans)
+
+            first = summarize(measure(lambda: list(page()), repeat))
+            deep = summarize(measure(lambda: list(page(cursor)), repeat))
+            if table_scans:
+                access = 'VARREDURA'
+            elif any('TEMP B-TREE' in line or 'Sort' in line for line in plan):
+                access = 'índice + ordenação'
+            else:
+                access = 'índice'
+            self.stdout.write(
+                f"{label:<30} {first['p50']:>8.2f}ms {first['p99']:>8.2f}ms {deep['p50']:>8.2f}ms  {access}"
+            )
+            for line in dict.fromkeys(plan):
+                self.stdout.write(f"{'':<66}{line}")
+        return scans
+
+    def _plan(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                return [row[-1] for row in cursor.fetchall()]
+            cursor.execute(f'EXPLAIN {sql}')
+            return [row[0].strip() for row in cursor.fetchall()]
+
+    @staticmethod
+    def _is_table_scan(line):
+        tables = ('Assets_product', 'Assets_technicalspec')
+        if connection.vendor == 'sqlite':
+            # "SCAN tabela" sem "USING ... INDEX" = leitura da tabela inteira
+            return line.startswith('SCAN') and 'INDEX' not in line and any(t in line for t in tables)
+        return 'Seq Scan' in line and any(t in line for t in tables)
+
+    def _analyze(self):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+            else:
+                cursor.execute('ANALYZE "Assets_product", "Assets_technicalspec"')
+
+    def _populate(self, total, batch_size=5000):
+        rng = random.Random(8)
+        for offset in range(0, total, batch_size):
+            products = Product.objects.bulk_create([
+                Product(
+                    name=f'Bench {i}',
+                    slug=f'bench-filter-{i}',
+                    sku=f'BF-{i:06d}',
+                    # Catálogo misto: as peças também ocupam o índice do catálogo
+                    product_type='BIKE' if rng.random() < 0.6 else 'COMPONENT',
+                    is_featured=rng.random() < 0.02,
+                    selling_price=rng.randint(300, 20000),
+                )
+                for i in range(offset, min(total, offset + batch_size))
+            ])
+            TechnicalSpec.objects.bulk_create([
+                TechnicalSpec(
+                    product=product,
+                    voltage=rng.choices([36, 48, 52, 60, 72], weights=[30, 40, 15, 10, 5])[0],
+                    wattage=rng.choice([250, 350, 500, 750, 1000, 1500, 2000, 3000]),
+                    amperage=rng.randint(8, 30),
+                    max_speed=rng.randint(25, 80),
+                    weight=rng.randint(12, 40),
+                )
+                for product in products
+                if rng.random() < 0.9  # ~10% sem ficha técnica
+            ])
@@ -0,0 +1,112 @@
+import json
+import os
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from Assets.importer import CatalogImporter, read_rows
+from Assets.models import Product, TechnicalSpec
+from Common.benchmark import rollback_after
+
+CATEGORIES = ['Bicicletas', 'Kits de Conversão', 'Peças & Componentes > Elétrica', 'Peças & Componentes > Mecânica']
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a vazão (linhas/s) do import_catalog contra o seed linha a linha com get_or_create '
+        'num arquivo JSONL sintético (transação desfeita no fim)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20_000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--baseline-rows', type=int, default=1000,
+                            help='Linhas do método antigo (get_or_create por linha)')
+
+    def handle(self, *args, **options):
+        total = options['rows']
+        with tempfile.TemporaryDirectory() as tmp:
+            first = self._write(os.path.join(tmp, 'fornecedor.jsonl'), total, price_factor=1)
+            repriced = self._write(os.path.join(tmp, 'reajuste.jsonl'), total, price_factor=1.1)
+
+            with rollback_after():
+                self.stdout.write(f'📄 {total} linhas JSONL, lotes de {options["batch_size"]} ({connection.vendor})')
+                self.stdout.write(f"{'cenário':<34} {'linhas/s':>10} {'tempo':>8}")
+                insert = self._run('import_catalog: carga inicial', first, options['batch_size'])
+                self._run('import_catalog: reajuste de preço', repriced, options['batch_size'])
+                self._run('import_catalog: reenvio sem mudança', repriced, options['batch_size'])
+                baseline = self._baseline(first, options['baseline_rows'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Carga inicial {insert / baseline:.0f}x mais rápida que get_or_create por linha.'
+        ))
+        self.stdout.write(
+            'Obs.: tudo roda dentro de uma transação desfeita no fim, então o custo de commit por lote não entra.'
+        )
+
+    def _run(self, label, path, batch_size):
+        importer = CatalogImporter(batch_size=batch_size)
+        start = time.perf_counter()
+        stats = importer.import_rows(read_rows(path))
+        elapsed = time.perf_counter() - start
+        rate = stats.rows / elapsed
+        self.stdout.write(
+            f'{label:<34} {rate:>10,.0f} {elapsed:>7.2f}s  '
+            f'({stats.created} novos, {stats.updated} atualizados, {stats.unchanged} iguais, {stats.failed} erros)'
+        )
+        return rate
+
+    def _baseline(self, path, limit):
+        """O que popular_banco/mock_db faziam: get_or_create + save() por linha."""
+        from Assets.models import Category
+
+        categories = {}
+        start = time.perf_counter()
+        done = 0
+        for _, row in read_rows(path):
+            if done >= limit:
+                break
+            name = row['category'].split('>')[-1].strip()
+            if name not in categories:
+                categories[name], _ = Category.objects.get_or_create(name=name, defaults={'slug': f'base-{len(categories)}'})
+            product, _ = Product.objects.get_or_create(
+                sku=f"OLD-{row['sku']}",
+                defaults={
+                    'name': row['name'], 'category': categories[name], 'product_type': row['product_type'],
+                    'selling_price': row['selling_price'], 'stock_quantity': row['stock_quantity'],
+                },
+            )
+            spec, _ = TechnicalSpec.objects.get_or_create(product=product)
+            for field, value in row['specs'].items():
+                setattr(spec, field, value)
+            spec.save()
+            done += 1
+        elapsed = time.perf_counter() - start
+        rate = done / elapsed
+        self.stdout.write(f"{'get_or_create por linha (antigo)':<34} {rate:>10,.0f} {elapsed:>7.2f}s  ({done} linhas)")
+        return rate
+
+    def _write(self, path, total, price_factor):
+        rng = random.Random(10)
+        with open(path, 'w', encoding='utf-8') as output:
+            for i in range(total):
+                bike = rng.random() < 0.4
+                row = {
+                    'sku': f'FORN-{i:07d}',
+                    'name': f"{'E-Bike' if bike else 'Peça'} {rng.choice(['Thunder', 'Storm', 'Urban', 'Trail'])} {i}",
+                    'category': rng.choice(CATEGORIES[:2] if bike else CATEGORIES[2:]),
+                    'product_type': 'BIKE' if bike else 'COMPONENT',
+                    'selling_price': f'{rng.randint(100, 15000) * price_factor:.2f}',
+                    'stock_quantity': rng.randint(0, 40),
+                    'description': 'Produto importado do fornecedor.',
+                    'specs': {
+                        'voltage': rng.choice([36, 48, 52, 60]),
+                        'wattage': rng.choice([350, 500, 1000, 2000]),
+                        'weight': rng.randint(2, 30),
+                    },
+                }
+                output.write(json.dumps(row, ensure_ascii=False) + '\n')
+        return path
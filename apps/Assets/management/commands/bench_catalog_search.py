@@ -0,0 +1,79 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from Assets.models import Product
+from Assets.search import IContainsBackend, get_search_backend
+from Common.benchmark import measure, rollback_after, summarize
+
+WORDS = [
+    'bateria', 'baterias', 'motor', 'motores', 'controlador', 'controladora', 'display', 'pneu',
+    'freio', 'hidráulico', 'corrente', 'reforçada', 'lítio', 'alumínio', 'urbana', 'trilha',
+    'conversão', 'kit', 'cubo', 'traseiro', 'dianteiro', 'suspensão', 'carregador', 'acelerador',
+]
+
+SYLLABLES = ['ka', 'lo', 'mi', 'tra', 'ven', 'zor', 'pe', 'du', 'ri', 'sal', 'ton', 'bri']
+
+QUERIES = ['bateria', 'baterias litio', 'controladores', 'freio hidraulico', 'SKU-0012', 'kit conversao 1000']
+
+
+class Command(BaseCommand):
+    help = 'Compara a busca icontains com o índice full-text num catálogo sintético (transação desfeita no fim)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        fts = get_search_backend('fts')
+        total = options['products']
+
+        with rollback_after():
+            start = time.perf_counter()
+            self._populate(total)
+            indexed = fts.rebuild()
+            self.stdout.write(
+                f'📦 {total} produtos criados e {indexed} indexados em {time.perf_counter() - start:.1f}s '
+                f'({connection.vendor})'
+            )
+
+            base = Product.objects.filter(ownership='SHOP', is_active=True, product_type='COMPONENT')
+            self.stdout.write(f"{'consulta':<22} {'icontains p50':>14} {'fts p50':>10} {'fts p99':>10} {'speedup':>8}")
+            for query in QUERIES:
+                like = summarize(measure(lambda: self._page(IContainsBackend().filter(base, query)), options['repeat']))
+                ranked = summarize(measure(
+                    lambda: self._page(fts.filter(base, query).order_by('search_rank')), options['repeat']
+                ))
+                speedup = like['p50'] / ranked['p50'] if ranked['p50'] else 0
+                self.stdout.write(
+                    f"{query:<22} {like['p50']:>12.2f}ms {ranked['p50']:>8.2f}ms {ranked['p99']:>8.2f}ms {speedup:>7.1f}x"
+                )
+
+    def _page(self, queryset):
+        # Mesmo trabalho do catálogo: uma página de 9 cards + o total
+        list(queryset[:9])
+        queryset.count()
+
+    def _populate(self, total, batch_size=5000):
+        rng = random.Random(42)
+        # Vocabulário "de cauda longa": poucas palavras do domínio e milhares de
+        # termos raros, como num catálogo real de fornecedor
+        filler = list({''.join(rng.choices(SYLLABLES, k=3)) for _ in range(5000)})
+        batch = []
+        for i in range(total):
+            batch.append(Product(
+                name=' '.join(rng.sample(WORDS, 2) + rng.sample(filler, 1)).title(),
+                slug=f'bench-{i}',
+                sku=f'SKU-{i:06d}',
+                product_type='COMPONENT',
+                description=' '.join(rng.sample(WORDS, 2) + rng.choices(filler, k=25)),
+                selling_price=rng.randint(50, 5000),
+                stock_quantity=rng.randint(0, 50),
+            ))
+            if len(batch) >= batch_size:
+                Product.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Product.objects.bulk_create(batch)
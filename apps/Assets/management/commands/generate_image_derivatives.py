@@ -0,0 +1,58 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from Assets.cache import bump_catalog_version
+from Assets.images import build_job, init_worker, store_image_derivatives, store_product_derivatives
+from Assets.models import Product, ProductImage
+
+
+class Command(BaseCommand):
+    help = 'Gera thumbnails/WebP de todas as fotos do catálogo em paralelo (vários processos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+        parser.add_argument('--force', action='store_true', help='Regrava os arquivos mesmo se já existirem')
+        parser.add_argument('--missing-only', action='store_true', help='Só imagens sem derivados atualizados')
+
+    def handle(self, *args, **options):
+        force = options['force']
+        jobs = []
+        for pk, name, derivatives in Product.objects.exclude(main_image='').exclude(main_image__isnull=True) \
+                .values_list('pk', 'main_image', 'main_image_derivatives'):
+            if not options['missing_only'] or (derivatives or {}).get('source') != name:
+                jobs.append(('product', pk, name, force))
+        for pk, name, derivatives in ProductImage.objects.values_list('pk', 'image', 'derivatives'):
+            if not options['missing_only'] or (derivatives or {}).get('source') != name:
+                jobs.append(('image', pk, name, force))
+
+        if not jobs:
+            self.stdout.write(self.style.SUCCESS('Nada a fazer.'))
+            return
+
+        self.stdout.write(f"🖼️  {len(jobs)} imagens, {options['workers']} processos...")
+        start = time.perf_counter()
+        done = failed = 0
+
+        # Conexões abertas não podem ser herdadas pelos processos filhos
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as pool:
+            for kind, pk, name, derivatives, error in pool.map(build_job, jobs, chunksize=4):
+                if error:
+                    failed += 1
+                    self.stderr.write(f'   ❌ {name}: {error}')
+                    continue
+                if kind == 'product':
+                    store_product_derivatives(pk, name, derivatives)
+                else:
+                    store_image_derivatives(pk, name, derivatives)
+                done += 1
+
+        bump_catalog_version()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {done} imagens processadas em {elapsed:.1f}s ({done / elapsed:.1f}/s), {failed} falhas.'
+        ))
@@ -0,0 +1,75 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Assets.cache import bump_catalog_version
+from Assets.importer import CatalogImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa/atualiza o catálogo (Product + TechnicalSpec por SKU) a partir de CSV ou JSONL, '
+        'em lotes e com retomada (ver Assets/importer.py para as colunas)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Padrão: pela extensão do arquivo')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--resume', action='store_true',
+                            help='Continua do último lote gravado (arquivo de progresso)')
+        parser.add_argument('--state', help='Arquivo de progresso (padrão: <arquivo>.progress)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'Arquivo não encontrado: {path}')
+        state_path = options['state'] or f'{path}.progress'
+        fingerprint = {'source': os.path.abspath(path), 'size': os.path.getsize(path)}
+
+        skip = 0
+        if options['resume'] and os.path.exists(state_path):
+            with open(state_path) as state_file:
+                state = json.load(state_file)
+            if {key: state.get(key) for key in fingerprint} != fingerprint:
+                raise CommandError('O arquivo mudou desde a última execução; rode sem --resume.')
+            skip = state['rows']
+            self.stdout.write(f'↪️  Retomando depois da linha {skip}.')
+
+        importer = CatalogImporter(batch_size=options['batch_size'])
+        rows = read_rows(path, options['format'])
+        for _ in range(skip):
+            if next(rows, None) is None:
+                break
+
+        start = last_report = time.perf_counter()
+
+        def checkpoint(done):
+            nonlocal last_report
+            # Só depois do commit do lote: na retomada, nada gravado é pulado
+            with open(state_path, 'w') as state_file:
+                json.dump({**fingerprint, 'rows': skip + done}, state_file)
+            now = time.perf_counter()
+            if now - last_report >= 2:
+                last_report = now
+                self._report(importer.stats, skip + done, now - start)
+
+        stats = importer.import_rows(rows, on_batch=checkpoint)
+        elapsed = time.perf_counter() - start
+        bump_catalog_version()
+        os.remove(state_path)
+
+        for line, message in sorted(stats.errors):
+            self.stderr.write(f'   ❌ linha {line}: {message}')
+        if stats.failed > len(stats.errors):
+            self.stderr.write(f'   ... e mais {stats.failed - len(stats.errors)} erro(s).')
+        self._report(stats, skip + stats.rows, elapsed)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {stats.created} criados, {stats.updated} atualizados, {stats.unchanged} sem mudança, '
+            f'{stats.failed} com erro. (Relacionados: rode rebuild_related_products.)'
+        ))
+
+    def _report(self, stats, line, elapsed):
+        self.stdout.write(f'   {line} linhas — {stats.rows / max(elapsed, 1e-9):,.0f} linhas/s')
@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
-from django.utils.text import slugify
-from decimal import Decimal
-from Assets.models import Product, Category, TechnicalSpec
+from Assets.cache import bump_catalog_version
+from Assets.importer import CatalogImporter
+from Assets.models import Category
 
 class Command(BaseCommand):
     help = 'Popula o banco de dados com produtos e categorias iniciais'
@@ -127,41 +127,24 @@ class Command(BaseCommand):
             }
         ]
 
-        # 3. LOOP DE INSERÇÃO
-        for item in products_data:
-            product, created = Product.objects.get_or_create(
-                sku=item['sku'],
-                defaults={
-                    'name': item['name'],
-                    'category': item['category'],
-                    'product_type': item['type'],
-                    'selling_price': Decimal(item['price']),
-                    'stock_quantity': item['stock'],
-                    'description': item['desc'],
-                    'ownership': 'SHOP',
-                    'is_active': True,
-                    'condition': 'NEW'
-                }
-            )
-            
-            status = "Criado" if created else "Já existia"
-            self.stdout.write(f"🚴 {status}: {product.name}")
-
-            if 'specs' in item:
-                specs_data = item['specs']
-                spec, spec_created = TechnicalSpec.objects.get_or_create(product=product)
-                
-                updated = False
-                for field, value in specs_data.items():
-                    # Converte valores numéricos para Decimal se necessário para comparar
-                    if field in ['amperage', 'weight', 'voltage']:
-                         value = Decimal(str(value))
-
-                    if getattr(spec, field) != value:
-                        setattr(spec, field, value)
-                        updated = True
-                
-                if updated or spec_created:
-                    spec.save()
+        # 3. IMPORTAÇÃO EM LOTE (upsert por SKU, ver Assets/importer.py)
+        stats = CatalogImporter().import_rows(
+            (line, {
+                'sku': item['sku'],
+                'name': item['name'],
+                'category': item['category'].slug,
+                'product_type': item['type'],
+                'selling_price': item['price'],
+                'stock_quantity': item['stock'],
+                'description': item['desc'],
+                'condition': 'NEW',
+                'specs': item.get('specs', {}),
+            })
+            for line, item in enumerate(products_data, start=1)
+        )
+        bump_catalog_version()
+        self.stdout.write(f"🚴 {stats.created} criados, {stats.updated} atualizados, {stats.unchanged} sem mudança.")
+        for line, message in stats.errors:
+            self.stdout.write(f"   ❌ item {line}: {message}")
 
         self.stdout.write(self.style.SUCCESS('\n🎉 Banco populado com sucesso!'))
\ No newline at end of file
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from Assets.related import rebuild_related_index
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o índice de produtos relacionados (similaridade + co-compras). Rodar via cron.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product', type=int, action='append', dest='products',
+                            help='Recalcula só este produto (pode repetir)')
+
+    def handle(self, *args, **options):
+        total = rebuild_related_index(options['products'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} relações gravadas.'))
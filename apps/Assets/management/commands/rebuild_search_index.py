@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Assets.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice full-text do catálogo (após importações em massa, restore de backup, etc.)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        if not backend.ranked:
+            self.stdout.write(self.style.WARNING(f"Backend '{backend.name}' não usa índice. Nada a fazer."))
+            return
+
+        with transaction.atomic():
+            total = backend.rebuild(batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} produtos indexados.'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from Assets.ledger import stock_at, take_snapshots
+from Assets.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Grava snapshots do razão de estoque (rodar via cron) e, com --check, confere o razão contra o estoque atual'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-movements', type=int, default=1,
+                            help='Só faz snapshot de produtos com pelo menos N lançamentos desde o último')
+        parser.add_argument('--check', action='store_true',
+                            help='Lista produtos em que razão e Product.stock_quantity divergem')
+
+    def handle(self, *args, **options):
+        total = take_snapshots(min_movements=options['min_movements'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} snapshot(s) gravado(s).'))
+        if options['check']:
+            self._check()
+
+    def _check(self, chunk=1000):
+        divergent = 0
+        rows = list(Product.objects.order_by('pk').values_list('pk', 'name', 'stock_quantity'))
+        for start in range(0, len(rows), chunk):
+            part = rows[start:start + chunk]
+            balances = stock_at(pk for pk, _, _ in part)
+            for pk, name, stock in part:
+                if balances[pk] != stock:
+                    divergent += 1
+                    self.stderr.write(f'   ⚠️  {name} (#{pk}): razão {balances[pk]}, estoque {stock}')
+        self.stdout.write(f'🔎 {len(rows)} produto(s) conferido(s), {divergent} divergente(s).')
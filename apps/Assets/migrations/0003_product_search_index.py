@@ -0,0 +1,50 @@
+# Índice full-text do catálogo (ver Assets/search.py).
+# A estrutura depende do banco: FTS5 no SQLite, tsvector + GIN no PostgreSQL.
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS "Assets_product_fts" '
+            "USING fts5(name, sku, body, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE TABLE IF NOT EXISTS "Assets_product_search" ('
+            ' product_id bigint PRIMARY KEY REFERENCES "Assets_product" (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,'
+            ' document tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS "Assets_product_search_gin" '
+            'ON "Assets_product_search" USING GIN (document)'
+        )
+    else:
+        return
+
+    # Popula com o que já existe no banco
+    from Assets.search import _FTS_BACKENDS
+    Product = apps.get_model('Assets', 'Product')
+    backend = _FTS_BACKENDS[vendor]()
+    backend.index_products(Product.objects.all(), replace=False)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS "Assets_product_fts"')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE IF EXISTS "Assets_product_search"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Assets', '0002_appointment'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Assets', '0003_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['ownership', 'is_active', 'product_type', '-is_featured', '-created_at', '-id'], name='product_catalog_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['ownership', 'is_active', 'product_type', '-created_at', '-id'], name='product_catalog_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['ownership', 'is_active', 'product_type', 'selling_price', 'id'], name='product_catalog_price_idx'),
+        ),
+    ]
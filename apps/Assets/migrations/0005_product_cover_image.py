@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Assets', '0004_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='cover_image',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Capa (resolvida)'),
+        ),
+    ]
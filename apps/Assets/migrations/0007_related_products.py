@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Assets', '0006_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0)),
+                ('co_purchases', models.PositiveIntegerField(default=0, verbose_name='Compras em conjunto')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='Assets.product')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='Assets.product')),
+            ],
+            options={
+                'verbose_name': 'Produto Relacionado',
+                'verbose_name_plural': 'Produtos Relacionados',
+                'indexes': [models.Index(fields=['product', '-score'], name='related_product_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'related'), name='related_product_unique')],
+            },
+        ),
+    ]
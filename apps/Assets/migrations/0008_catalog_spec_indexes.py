@@ -0,0 +1,57 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Assets', '0007_related_products'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_catalog_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_catalog_newest_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_catalog_price_idx',
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['ownership', 'product_type', '-is_featured', '-created_at', '-id'], name='product_catalog_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['ownership', 'product_type', '-created_at', '-id'], name='product_catalog_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['ownership', 'product_type', 'selling_price', 'id'], name='product_catalog_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='technicalspec',
+            index=models.Index(fields=['product', 'voltage', 'wattage', 'max_speed', 'amperage', 'weight'], name='spec_product_ranges_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='technicalspec',
+            index=models.Index(fields=['max_speed'], name='spec_speed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='technicalspec',
+            index=models.Index(fields=['wattage'], name='spec_wattage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='technicalspec',
+            index=models.Index(fields=['voltage'], name='spec_voltage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='technicalspec',
+            index=models.Index(fields=['weight'], name='spec_weight_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:56
+
+from django.db import migrations, models
+
+
+def fill_category_paths(apps, schema_editor):
+    # Caminho materializado das categorias existentes (pais antes dos filhos)
+    Category = apps.get_model('Assets', 'Category')
+    categories = {category.pk: category for category in Category.objects.all()}
+
+    def resolve(category, seen=()):
+        if category.path:
+            return category
+        parent = categories.get(category.parent_id)
+        if parent is None or parent.pk in seen:
+            category.path, category.depth = f'{category.pk}/', 0
+        else:
+            resolve(parent, seen + (category.pk,))
+            category.path, category.depth = f'{parent.path}{category.pk}/', parent.depth + 1
+        return category
+
+    Category.objects.bulk_update([resolve(c) for c in categories.values()], ['path', 'depth'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Assets', '0008_catalog_spec_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='category_path_idx'),
+        ),
+        migrations.RunPython(fill_category_paths, migrations.RunPython.noop),
+    ]
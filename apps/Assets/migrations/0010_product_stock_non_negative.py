@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:04
+
+from django.db import migrations, models
+
+
+def clamp_negative_stock(apps, schema_editor):
+    # Estoque negativo antigo (baixa manual, bug) viraria erro ao criar a constraint
+    Product = apps.get_model('Assets', 'Product')
+    Product.objects.filter(stock_quantity__lt=0).update(stock_quantity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Assets', '0009_category_tree'),
+    ]
+
+    operations = [
+        migrations.RunPython(clamp_negative_stock, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.CheckConstraint(condition=models.Q(('stock_quantity__gte', 0)), name='product_stock_non_negative'),
+        ),
+    ]
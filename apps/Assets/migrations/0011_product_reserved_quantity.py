@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Assets', '0010_product_stock_non_negative'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='reserved_quantity',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Reservado'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def open_ledger(apps, schema_editor):
+    # Saldo de abertura: o razão começa batendo com o estoque atual
+    Product = apps.get_model('Assets', 'Product')
+    StockMovement = apps.get_model('Assets', 'StockMovement')
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=pk, kind='ADJUSTMENT', delta=stock, reference="Saldo inicial")
+        for pk, stock in Product.objects.exclude(stock_quantity=0).values_list('pk', 'stock_quantity').iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Assets', '0011_product_reserved_quantity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('SALE', 'Venda'), ('RETURN', 'Cancelamento/Estorno'), ('ADJUSTMENT', 'Ajuste Manual'), ('MAINTENANCE', 'Uso em Manutenção')], max_length=12, verbose_name='Tipo')),
+                ('delta', models.IntegerField(help_text='Positivo entra, negativo sai', verbose_name='Quantidade')),
+                ('reference', models.CharField(blank=True, help_text='Ex: Pedido #12', max_length=100, verbose_name='Referência')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('maintenance', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='Assets.maintenance')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='Assets.product')),
+            ],
+            options={
+                'verbose_name': 'Movimentação de Estoque',
+                'verbose_name_plural': 'Movimentações de Estoque',
+                'indexes': [models.Index(fields=['product', 'created_at'], name='stock_movement_product_idx'), models.Index(fields=['created_at'], name='stock_movement_created_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('taken_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='Assets.product')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Estoque',
+                'verbose_name_plural': 'Snapshots de Estoque',
+                'constraints': [models.UniqueConstraint(fields=('product', 'taken_at'), name='stock_snapshot_unique')],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
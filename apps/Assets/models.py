@@ -1,6 +1,10 @@
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
 from Common.models import TimeStampedModel
+from .categories import build_path, get_category_tree, move_subtree, subtree_q
+from .images import srcset
 
 # --- 1. CATEGORIAS HIERÁRQUICAS ---
 class Category(TimeStampedModel):
@@ -11,16 +15,52 @@ class Category(TimeStampedModel):
     icon_class = models.CharField(max_length=50, blank=True, help_text="Classe do ícone (ex: fas fa-bolt)")
     is_service = models.BooleanField(default=False, help_text="Categoria exclusiva para mão de obra?")
 
+    # Caminho materializado ('3/17/42/', ids da raiz até aqui) — ver Assets/categories.py
+    path = models.CharField(max_length=255, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
     class Meta:
         verbose_name = "Categoria"
         verbose_name_plural = "Categorias"
+        indexes = [
+            models.Index(fields=['path'], name='category_path_idx'),
+        ]
+
+    def clean(self):
+        if self.pk and self.parent_id and self.parent.path.startswith(self.path or '-'):
+            raise ValidationError({'parent': "A categoria não pode ficar dentro de si mesma ou de uma subcategoria."})
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+
+        parent = self.parent if self.parent_id else None
+        if parent is not None and self.pk and parent.path.startswith(self.path or '-'):
+            raise ValueError("A categoria não pode ficar dentro de si mesma ou de uma subcategoria.")
+        old_path, old_depth = self.path, self.depth
+        self.depth = parent.depth + 1 if parent else 0
+        if self.pk:
+            self.path = build_path(parent.path if parent else '', self.pk)
         super().save(*args, **kwargs)
 
+        if not self.path:
+            # Criação: o caminho depende do id recém-gerado
+            self.path = build_path(parent.path if parent else '', self.pk)
+            Category.objects.filter(pk=self.pk).update(path=self.path)
+        elif old_path and old_path != self.path:
+            # Mudou de pai: a subárvore inteira acompanha
+            move_subtree(old_path, self.path, self.depth - old_depth)
+
+    def get_descendants(self, include_self=True):
+        queryset = Category.objects.filter(subtree_q(self.path))
+        return queryset if include_self else queryset.exclude(pk=self.pk)
+
     def __str__(self):
+        # Pela árvore em memória (sem uma query do pai por linha no admin/forms)
+        tree = get_category_tree()
+        node = tree.get(self.pk)
+        if node is not None and node.name == self.name and node.parent_id == self.parent_id:
+            return tree.label(self.pk)
         if self.parent:
             return f"{self.parent.name} > {self.name}"
         return self.name
@@ -71,6 +111,9 @@ class Product(TimeStampedModel):
     # Estoque
     stock_quantity = models.IntegerField("Estoque Atual", default=0)
     min_stock_alert = models.IntegerField("Alerta Mínimo", default=2)
+    # Soma das reservas ativas de checkout (Orders.StockReservation), mantida
+    # pelos UPDATEs de Assets/stock.py: disponível = estoque - reservado
+    reserved_quantity = models.PositiveIntegerField("Reservado", default=0, editable=False)
     
     # Visibilidade
     is_active = models.BooleanField(default=True)
@@ -78,6 +121,26 @@ class Product(TimeStampedModel):
 
     # Imagem Principal (Thumb)
     main_image = models.ImageField("Imagem Capa", upload_to='products/main/', null=True, blank=True)
+    # Capa resolvida (main_image ou 1ª da galeria), desnormalizada para os cards
+    # não consultarem a galeria. Mantida por save() e pelos signals de ProductImage.
+    cover_image = models.CharField("Capa (resolvida)", max_length=255, blank=True, editable=False)
+    # Thumbnails/WebP gerados fora do request (ver Assets/images.py)
+    main_image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    cover_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Ordenações do catálogo (paginação por cursor em Bikes).
+            # Parciais em is_active: o Django gera "WHERE is_active" (sem "= true"),
+            # que o SQLite não usa como igualdade no meio de um índice composto.
+            models.Index(fields=['ownership', 'product_type', '-is_featured', '-created_at', '-id'], name='product_catalog_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['ownership', 'product_type', '-created_at', '-id'], name='product_catalog_newest_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['ownership', 'product_type', 'selling_price', 'id'], name='product_catalog_price_idx', condition=models.Q(is_active=True)),
+        ]
+        constraints = [
+            # Última linha de defesa contra venda sem estoque (ver Assets/stock.py)
+            models.CheckConstraint(condition=models.Q(stock_quantity__gte=0), name='product_stock_non_negative'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -103,7 +166,35 @@ class Product(TimeStampedModel):
             
             self.slug = slug_candidate
 
+        self.cover_image, self.cover_derivatives = self.resolve_cover()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'main_image' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'cover_image', 'cover_derivatives'}
+        elif update_fields is None and not self._state.adding:
+            # reserved_quantity é dos UPDATEs de Assets/stock.py: um save() com a cópia
+            # em memória desatualizada (admin, Staff, scripts) não pode apagar ou inflar reservas.
+            # Pelo mesmo motivo, estoque que não foi editado nesta cópia não é regravado
+            skip = {'reserved_quantity', *self.get_deferred_fields()}
+            if 'stock_quantity' in skip or self.stock_quantity == getattr(self, '_loaded_stock', None):
+                skip.add('stock_quantity')
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields if not f.primary_key and f.name not in skip
+            ]
+
         super().save(*args, **kwargs)
+        self._loaded_stock = self.__dict__.get('stock_quantity')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estoque como veio do banco: save() só regrava (e o razão só relê, signals.py) se foi editado
+        instance._loaded_stock = instance.__dict__.get('stock_quantity')
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or 'stock_quantity' in fields:
+            self._loaded_stock = self.__dict__.get('stock_quantity')
 
     def __str__(self):
         prefix = "[CLI]" if self.ownership == 'CUSTOMER' else "[LOJA]"
@@ -113,23 +204,51 @@ class Product(TimeStampedModel):
     def is_in_stock(self):
         return self.stock_quantity > 0
 
+    @property
+    def available_quantity(self):
+        """Estoque que ainda pode ser vendido (descontando reservas de checkout em andamento)."""
+        return max(0, self.stock_quantity - self.reserved_quantity)
+
     @property
     def cover_image_url(self):
         """
-        Retorna a URL da imagem de capa.
-        Se não tiver capa (main_image), tenta pegar a primeira da galeria.
+        Retorna a URL da imagem de capa (sem query extra: usa cover_image).
         Retorna None se não houver nenhuma imagem.
         """
+        if self.cover_image:
+            return self.main_image.storage.url(self.cover_image)
         if self.main_image:
+            # Produto ainda não migrado (ver comando backfill_cover_images)
             return self.main_image.url
-        
-        # Tenta pegar a primeira imagem da galeria (usa o related_name='images')
-        first_gallery_image = self.images.first()
-        if first_gallery_image:
-            return first_gallery_image.image.url
-            
         return None
 
+    @property
+    def cover_srcset(self):
+        return srcset(self.cover_derivatives, 'jpeg', self.cover_image, self.main_image.storage)
+
+    @property
+    def cover_webp_srcset(self):
+        return srcset(self.cover_derivatives, 'webp', self.cover_image, self.main_image.storage)
+
+    def resolve_cover(self):
+        """
+        Capa = main_image; se não houver, a imagem da galeria de menor `order`.
+        Retorna (caminho, derivados).
+        """
+        if self.main_image:
+            return self.main_image.name, self.main_image_derivatives
+        if not self.pk:
+            return '', {}
+        first = self.images.order_by('order', 'id').values_list('image', 'derivatives').first()
+        return first or ('', {})
+
+    def refresh_cover_image(self):
+        """Recalcula a capa e grava só essas colunas (sem disparar o save completo)."""
+        self.cover_image, self.cover_derivatives = self.resolve_cover()
+        Product.objects.filter(pk=self.pk).update(
+            cover_image=self.cover_image, cover_derivatives=self.cover_derivatives
+        )
+
 # --- 3. DADOS TÉCNICOS (SATÉLITE) ---
 class TechnicalSpec(models.Model):
     """
@@ -156,6 +275,21 @@ class TechnicalSpec(models.Model):
 
     class Meta:
         verbose_name = "Especificação Técnica"
+        indexes = [
+            # Filtros por faixa no catálogo: o banco percorre o índice do catálogo
+            # em Product (na ordem da página) e confere as faixas de cada produto
+            # só neste índice, sem ler a tabela de specs.
+            models.Index(
+                fields=['product', 'voltage', 'wattage', 'max_speed', 'amperage', 'weight'],
+                name='spec_product_ranges_idx',
+            ),
+            # Ordenações pela ficha técnica (Bikes.get_spec_sorted_context): o
+            # desempate pelo id da spec já está no próprio índice
+            models.Index(fields=['max_speed'], name='spec_speed_idx'),
+            models.Index(fields=['wattage'], name='spec_wattage_idx'),
+            models.Index(fields=['voltage'], name='spec_voltage_idx'),
+            models.Index(fields=['weight'], name='spec_weight_idx'),
+        ]
 
     def __str__(self):
         return f"Specs de {self.product.name}"
@@ -166,11 +300,34 @@ class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='products/gallery/')
     order = models.PositiveIntegerField(default=0)
+    derivatives = models.JSONField(default=dict, blank=True, editable=False)
 
     class Meta:
         ordering = ['order']
 
 
+# --- 4.1 ÍNDICE DE RELACIONADOS (ver Assets/related.py) ---
+class RelatedProduct(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField(default=0)
+    co_purchases = models.PositiveIntegerField("Compras em conjunto", default=0)
+
+    class Meta:
+        verbose_name = "Produto Relacionado"
+        verbose_name_plural = "Produtos Relacionados"
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'related'], name='related_product_unique'),
+        ]
+        indexes = [
+            # Leitura da página de detalhe: WHERE product_id = ? ORDER BY score DESC
+            models.Index(fields=['product', '-score'], name='related_product_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.related_id} ({self.score:.1f})"
+
+
 # --- 5. ORDEM DE SERVIÇO / MANUTENÇÃO ---
 class Maintenance(TimeStampedModel):
     """
@@ -247,4 +404,56 @@ class Appointment(TimeStampedModel):
         unique_together = ['date', 'time'] # Impede conflitos de horário
 
     def __str__(self):
-        return f"{self.date} às {self.time} - {self.client}"
\ No newline at end of file
+        return f"{self.date} às {self.time} - {self.client}"
+
+# --- 7. RAZÃO DE ESTOQUE (ver Assets/ledger.py) ---
+class StockMovement(models.Model):
+    """Lançamento do razão: só INSERT, nunca UPDATE/DELETE."""
+    SALE = 'SALE'
+    RETURN = 'RETURN'
+    ADJUSTMENT = 'ADJUSTMENT'
+    MAINTENANCE = 'MAINTENANCE'
+    KIND_CHOICES = [
+        (SALE, 'Venda'),
+        (RETURN, 'Cancelamento/Estorno'),
+        (ADJUSTMENT, 'Ajuste Manual'),
+        (MAINTENANCE, 'Uso em Manutenção'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    kind = models.CharField("Tipo", max_length=12, choices=KIND_CHOICES)
+    delta = models.IntegerField("Quantidade", help_text="Positivo entra, negativo sai")
+    reference = models.CharField("Referência", max_length=100, blank=True, help_text="Ex: Pedido #12")
+    maintenance = models.ForeignKey(
+        Maintenance, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements'
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Movimentação de Estoque"
+        verbose_name_plural = "Movimentações de Estoque"
+        indexes = [
+            # Cauda depois do último snapshot e extrato por produto
+            models.Index(fields=['product', 'created_at'], name='stock_movement_product_idx'),
+            models.Index(fields=['created_at'], name='stock_movement_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.delta:+d} ({self.product_id})"
+
+
+class StockSnapshot(models.Model):
+    """Saldo de um produto somando todos os lançamentos com created_at <= taken_at."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    quantity = models.IntegerField()
+    taken_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Snapshot de Estoque"
+        verbose_name_plural = "Snapshots de Estoque"
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'taken_at'], name='stock_snapshot_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.quantity} em {self.taken_at:%d/%m/%Y %H:%M}"
@@ -0,0 +1,178 @@
+"""
+Índice de produtos relacionados ("quem viu/comprou isto também leva...").
+
+Cada produto guarda até RELATED_POOL_SIZE vizinhos em RelatedProduct, com
+uma pontuação que soma:
+    - similaridade: mesma categoria / mesmo tipo
+    - co-compra: pedidos pagos que tiveram os dois produtos juntos
+
+A página de detalhe lê o índice com um único SELECT pelo índice
+(product_id, -score) e sorteia alguns itens entre os melhores, em vez de
+ORDER BY RANDOM() sobre a categoria inteira.
+
+Manutenção:
+    - approve_payment / cancel_order somam/subtraem as co-compras do pedido
+    - o comando rebuild_related_products recalcula tudo (cron noturno,
+      produtos novos ou que mudaram de categoria)
+"""
+import random
+from collections import defaultdict
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Count, F
+
+RELATED_POOL_SIZE = 12
+
+SAME_CATEGORY_SCORE = 2.0
+SAME_TYPE_SCORE = 1.0
+CO_PURCHASE_SCORE = 3.0
+
+# Status em que o pedido conta como venda
+PAID_STATUSES = ('APPROVED', 'IN_PROGRESS', 'READY', 'FINISHED')
+
+
+def similarity(a, b):
+    """a/b: dicts com category_id e product_type."""
+    score = 0.0
+    if a['category_id'] is not None and a['category_id'] == b['category_id']:
+        score += SAME_CATEGORY_SCORE
+    if a['product_type'] == b['product_type']:
+        score += SAME_TYPE_SCORE
+    return score
+
+
+def _catalog_products():
+    from .models import Product
+
+    queryset = Product.objects.filter(is_active=True, ownership='SHOP').exclude(product_type='SERVICE')
+    return queryset.values('id', 'category_id', 'product_type', 'is_featured', 'created_at')
+
+
+def _co_purchase_counts(product_ids=None):
+    """{produto: {outro_produto: nº de pedidos pagos com os dois}}"""
+    OrderItem = apps.get_model('Orders', 'OrderItem')
+
+    queryset = OrderItem.objects.filter(
+        order__status__in=PAID_STATUSES, product__isnull=False, order__items__product__isnull=False,
+    )
+    if product_ids is not None:
+        queryset = queryset.filter(product_id__in=product_ids)
+    pairs = (
+        queryset.values('product_id', other_id=F('order__items__product_id'))
+        .annotate(orders=Count('order_id', distinct=True))
+        .order_by()
+    )
+    counts = defaultdict(dict)
+    for row in pairs:
+        if row['product_id'] != row['other_id']:
+            counts[row['product_id']][row['other_id']] = row['orders']
+    return counts
+
+
+def rebuild_related_index(product_ids=None):
+    """
+    Recalcula o índice (de todos os produtos ou só de `product_ids`).
+    Retorna o número de linhas gravadas.
+    """
+    from .models import RelatedProduct
+
+    catalog = {row['id']: row for row in _catalog_products()}
+    targets = list(catalog) if product_ids is None else [pk for pk in product_ids if pk in catalog]
+
+    # Candidatos por similaridade: os primeiros de cada (categoria, tipo),
+    # na mesma ordem do catálogo (destaques e mais novos primeiro)
+    groups = defaultdict(list)
+    for row in sorted(catalog.values(), key=lambda r: (r['is_featured'], r['created_at'], r['id']), reverse=True):
+        group = groups[(row['category_id'], row['product_type'])]
+        if len(group) <= RELATED_POOL_SIZE:
+            group.append(row['id'])
+
+    co_purchases = _co_purchase_counts(targets if product_ids is not None else None)
+
+    rows = []
+    for pk in targets:
+        product = catalog[pk]
+        candidates = set(groups[(product['category_id'], product['product_type'])])
+        candidates.update(other for other in co_purchases.get(pk, {}) if other in catalog)
+        candidates.discard(pk)
+
+        scored = []
+        for other in candidates:
+            bought_together = co_purchases.get(pk, {}).get(other, 0)
+            score = similarity(product, catalog[other]) + CO_PURCHASE_SCORE * bought_together
+            scored.append((score, bought_together, other))
+        scored.sort(reverse=True)
+
+        rows.extend(
+            RelatedProduct(product_id=pk, related_id=other, score=score, co_purchases=bought_together)
+            for score, bought_together, other in scored[:RELATED_POOL_SIZE]
+        )
+
+    with transaction.atomic():
+        if product_ids is None:
+            RelatedProduct.objects.all().delete()
+        else:
+            RelatedProduct.objects.filter(product_id__in=product_ids).delete()
+        RelatedProduct.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def record_co_purchases(order, delta=1):
+    """
+    Atualiza o índice com os pares de produtos de um pedido
+    (delta=1 na aprovação, delta=-1 no cancelamento de pedido pago).
+    """
+    from .models import Product, RelatedProduct
+
+    product_ids = {pk for pk in order.items.values_list('product_id', flat=True) if pk is not None}
+    if len(product_ids) < 2:
+        return
+
+    info = {row['id']: row for row in Product.objects.filter(pk__in=product_ids).values('id', 'category_id', 'product_type')}
+    existing = set(
+        RelatedProduct.objects.filter(product_id__in=product_ids, related_id__in=product_ids)
+        .values_list('product_id', 'related_id')
+    )
+
+    RelatedProduct.objects.filter(
+        product_id__in=product_ids, related_id__in=product_ids, co_purchases__gte=max(0, -delta),
+    ).update(
+        co_purchases=F('co_purchases') + delta,
+        score=F('score') + CO_PURCHASE_SCORE * delta,
+    )
+    if delta > 0:
+        RelatedProduct.objects.bulk_create([
+            RelatedProduct(
+                product_id=a, related_id=b, co_purchases=delta,
+                score=similarity(info[a], info[b]) + CO_PURCHASE_SCORE * delta,
+            )
+            for a in product_ids for b in product_ids
+            if a != b and (a, b) not in existing
+        ], ignore_conflicts=True)
+
+
+def related_products_for(product, limit=3):
+    """
+    Produtos relacionados para a página de detalhe: uma consulta no índice e
+    um sorteio entre os 3*limit melhores (a vitrine muda a cada visita).
+    """
+    from .models import Product, RelatedProduct
+
+    entries = list(
+        RelatedProduct.objects.filter(
+            product_id=product.pk, related__is_active=True, related__ownership='SHOP',
+        ).select_related('related').order_by('-score')[:limit * 3]
+    )
+    pool = [entry.related for entry in entries]
+
+    if not pool:
+        # Produto ainda fora do índice: mesma categoria/tipo pela ordem do catálogo (índice composto)
+        pool = list(
+            Product.objects.filter(
+                category_id=product.category_id, product_type=product.product_type,
+                is_active=True, ownership='SHOP',
+            ).exclude(pk=product.pk).order_by('-is_featured', '-created_at', '-id')[:limit * 3]
+        )
+
+    return random.sample(pool, min(limit, len(pool)))
@@ -0,0 +1,239 @@
+"""
+Busca textual do catálogo.
+
+O índice guarda o texto já normalizado (minúsculo, sem acento e com um
+stemming leve de português), então "Baterias", "bateria" e "BATERÍA"
+caem no mesmo termo (mudou o stemming, rode rebuild_search_index). O SKU
+é indexado sem stemming para permitir busca por prefixo ("EBIKE-MT"
+encontra "EBIKE-MTB-500").
+
+Backends (settings.CATALOG_SEARCH_BACKEND):
+    'icontains' -> LIKE '%x%' antigo (sem índice)
+    'fts'       -> FTS5 no SQLite / tsvector + GIN no PostgreSQL
+    'auto'      -> 'fts' se o banco suportar, senão 'icontains'
+"""
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+FTS_TABLE = 'Assets_product_fts'        # SQLite (tabela virtual FTS5)
+PG_TABLE = 'Assets_product_search'      # PostgreSQL (tsvector + GIN)
+
+# Sufixos de plural/flexão mais comuns do português (ordem importa:
+# os mais longos primeiro). Aplicado antes de remover os acentos.
+_PT_SUFFIXES = [
+    ('ões', 'ão'), ('ães', 'ão'), ('ãos', 'ão'),
+    ('ais', 'al'), ('éis', 'el'), ('eis', 'el'), ('óis', 'ol'),
+    ('res', 'r'), ('zes', 'z'), ('ns', 'm'),
+]
+
+# Palavras terminadas em "s" que não são plural (e palavras funcionais): o
+# passo de plural juntaria termos sem relação ("demais" -> "demal",
+# "país" -> "pai"). Ficam como estão, só sem acento (como no RSLP).
+_PT_NOT_PLURAL = frozenset({
+    'mais', 'demais', 'jamais', 'menos', 'pois', 'depois', 'apos', 'atras', 'atraves', 'antes', 'apenas',
+    'mas', 'nos', 'vos', 'dois', 'tres', 'seis', 'pais', 'gas', 'mes', 'lapis', 'cais', 'onibus', 'virus',
+    'bonus', 'tenis', 'atlas', 'pires', 'oculos', 'simples', 'fregues', 'ingles', 'portugues',
+})
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def strip_accents(text):
+    normalized = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in normalized if not unicodedata.combining(c))
+
+
+def stem_pt(word):
+    """Stemmer leve (passo de plural do RSLP): 'baterias' -> 'bateria'."""
+    if len(word) <= 3 or word.isdigit() or strip_accents(word) in _PT_NOT_PLURAL:
+        return strip_accents(word)
+    for suffix, replacement in _PT_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 2:
+            word = word[:-len(suffix)] + replacement
+            break
+    else:
+        if word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+    return strip_accents(word)
+
+
+def tokenize(text, stem=True):
+    words = _WORD_RE.findall((text or '').lower())
+    if stem:
+        return [stem_pt(w) for w in words]
+    return [strip_accents(w) for w in words]
+
+
+def document_for(product):
+    """Campos normalizados que vão para o índice: (nome, sku, descrição)."""
+    return (
+        ' '.join(tokenize(product.name)),
+        ' '.join(tokenize(product.sku or '', stem=False)),
+        ' '.join(tokenize(f"{product.short_description} {product.description}")),
+    )
+
+
+# --- BACKENDS ---
+
+class IContainsBackend:
+    """Comportamento original: varredura com LIKE. Sem índice para manter."""
+    name = 'icontains'
+    ranked = False
+
+    def filter(self, queryset, query):
+        return queryset.filter(
+            Q(name__icontains=query) |
+            Q(description__icontains=query) |
+            Q(sku__icontains=query)
+        )
+
+    def index_products(self, products, replace=True):
+        pass
+
+    def remove_products(self, product_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def rebuild(self, batch_size=2000):
+        return 0
+
+
+class _FTSBackend(IContainsBackend):
+    name = 'fts'
+    ranked = True
+
+    def rebuild(self, batch_size=2000):
+        """Reindexa o catálogo inteiro em lotes. Retorna o total indexado."""
+        from .models import Product
+
+        self.clear()
+        total = 0
+        batch = []
+        fields = ('id', 'name', 'sku', 'short_description', 'description')
+        for product in Product.objects.only(*fields).order_by('id').iterator(chunk_size=batch_size):
+            batch.append(product)
+            if len(batch) >= batch_size:
+                self.index_products(batch, replace=False)
+                total += len(batch)
+                batch = []
+        if batch:
+            self.index_products(batch, replace=False)
+            total += len(batch)
+        return total
+
+
+class SQLiteFTSBackend(_FTSBackend):
+    """FTS5 com tokenizer unicode61 e ranking bm25 (nome > sku > descrição)."""
+
+    def _match(self, query):
+        terms = []
+        for stem, raw in zip(tokenize(query), tokenize(query, stem=False)):
+            terms.append(f'({{name body}} : "{stem}"* OR sku : "{raw}"*)')
+        return ' AND '.join(terms)
+
+    def filter(self, queryset, query):
+        match = self._match(query)
+        if not match:
+            return queryset
+        table = queryset.model._meta.db_table
+        # JOIN direto com a tabela FTS: o MATCH usa o índice invertido e o
+        # bm25 é calculado só para as linhas encontradas ("menor = melhor").
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'"{FTS_TABLE}".rowid = "{table}"."id"', f'"{FTS_TABLE}" MATCH %s'],
+            params=[match],
+            select={'search_rank': f'bm25("{FTS_TABLE}", 10.0, 5.0, 1.0)'},
+        )
+
+    def index_products(self, products, replace=True):
+        rows = [(p.pk, *document_for(p)) for p in products]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            if replace:
+                cursor.executemany(f'DELETE FROM "{FTS_TABLE}" WHERE rowid = %s', [(r[0],) for r in rows])
+            cursor.executemany(
+                f'INSERT INTO "{FTS_TABLE}" (rowid, name, sku, body) VALUES (%s, %s, %s, %s)', rows
+            )
+
+    def remove_products(self, product_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM "{FTS_TABLE}" WHERE rowid = %s', [(pk,) for pk in product_ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{FTS_TABLE}"')
+
+
+class PostgresFTSBackend(_FTSBackend):
+    """tsvector com pesos (A = nome/sku, C = descrição) e índice GIN."""
+
+    def _tsquery(self, query):
+        terms = []
+        for stem, raw in zip(tokenize(query), tokenize(query, stem=False)):
+            terms.append(f"('{stem}':* | '{raw}':*)")
+        return ' & '.join(terms)
+
+    def filter(self, queryset, query):
+        tsquery = self._tsquery(query)
+        if not tsquery:
+            return queryset
+        table = queryset.model._meta.db_table
+        return queryset.extra(
+            tables=[PG_TABLE],
+            where=[
+                f'"{PG_TABLE}".product_id = "{table}"."id"',
+                f'"{PG_TABLE}".document @@ to_tsquery(\'simple\', %s)',
+            ],
+            params=[tsquery],
+            # Negativo para manter a mesma convenção do bm25 (ascendente)
+            select={'search_rank': f'-ts_rank("{PG_TABLE}".document, to_tsquery(\'simple\', %s))'},
+            select_params=[tsquery],
+        )
+
+    def index_products(self, products, replace=True):
+        rows = [(p.pk, *document_for(p)) for p in products]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO "{PG_TABLE}" (product_id, document) VALUES (%s, '
+                "setweight(to_tsvector('simple', %s), 'A') || "
+                "setweight(to_tsvector('simple', %s), 'A') || "
+                "setweight(to_tsvector('simple', %s), 'C')) "
+                'ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document',
+                rows
+            )
+
+    def remove_products(self, product_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{PG_TABLE}" WHERE product_id = ANY(%s)', (list(product_ids),))
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE "{PG_TABLE}"')
+
+
+_FTS_BACKENDS = {
+    'sqlite': SQLiteFTSBackend,
+    'postgresql': PostgresFTSBackend,
+}
+
+
+def get_search_backend(name=None):
+    name = name or getattr(settings, 'CATALOG_SEARCH_BACKEND', 'auto')
+    if name == 'icontains':
+        return IContainsBackend()
+
+    backend_class = _FTS_BACKENDS.get(connection.vendor)
+    if backend_class is None:
+        if name == 'fts':
+            raise ValueError(f"Busca full-text não suportada no banco '{connection.vendor}'.")
+        return IContainsBackend()
+    return backend_class()
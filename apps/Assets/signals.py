@@ -0,0 +1,88 @@
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Category, Product, ProductImage, StockMovement, TechnicalSpec
+from .search import get_search_backend
+from .cache import invalidate_catalog
+from .categories import invalidate_category_tree, move_subtree
+from .images import schedule_product, schedule_product_image
+from .stock import record_movements
+
+
+@receiver(post_save, sender=Product)
+def sync_search_index(sender, instance, raw=False, **kwargs):
+    # Mantém o índice full-text em dia (na mesma transação do save)
+    if raw:
+        return
+    get_search_backend().index_products([instance])
+
+
+# Upload pelo add_product, admin ou inline: thumbnails gerados após o commit
+@receiver(post_save, sender=Product)
+def queue_main_image_derivatives(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_product(instance)
+
+
+@receiver(post_save, sender=ProductImage)
+def queue_gallery_image_derivatives(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_product_image(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, **kwargs):
+    get_search_backend().remove_products([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=ProductImage)
+def refresh_product_cover(sender, instance, raw=False, **kwargs):
+    # Imagem adicionada, reordenada ou removida: a capa pode ter mudado
+    if raw:
+        return
+    product = Product.objects.filter(pk=instance.product_id).first()
+    if product is not None:
+        product.refresh_cover_image()
+
+
+# Tudo que aparece nos cards do catálogo invalida o cache de fragmentos
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=TechnicalSpec)
+@receiver([post_save, post_delete], sender=ProductImage)
+@receiver([post_save, post_delete], sender=Category)
+def catalog_changed(sender, **kwargs):
+    invalidate_catalog()
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_tree_changed(sender, raw=False, **kwargs):
+    invalidate_category_tree()
+
+
+@receiver(post_delete, sender=Category)
+def reroot_orphan_subcategories(sender, instance, **kwargs):
+    # O SET_NULL já soltou os filhos; o caminho deles ainda começa pelo da categoria apagada
+    if instance.path:
+        move_subtree(instance.path, '', -(instance.depth + 1))
+
+
+# Estoque editado pelo save() (admin, painel da equipe, scripts): vira ajuste no razão.
+# Save que não edita o estoque nem o regrava (Product.save tira do update_fields): sem SELECT
+@receiver(pre_save, sender=Product)
+def remember_stock_before_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'stock_quantity' not in update_fields):
+        instance._stock_before = None
+    elif instance.pk:
+        instance._stock_before = (
+            Product.objects.filter(pk=instance.pk).values_list('stock_quantity', flat=True).first() or 0
+        )
+    else:
+        instance._stock_before = 0
+
+
+@receiver(post_save, sender=Product)
+def record_stock_adjustment(sender, instance, created, **kwargs):
+    before = getattr(instance, '_stock_before', None)
+    if before is not None and instance.stock_quantity != before:
+        reference = "Estoque inicial" if created else "Edição do produto"
+        record_movements({instance.pk: instance.stock_quantity - before}, StockMovement.ADJUSTMENT, reference)
@@ -0,0 +1,117 @@
+"""
+Movimentação de estoque em conjunto (um pedido inteiro por UPDATE).
+
+take_stock baixa todos os produtos com um único UPDATE condicional:
+
+    UPDATE produto SET stock_quantity = stock_quantity - CASE id WHEN .. END
+    WHERE id IN (..) AND stock_quantity >= reserved_quantity + CASE id WHEN .. END
+
+reserve_stock faz o mesmo com o contador reserved_quantity (reservas de
+checkout com prazo, ver Orders/reservations.py): disponível para venda é
+sempre stock_quantity - reserved_quantity, lido da própria linha do
+produto, sem SUM nas reservas.
+
+Se alguma linha não foi afetada, faltou estoque: a savepoint desfaz a
+baixa inteira e InsufficientStock diz quais produtos faltaram. Não há
+SELECT ... FOR UPDATE nem save() por produto; cada linha fica travada só
+durante o próprio UPDATE (até o fim da transação de quem chamou).
+
+A constraint product_stock_non_negative garante no banco que nenhum
+caminho (admin, import, SQL manual) deixa o estoque negativo.
+
+Toda baixa/estorno grava também os lançamentos do razão (StockMovement,
+um INSERT para o pedido inteiro, ver Assets/ledger.py) na mesma transação.
+"""
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+
+from .models import Product, StockMovement
+
+
+class InsufficientStock(ValueError):
+    def __init__(self, products):
+        self.products = products
+        names = ', '.join(product.name for product in products)
+        super().__init__(f"Estoque insuficiente para: {names}")
+
+
+class _Shortage(Exception):
+    pass
+
+
+def _per_product(quantities):
+    return Case(
+        *[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def _update_all_or_nothing(quantities, **updates):
+    """
+    UPDATE condicional em todos os produtos de `quantities` (só onde o
+    disponível cobre a quantidade); se faltar em algum, nada muda.
+    `updates` recebe a expressão da quantidade de cada produto.
+    """
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity}
+    if not quantities:
+        return
+    amount = _per_product(quantities)
+    available = Q(stock_quantity__gte=F('reserved_quantity') + amount)
+    try:
+        with transaction.atomic():
+            updated = (
+                Product.objects.filter(available, pk__in=quantities)
+                .update(**{field: expression(amount) for field, expression in updates.items()})
+            )
+            if updated != len(quantities):
+                raise _Shortage()
+    except _Shortage:
+        # Depois do rollback da savepoint: o estoque de volta ao que era
+        missing = list(Product.objects.filter(pk__in=quantities).exclude(available).order_by('pk'))
+        raise InsufficientStock(missing)
+
+
+def record_movements(quantities, kind, reference='', maintenance=None):
+    """Lançamentos do razão. quantities: {product_id: delta com sinal}."""
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=pk, kind=kind, delta=delta, reference=reference, maintenance=maintenance)
+        for pk, delta in quantities.items() if delta
+    ])
+
+
+def take_stock(quantities, reference='', kind=StockMovement.SALE, maintenance=None):
+    """quantities: {product_id: quantidade}. Baixa tudo ou nada, respeitando as reservas dos outros."""
+    with transaction.atomic():
+        _update_all_or_nothing(quantities, stock_quantity=lambda amount: F('stock_quantity') - amount)
+        record_movements({pk: -quantity for pk, quantity in quantities.items()}, kind, reference, maintenance)
+
+
+def use_parts(maintenance, quantities):
+    """Peças do estoque da loja usadas numa OS."""
+    take_stock(quantities, f"OS #{maintenance.pk}", StockMovement.MAINTENANCE, maintenance)
+
+
+def reserve_stock(quantities):
+    """Reserva sem baixar (checkout). Tudo ou nada."""
+    _update_all_or_nothing(quantities, reserved_quantity=lambda amount: F('reserved_quantity') + amount)
+
+
+def release_stock(quantities):
+    """Devolve reservas (pagamento aprovado, pedido cancelado ou prazo vencido)."""
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity}
+    if quantities:
+        amount = _per_product(quantities)
+        Product.objects.filter(pk__in=quantities).update(
+            reserved_quantity=Greatest(F('reserved_quantity') - amount, Value(0))
+        )
+
+
+def put_back(quantities, reference=''):
+    """Estorno (cancelamento): soma de volta, sem condição."""
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity}
+    if quantities:
+        amount = _per_product(quantities)
+        with transaction.atomic():
+            Product.objects.filter(pk__in=quantities).update(stock_quantity=F('stock_quantity') + amount)
+            record_movements(quantities, StockMovement.RETURN, reference)
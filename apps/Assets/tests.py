@@ -1,3 +1,462 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from Clients.models import Client
+from Orders.models import Order, OrderItem
+from Staff.models import SiteConfiguration
+from .cache import normalize_catalog_params
+from .categories import get_category_tree
+from .facets import compute_facets
+from .ledger import stock_at, take_snapshots
+from .models import Category, Maintenance, Product, ProductImage, RelatedProduct, StockMovement, TechnicalSpec
+from .related import rebuild_related_index, related_products_for
+from .search import get_search_backend, stem_pt
+from .stock import put_back, take_stock, use_parts
+from .views import Bikes
+
+
+class CatalogSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.bateria = Product.objects.create(
+            name="Bateria Lítio 36V 13Ah", sku="BAT-36V-13AH", product_type='COMPONENT',
+            selling_price=1800, description="Células Samsung originais."
+        )
+        self.pneu = Product.objects.create(
+            name="Pneu Anti-Furo 29x2.10", sku="TIRE-29-AF", product_type='COMPONENT',
+            selling_price=220, description="Camada interna de kevlar."
+        )
+
+    def _search(self, query):
+        return list(get_search_backend('fts').filter(Product.objects.all(), query).order_by('search_rank'))
+
+    def test_stemmer_reduces_portuguese_plurals(self):
+        self.assertEqual(stem_pt('baterias'), stem_pt('bateria'))
+        self.assertEqual(stem_pt('controladores'), 'controlador')
+        self.assertEqual(stem_pt('conversões'), 'conversao')
+
+    def test_stemmer_keeps_unrelated_words_apart(self):
+        for word, other in (('mais', 'mal'), ('demais', 'demal'), ('país', 'pai'), ('três', 'tre'), ('mês', 'me')):
+            self.assertNotEqual(stem_pt(word), stem_pt(other), word)
+        self.assertEqual([stem_pt(w) for w in ('ônibus', 'tênis', 'óculos')], ['onibus', 'tenis', 'oculos'])
+        self.assertEqual(stem_pt('canais'), 'canal')
+
+    def test_plural_and_accent_insensitive(self):
+        self.assertEqual(self._search('baterias litio'), [self.bateria])
+        self.assertEqual(self._search('CÉLULAS'), [self.bateria])
+
+    def test_sku_prefix(self):
+        self.assertEqual(self._search('TIRE-2'), [self.pneu])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.pneu.name = "Pneu Tubeless"
+        self.pneu.save()
+        self.assertEqual(self._search('tubeless'), [self.pneu])
+        self.assertEqual(self._search('furo'), [])
+
+        self.pneu.delete()
+        self.assertEqual(self._search('tubeless'), [])
+
+    @override_settings(CATALOG_SEARCH_BACKEND='fts')
+    def test_catalog_view_uses_index(self):
+        response = self.client.get(reverse('bike_catalog'), {'product_type': 'PART', 'search': 'baterias'})
+        self.assertEqual(list(response.context['bikes']), [self.bateria])
+
+
+class CatalogFragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.bike = Product.objects.create(name="Thunder 500", sku="BK-1", product_type='BIKE', selling_price=5000)
+
+    def test_fragment_is_cached_until_product_changes(self):
+        url = reverse('bike_catalog')
+        self.client.get(url, HTTP_HX_REQUEST='true')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'search': '  '}, HTTP_HX_REQUEST='true')
+        self.assertContains(response, "Thunder 500")
+        self.assertFalse([q for q in queries if 'Assets_' in q['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bike.name = "Storm 750"
+            self.bike.save()
+
+        response = self.client.get(url, HTTP_HX_REQUEST='true')
+        self.assertContains(response, "Storm 750")
+
+
+class CoverImageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        SiteConfiguration.get_solo()  # o middleware cria na 1ª request
+
+    def _bike_with_gallery(self, i):
+        bike = Product.objects.create(name=f"Bike {i}", sku=f"BK-{i}", product_type='BIKE', selling_price=4000)
+        ProductImage.objects.create(product=bike, image=f'products/gallery/b{i}-2.jpg', order=2)
+        ProductImage.objects.create(product=bike, image=f'products/gallery/b{i}-1.jpg', order=1)
+        return bike
+
+    def test_cover_follows_gallery_changes(self):
+        bike = self._bike_with_gallery(1)
+        bike.refresh_from_db()
+        self.assertEqual(bike.cover_image, 'products/gallery/b1-1.jpg')
+
+        first = bike.images.get(order=1)
+        first.order = 5
+        first.save()
+        bike.refresh_from_db()
+        self.assertEqual(bike.cover_image, 'products/gallery/b1-2.jpg')
+
+        bike.images.all().delete()
+        bike.refresh_from_db()
+        self.assertEqual(bike.cover_image, '')
+
+        bike.main_image = 'products/main/capa.jpg'
+        bike.save()
+        self.assertEqual(bike.cover_image, 'products/main/capa.jpg')
+
+    def _catalog_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('bike_catalog'), HTTP_HX_REQUEST='true')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_bikes_list_query_count_is_constant(self):
+        self._bike_with_gallery(0)
+        one_card = self._catalog_queries()
+
+        for i in range(1, 9):
+            self._bike_with_gallery(i)
+        nine_cards = self._catalog_queries()
+
+        self.assertEqual(one_card, nine_cards)
+        self.assertContains(
+            self.client.get(reverse('bike_catalog'), HTTP_HX_REQUEST='true'), 'products/gallery/b8-1.jpg'
+        )
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+    def _upload(self, width, height):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (width, height), (200, 40, 40)).save(buffer, format='JPEG')
+        return SimpleUploadedFile('foto.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_derivatives_are_generated_after_commit(self):
+        with self.settings(MEDIA_ROOT=self.media_root, IMAGE_DERIVATIVES_SYNC=True):
+            with self.captureOnCommitCallbacks(execute=True):
+                bike = Product.objects.create(
+                    name="Bike Foto", sku="BK-F", product_type='BIKE', selling_price=4000,
+                    main_image=self._upload(800, 400),
+                )
+            bike.refresh_from_db()
+
+            # 1024 ficaria maior que o original: não amplia
+            self.assertEqual(sorted(bike.main_image_derivatives['webp']), ['320', '640'])
+            self.assertEqual(bike.cover_derivatives, bike.main_image_derivatives)
+            self.assertIn(' 640w', bike.cover_webp_srcset)
+
+            response = self.client.get(reverse('bike_catalog'), HTTP_HX_REQUEST='true')
+            self.assertContains(response, 'type="image/webp"')
+
+
+class RelatedProductsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        motores = Category.objects.create(name="Motores")
+        baterias = Category.objects.create(name="Baterias")
+        self.motor = Product.objects.create(name="Motor 1000W", sku="MOT-1", category=motores, selling_price=900, stock_quantity=10)
+        self.motor2 = Product.objects.create(name="Motor 500W", sku="MOT-2", category=motores, selling_price=700, stock_quantity=10)
+        self.bateria = Product.objects.create(name="Bateria 48V", sku="BAT-1", category=baterias, selling_price=1500, stock_quantity=10)
+
+        user = get_user_model().objects.create_user(email='comprador@teste.com', password='123')
+        self.client_obj = Client.objects.create(user=user)
+
+    def _order(self, *products):
+        order = Order.objects.create(client=self.client_obj)
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, quantity=1)
+        return order
+
+    def test_rebuild_uses_category_and_co_purchases(self):
+        rebuild_related_index()
+        self.assertEqual(
+            list(RelatedProduct.objects.filter(product=self.motor).values_list('related_id', flat=True)),
+            [self.motor2.pk],
+        )
+
+        self._order(self.motor, self.bateria).approve_payment()
+        rebuild_related_index()
+        top = RelatedProduct.objects.filter(product=self.motor).order_by('-score').first()
+        self.assertEqual((top.related_id, top.co_purchases), (self.bateria.pk, 1))
+
+    def test_approval_and_cancel_update_index_incrementally(self):
+        rebuild_related_index()
+        order = self._order(self.motor, self.motor2, self.bateria)
+        order.approve_payment()
+
+        entry = RelatedProduct.objects.get(product=self.bateria, related=self.motor)
+        self.assertEqual(entry.co_purchases, 1)
+        self.assertEqual(
+            RelatedProduct.objects.get(product=self.motor, related=self.motor2).co_purchases, 1
+        )
+
+        order.cancel_order()
+        self.assertEqual(RelatedProduct.objects.get(product=self.bateria, related=self.motor).co_purchases, 0)
+
+    def test_detail_reads_index_in_one_query(self):
+        self._order(self.motor, self.bateria).approve_payment()
+        with self.assertNumQueries(1):
+            related = related_products_for(self.bateria)
+        self.assertEqual(related, [self.motor])
+
+
+class CatalogFacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        urbana = Category.objects.create(name="Urbana")
+        mtb = Category.objects.create(name="Mountain Bike")
+        specs = [
+            (urbana, 'NEW', 36, 350, 4500, 25),
+            (urbana, 'USED', 48, 500, 3800, 32),
+            (mtb, 'NEW', 48, 1000, 9000, 45),
+            (mtb, 'NEW', 52, 1500, 13000, 60),
+        ]
+        for i, (category, condition, voltage, wattage, price, speed) in enumerate(specs):
+            bike = Product.objects.create(
+                name=f"Bike {i}", sku=f"FB-{i}", product_type='BIKE', category=category,
+                condition=condition, selling_price=price,
+            )
+            TechnicalSpec.objects.create(product=bike, voltage=voltage, wattage=wattage, max_speed=speed)
+        # Sem ficha técnica: fora dos filtros e das ordenações por spec
+        Product.objects.create(name="Bike sem ficha", sku="FB-X", product_type='BIKE')
+
+    def _facets(self, **query):
+        params = normalize_catalog_params(query)
+        base = Product.objects.filter(ownership='SHOP', is_active=True, product_type='BIKE')
+        get_category_tree()  # árvore em memória do processo
+        with self.assertNumQueries(1):
+            return compute_facets(base, params)
+
+    @staticmethod
+    def _counts(options):
+        return {option['value']: option['count'] for option in options}
+
+    def test_counts_without_filters(self):
+        facets = self._facets()
+        self.assertEqual(self._counts(facets['category']), {'mountain-bike': 2, 'urbana': 2})
+        self.assertEqual(self._counts(facets['voltage']), {'36': 1, '48': 2, '52': 1})
+        self.assertEqual(self._counts(facets['power']), {'350-750': 2, '750-1500': 1, '1500-mais': 1})
+        self.assertEqual(self._counts(facets['price']), {'ate-5000': 2, '8000-12000': 1, '12000-mais': 1})
+
+    def test_each_facet_ignores_its_own_filter(self):
+        facets = self._facets(voltage='48.0', condition='NEW')
+        # Voltagem conta só com condição=NEW; condição conta só com 48V
+        self.assertEqual(self._counts(facets['voltage']), {'36': 1, '48': 1, '52': 1})
+        self.assertEqual(self._counts(facets['condition']), {'NEW': 1, 'USED': 1})
+        self.assertEqual(self._counts(facets['category']), {'mountain-bike': 1})
+
+    def test_spec_ranges_shrink_facet_counts(self):
+        get_category_tree()
+        params = normalize_catalog_params({'wattage_min': '500', 'wattage_max': '1000'})
+        with self.assertNumQueries(1):
+            facets = Bikes().get_facets(params)
+        self.assertEqual(self._counts(facets['category']), {'mountain-bike': 1, 'urbana': 1})
+        self.assertEqual(self._counts(facets['power']), {'350-750': 1, '750-1500': 1})
+        self.assertEqual(self._counts(facets['voltage']), {'48': 2})
+
+    def test_catalog_filters_and_refreshes_sidebar(self):
+        response = self.client.get(reverse('bike_catalog'), {'power': '350-750'}, HTTP_HX_REQUEST='true')
+        self.assertContains(response, "Bike 0")
+        self.assertNotContains(response, "Bike 2")
+        self.assertContains(response, 'hx-swap-oob="innerHTML"')
+
+    def _catalog_names(self, **query):
+        response = self.client.get(reverse('bike_catalog'), query)
+        return [bike.name for bike in response.context['bikes']]
+
+    def test_spec_ranges_and_sorting(self):
+        self.assertEqual(
+            sorted(self._catalog_names(wattage_min='500', wattage_max='1000')), ["Bike 1", "Bike 2"]
+        )
+        self.assertEqual(sorted(self._catalog_names(voltage_min='48', speed_min='40')), ["Bike 2", "Bike 3"])
+        self.assertEqual(
+            self._catalog_names(ordering='speed_desc'), ["Bike 3", "Bike 2", "Bike 1", "Bike 0"]
+        )
+        self.assertEqual(self._catalog_names(ordering='power_desc', condition='NEW'), ["Bike 3", "Bike 2", "Bike 0"])
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.pecas = Category.objects.create(name="Peças & Componentes")
+        self.eletrica = Category.objects.create(name="Elétrica", parent=self.pecas)
+        self.mecanica = Category.objects.create(name="Mecânica", parent=self.pecas)
+        self.conectores = Category.objects.create(name="Conectores", parent=self.eletrica)
+        for i, category in enumerate([self.eletrica, self.mecanica, self.conectores]):
+            Product.objects.create(
+                name=f"Peça {i}", sku=f"PC-{i}", product_type='COMPONENT', category=category, selling_price=100,
+            )
+
+    def test_paths_follow_moves_and_deletes(self):
+        self.assertEqual(self.conectores.path, f'{self.pecas.pk}/{self.eletrica.pk}/{self.conectores.pk}/')
+
+        self.eletrica.parent = self.mecanica
+        self.eletrica.save()
+        self.conectores.refresh_from_db()
+        self.assertEqual(self.conectores.path, f'{self.pecas.pk}/{self.mecanica.pk}/{self.eletrica.pk}/{self.conectores.pk}/')
+        self.assertEqual(self.conectores.depth, 3)
+        self.assertEqual(set(self.mecanica.get_descendants()), {self.mecanica, self.eletrica, self.conectores})
+
+        with self.assertRaises(ValueError):
+            self.pecas.parent = self.conectores
+            self.pecas.save()
+
+        self.mecanica.delete()
+        self.conectores.refresh_from_db()
+        self.assertEqual((self.conectores.path, self.conectores.depth), (f'{self.eletrica.pk}/{self.conectores.pk}/', 1))
+
+    def test_catalog_includes_descendants(self):
+        response = self.client.get(reverse('bike_catalog'), {'product_type': 'PART', 'category': 'pecas-componentes'})
+        self.assertEqual(sorted(p.name for p in response.context['bikes']), ["Peça 0", "Peça 1", "Peça 2"])
+
+        # Links antigos pelo nome continuam funcionando
+        response = self.client.get(reverse('bike_catalog'), {'product_type': 'PART', 'category': "Elétrica"})
+        self.assertEqual(sorted(p.name for p in response.context['bikes']), ["Peça 0", "Peça 2"])
+
+        facets = compute_facets(Product.objects.all(), normalize_catalog_params({'product_type': 'PART'}))
+        self.assertEqual(
+            [(o['label'], o['count']) for o in facets['category']],
+            [("Peças & Componentes", 3), ("— Elétrica", 2), ("— — Conectores", 1), ("— Mecânica", 1)],
+        )
+
+    def test_str_and_breadcrumbs_read_cached_tree(self):
+        categories = list(Category.objects.all())
+        get_category_tree()
+        with self.assertNumQueries(0):
+            labels = {str(category) for category in categories}
+        self.assertIn("Peças & Componentes > Elétrica > Conectores", labels)
+
+        response = self.client.get(reverse('bike_detail', args=[Product.objects.get(sku='PC-2').pk]))
+        self.assertEqual([c.name for c in response.context['category_breadcrumbs']],
+                         ["Peças & Componentes", "Elétrica", "Conectores"])
+
+
+class CatalogImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(content)
+        return path
+
+    def _import(self, path, **options):
+        call_command('import_catalog', path, stdout=io.StringIO(), stderr=io.StringIO(), **options)
+
+    def test_csv_upsert_by_sku(self):
+        Product.objects.create(name="Bateria 48V", sku="BAT-48", selling_price=1500)
+        path = self._write('fornecedor.csv', (
+            "sku,name,category,product_type,selling_price,voltage,wattage\n"
+            "BAT-48,,,,\"1.450,00\",48,\n"
+            "MOT-1,Motor Hub 1000W,Peças & Componentes > Motores,component,900,48,1000\n"
+            "MOT-2,Motor Hub 1000W,Peças & Componentes > Motores,COMPONENT,950,,\n"
+        ))
+        self._import(path, batch_size=2)
+
+        bateria = Product.objects.get(sku="BAT-48")
+        self.assertEqual((bateria.name, bateria.selling_price, bateria.specs.voltage), ("Bateria 48V", 1450, 48))
+        motor, motor2 = Product.objects.filter(sku__startswith="MOT").order_by('sku')
+        self.assertEqual(str(motor.category), "Peças & Componentes > Motores")
+        self.assertEqual(motor.specs.wattage, 1000)
+        self.assertEqual((motor.slug, motor2.slug), ("motor-hub-1000w-mot-1", "motor-hub-1000w-mot-2"))
+        self.assertFalse(TechnicalSpec.objects.filter(product=motor2).exists())
+        self.assertEqual(
+            list(get_search_backend('fts').filter(Product.objects.all(), 'motores')), [motor, motor2]
+        )
+
+    def test_resume_continues_after_last_batch(self):
+        path = self._write('fornecedor.jsonl', ''.join(
+            json.dumps({'sku': f'SKU-{i}', 'name': f'Peça {i}', 'specs': {'weight': '1,5'}}) + '\n' for i in range(5)
+        ))
+        with open(f'{path}.progress', 'w') as state:
+            json.dump({'source': os.path.abspath(path), 'size': os.path.getsize(path), 'rows': 3}, state)
+
+        self._import(path, resume=True)
+        self.assertEqual(sorted(Product.objects.values_list('sku', flat=True)), ['SKU-3', 'SKU-4'])
+        self.assertFalse(os.path.exists(f'{path}.progress'))
+
+
+class StockLedgerTests(TestCase):
+    def test_every_stock_change_is_a_movement(self):
+        freio = Product.objects.create(name="Freio", sku="FRE", selling_price=80, stock_quantity=5)
+        take_stock({freio.pk: 2}, reference="Pedido #1")
+        put_back({freio.pk: 1}, reference="Pedido #1")
+        freio.refresh_from_db()
+        freio.stock_quantity = 10
+        freio.save()
+        bike = Product.objects.create(name="Bike do João", sku="CLI-1", ownership='CUSTOMER')
+        use_parts(Maintenance.objects.create(product_item=bike, customer_complaint="Freio"), {freio.pk: 3})
+
+        self.assertEqual(
+            list(freio.stock_movements.order_by('pk').values_list('kind', 'delta', 'reference')),
+            [
+                ('ADJUSTMENT', 5, "Estoque inicial"), ('SALE', -2, "Pedido #1"), ('RETURN', 1, "Pedido #1"),
+                ('ADJUSTMENT', 6, "Edição do produto"), ('MAINTENANCE', -3, "OS #1"),
+            ],
+        )
+        freio.refresh_from_db()
+        self.assertEqual(stock_at([freio.pk]), {freio.pk: freio.stock_quantity})
+
+    def test_save_uses_loaded_stock_and_keeps_moves_made_meanwhile(self):
+        Product.objects.create(name="Freio", sku="FRE", selling_price=80, stock_quantity=5)
+        freio = Product.objects.get(sku="FRE")
+        take_stock({freio.pk: 2}, reference="Pedido #1")
+
+        # A cópia lida antes da venda é salva com outro nome: o estoque vendido não volta
+        freio.name = "Freio a disco"
+        with CaptureQueriesContext(connection) as captured:
+            freio.save()
+        self.assertFalse([q for q in captured if q['sql'].startswith('SELECT "Assets_product"."stock_quantity"')])
+        self.assertEqual(Product.objects.get(pk=freio.pk).stock_quantity, 3)
+        self.assertEqual(freio.stock_movements.filter(kind=StockMovement.ADJUSTMENT).count(), 1)
+
+    def test_balance_at_any_date_from_snapshot_and_tail(self):
+        freio = Product.objects.create(name="Freio", sku="FRE", selling_price=80, stock_quantity=5)
+        take_stock({freio.pk: 2})
+        before_snapshot = timezone.now()
+        self.assertEqual(take_snapshots(cutoff=before_snapshot), 1)
+        put_back({freio.pk: 4})
+        after_return = timezone.now()
+        take_stock({freio.pk: 1})
+        # Lançamentos antes do snapshot não são mais lidos
+        StockMovement.objects.filter(created_at__lte=before_snapshot).update(delta=0)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(stock_at([freio.pk], when=after_return), {freio.pk: 7})
+        self.assertEqual(stock_at([freio.pk]), {freio.pk: 6})
+        self.assertEqual(take_snapshots(cutoff=after_return), 1)
+        self.assertEqual(take_snapshots(cutoff=after_return), 0)
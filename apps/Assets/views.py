@@ -1,28 +1,74 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import HttpResponse
+from django.template.loader import render_to_string
 from django.views import View
-from django.core.paginator import Paginator
-from django.db.models import Q
 from django.contrib import messages
 from django.db import transaction
+from django.db.models import Exists, OuterRef
 
-from .models import Product, Category
+from .models import Product, TechnicalSpec
 from .forms import ProductForm, TechnicalSpecForm
+from .search import get_search_backend
+from .cache import normalize_catalog_params, get_cached_fragment, catalog_cache_key
+from .related import related_products_for
+from .categories import get_category_tree
+from .facets import compute_facets, filter_queryset, filter_spec_ranges
+from Common.pagination import CursorPaginator
 
 # --- CATÁLOGO PÚBLICO ---
 
+# Ordenações pela ficha técnica (campo de TechnicalSpec)
+SPEC_ORDERINGS = {
+    'speed_desc': '-max_speed',
+    'power_desc': '-wattage',
+    'voltage_desc': '-voltage',
+    'weight_asc': 'weight',
+}
+
 class Bikes(View):
     def get(self, request, *args, **kwargs):
-        # 1. Captura o parâmetro da URL (Vem 'BIKE' ou 'PART')
-        product_type_param = request.GET.get('product_type', 'BIKE')
-        
-        # 2. Inicia a Query Base (Apenas produtos da loja e ativos)
+        # Parâmetros normalizados: mesma combinação de filtros = mesma chave de cache
+        params = normalize_catalog_params(request.GET)
+
+        # O fragmento não depende do usuário, então é cacheado para todos
+        # e invalidado pela versão do catálogo (ver Assets/cache.py)
+        bikes_html = get_cached_fragment(
+            params,
+            lambda: render_to_string("partials/bikes_list.html", self.get_catalog_context(params))
+        )
+
+        # Contagens da sidebar: não dependem da página nem da ordenação
+        facets_html = get_cached_fragment(
+            {**params, 'cursor': '', 'ordering': ''},
+            lambda: render_to_string("partials/catalog_facets.html", {
+                'facets': self.get_facets(params), 'params': params,
+            }),
+            prefix='facets',
+        )
+
+        if request.headers.get('HX-Request'):
+            # A sidebar é atualizada junto (out-of-band) com as novas contagens
+            return HttpResponse(
+                f'{bikes_html}<div id="catalogFacets" hx-swap-oob="innerHTML">{facets_html}</div>'
+            )
+
+        context = {
+            'bikes_html': bikes_html,
+            'facets_html': facets_html,
+            'active_type': params['product_type'],
+        }
+        return render(request, "public/bike_catalog.html", context)
+
+    def get_base_queryset(self, params):
+        # 1. Inicia a Query Base (Apenas produtos da loja e ativos)
+        # (a capa vem de Product.cover_image, então a galeria não é carregada)
         queryset = Product.objects.filter(
             ownership='SHOP', 
             is_active=True
-        ).select_related('category', 'specs').prefetch_related('images')
+        ).select_related('category', 'specs')
         
-        # 3. LÓGICA CORRIGIDA: Mapeia o filtro da URL para os tipos do Banco
-        if product_type_param == 'PART':
+        # 2. Mapeia o filtro da URL ('BIKE' ou 'PART') para os tipos do Banco
+        if params['product_type'] == 'PART':
             # Se selecionou "Peças", traz Componentes, Kits e Acessórios
             # (Exclui BIKE e SERVICE)
             queryset = queryset.filter(product_type__in=['COMPONENT', 'KIT', 'ACCESSORY'])
@@ -30,58 +76,81 @@ class Bikes(View):
             # Padrão: Traz apenas Bicicletas
             queryset = queryset.filter(product_type='BIKE')
         
-        # --- FILTROS ADICIONAIS (Busca, Categoria, Condição, etc.) ---
-        search_query = request.GET.get('search')
-        if search_query:
-            queryset = queryset.filter(
-                Q(name__icontains=search_query) | 
-                Q(description__icontains=search_query) |
-                Q(sku__icontains=search_query)
-            )
-
-        category_val = request.GET.get('category')
-        if category_val:
-            # Filtra pelo nome da categoria (ex: Mountain Bike, Elétrica, etc)
-            queryset = queryset.filter(category__name=category_val)
-
-        condition_val = request.GET.get('condition')
-        if condition_val in ['NEW', 'USED']:
-            queryset = queryset.filter(condition=condition_val)
+        # --- BUSCA ---
+        if params['search']:
+            # Backend definido em settings.CATALOG_SEARCH_BACKEND (ver Assets/search.py)
+            queryset = get_search_backend().filter(queryset, params['search'])
+        return queryset
+
+    def get_facets(self, params):
+        # Uma consulta agrupada para todas as facetas (ver Assets/facets.py); as
+        # faixas da ficha técnica (?wattage_min=...) restringem também as contagens
+        return compute_facets(filter_spec_ranges(self.get_base_queryset(params), params), params)
+
+    def get_catalog_context(self, params):
+        # --- FILTROS ADICIONAIS (Categoria, Condição, Voltagem, Potência, Preço) ---
+        queryset = filter_queryset(self.get_base_queryset(params), params)
+        search_query = params['search']
+        search_backend = get_search_backend()
 
         # --- ORDENAÇÃO ---
-        ordering_val = request.GET.get('ordering')
+        ordering_val = params['ordering']
         
         if ordering_val == 'price_asc':
-            queryset = queryset.order_by('selling_price')
+            ordering = ['selling_price']
         elif ordering_val == 'price_desc':
-            queryset = queryset.order_by('-selling_price')
+            ordering = ['-selling_price']
         elif ordering_val == 'newest':
-            queryset = queryset.order_by('-created_at')
+            ordering = ['-created_at']
+        elif ordering_val in SPEC_ORDERINGS:
+            # Ordenar pela ficha técnica lista só quem tem o dado preenchido
+            spec_field = SPEC_ORDERINGS[ordering_val]
+            spec_name = spec_field.lstrip('-')
+            queryset = queryset.filter(**{f'specs__{spec_name}__isnull': False})
+            if not search_query:
+                return self.get_spec_sorted_context(queryset, params, spec_field)
+            ordering = [spec_field.replace(spec_name, f'specs__{spec_name}')]
+        elif search_query and search_backend.ranked and ordering_val in ('', 'relevance'):
+            ordering = ['search_rank', '-is_featured', '-created_at']
         else:
-            queryset = queryset.order_by('-is_featured', '-created_at')
-
-        # --- PAGINAÇÃO ---
-        paginator = Paginator(queryset, 9) 
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+            ordering = ['-is_featured', '-created_at']
 
-        # Helper para URL
-        params = request.GET.copy()
-        if 'page' in params:
-            del params['page']
+        # --- PAGINAÇÃO (cursor/keyset, ver Common/pagination.py) ---
+        count_key = catalog_cache_key('count', {**params, 'cursor': ''})  # o total não depende da página
+        paginator = CursorPaginator(queryset, 9, ordering, count_key=count_key, not_null=[
+            key.lstrip('-') for key in ordering if key.lstrip('-').startswith('specs__')
+        ])
+        page_obj = paginator.get_page(params['cursor'])
 
-        context = {
+        return {
             'bikes': page_obj,
-            'total_count': queryset.count(),
-            'categories': Category.objects.all(),
-            'current_params': params.urlencode(),
-            'active_type': product_type_param 
+            'paginator': paginator,
+            'active_type': params['product_type'],
         }
 
-        if request.headers.get('HX-Request'):
-            return render(request, "partials/bikes_list.html", context)
-
-        return render(request, "public/bike_catalog.html", context)
+    def get_spec_sorted_context(self, queryset, params, spec_field):
+        """
+        Página ordenada pela ficha técnica montada a partir de TechnicalSpec: o
+        banco percorre spec_*_idx já na ordem e confere o produto pelo pk
+        (EXISTS), parando no LIMIT. Partindo de Product, teria que juntar e
+        ordenar o catálogo inteiro a cada página.
+        """
+        spec_name = spec_field.lstrip('-')
+        specs = TechnicalSpec.objects.filter(
+            Exists(queryset.filter(pk=OuterRef('product_id'))),
+        ).select_related('product__category')
+
+        count_key = catalog_cache_key('count', {**params, 'cursor': ''})
+        paginator = CursorPaginator(specs, 9, [spec_field], count_key=count_key, not_null=[spec_name])
+        page_obj = paginator.get_page(params['cursor'])
+        # Os cards esperam produtos (product.specs já vem do select_related)
+        page_obj.object_list = [spec.product for spec in page_obj.object_list]
+
+        return {
+            'bikes': page_obj,
+            'paginator': paginator,
+            'active_type': params['product_type'],
+        }
 
 def bike_detail(request, pk):
     product = get_object_or_404(
@@ -89,21 +158,15 @@ def bike_detail(request, pk):
         pk=pk
     )
     
-    # Busca relacionados da mesma categoria
-    related_queryset = Product.objects.filter(
-        category=product.category, 
-        is_active=True,
-        ownership='SHOP' 
-    ).exclude(pk=pk)
-    
-    # Filtra pelo mesmo tipo (Se estou vendo peça, mostre peças relacionadas)
-    related_queryset = related_queryset.filter(product_type=product.product_type)
-        
-    related_products = related_queryset.order_by('?')[:3]
+    # Relacionados pelo índice pré-calculado (categoria/tipo + co-compras)
+    related_products = related_products_for(product, limit=3)
 
     context = {
         'bike': product,
-        'related_bikes': related_products
+        'related_bikes': related_products,
+        # Raiz > ... > categoria do produto, pela árvore em memória (sem query)
+        'category_breadcrumbs': get_category_tree().ancestors(product.category_id),
+        'catalog_type': 'BIKE' if product.product_type == 'BIKE' else 'PART',
     }
     
     return render(request, 'public/bike_detail.html', context)
@@ -1,7 +1,8 @@
 from django.contrib import admin
 from unfold.admin import ModelAdmin, TabularInline
 from unfold.decorators import display
-from .models import Invoice, Payment, Refund
+from .inbox import replay
+from .models import Invoice, Payment, Refund, StripeEvent
 from django.db.models import Sum
 
 class PaymentInline(TabularInline):
@@ -40,3 +41,18 @@ class PaymentAdmin(ModelAdmin):
     )
     def method_badge(self, obj):
         return obj.method
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(ModelAdmin):
+    list_display = ('event_id', 'event_type', 'order', 'status', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('status', 'event_type')
+    search_fields = ('event_id',)
+    readonly_fields = (
+        'event_id', 'event_type', 'order', 'payload', 'attempts', 'last_error', 'received_at', 'processed_at',
+    )
+    actions = ['replay_events']
+
+    @admin.action(description="Reprocessar (volta para a fila do worker)")
+    def replay_events(self, request, queryset):
+        self.message_user(request, f"{replay(queryset, include_done=True)} evento(s) de volta na fila.")
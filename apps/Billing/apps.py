@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class BillingConfig(AppConfig):
     name = 'Billing'
+
+    def ready(self):
+        import Billing.signals  # noqa: F401
@@ -0,0 +1,233 @@
+"""
+Stripe de mentira para desenvolvimento e teste de carga (só biblioteca padrão).
+
+Responde o pedaço da API que o Billing usa, no mesmo formato do Stripe, e
+entrega o webhook assinado com o segredo de verdade (STRIPE_WH):
+
+    POST /v1/checkout/sessions        cria a sessão (form-encoded, como o
+                                      cliente stripe manda) e devolve a url
+    GET  /v1/checkout/sessions/<id>   consulta
+    GET  /pay/<id>                    a "página do Stripe" (a url da sessão)
+    POST /pay/<id>                    "cliente pagou": marca a sessão, gera o
+                                      checkout.session.completed assinado e
+                                      volta para o success_url
+
+O webhook vai por HTTP para `webhook_url` (comando fake_stripe + runserver)
+ou, sem url, fica em `deliveries` para quem estiver dirigindo o cenário
+(bench_payment_flow) postar no endpoint. `latency` (segundos, + `jitter`)
+atrasa cada chamada da API e `error_rate` devolve 500 no formato de erro do
+Stripe nessa fração das chamadas. Para apontar o cliente stripe para cá:
+STRIPE_API_BASE=http://127.0.0.1:<porta>.
+
+    with FakeStripeServer(latency=0.2) as fake:
+        ... STRIPE_API_BASE=fake.url ...
+        fake.pay(session_id)   # -> (payload, Stripe-Signature)
+"""
+import itertools
+import json
+import random
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+from django.conf import settings
+
+from .inbox import sign_payload
+
+
+def _unflatten(pairs):
+    """line_items[0][price_data][unit_amount]=100 -> {'line_items': [{'price_data': {'unit_amount': '100'}}]}."""
+    root = {}
+    for key, value in pairs:
+        parts = key.replace(']', '').split('[')
+        node = root
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = value
+
+    def listify(node):
+        if not isinstance(node, dict):
+            return node
+        if node and all(key.isdigit() for key in node):
+            return [listify(node[key]) for key in sorted(node, key=int)]
+        return {key: listify(value) for key, value in node.items()}
+
+    return listify(root)
+
+
+class _StripeHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Request-Id', f'req_fake_{next(self.server.ids)}')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def api(self, action):
+        server = self.server
+        server.before_call()
+        if server.should_fail():
+            return self.reply(500, {'error': {'type': 'api_error', 'message': 'Erro injetado pelo Stripe de mentira'}})
+        return action()
+
+    def page(self, session_id):
+        session = self.server.sessions.get(session_id)
+        if session is None:
+            return self.reply(404, {'error': {'type': 'invalid_request_error', 'message': 'No such checkout.session'}})
+        data = (
+            f"<h1>Stripe de mentira</h1><p>{session['id']}: {session['amount_total'] / 100:.2f} "
+            f"{session['currency'].upper()}</p><form method='post'><button>Pagar</button></form>"
+        ).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.startswith('/pay/'):
+            return self.page(self.path[len('/pay/'):])
+        prefix = '/v1/checkout/sessions/'
+        if self.path.startswith(prefix):
+            session = self.server.sessions.get(self.path[len(prefix):])
+            if session is None:
+                return self.reply(404, {'error': {'type': 'invalid_request_error', 'message': 'No such checkout.session'}})
+            return self.api(lambda: self.reply(200, session))
+        return self.reply(404, {'error': {'type': 'invalid_request_error', 'message': 'Unrecognized request URL'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode()
+        if self.path == '/v1/checkout/sessions':
+            params = _unflatten(parse_qsl(body, keep_blank_values=True))
+            return self.api(lambda: self.reply(200, self.server.create_session(params)))
+        if self.path.startswith('/pay/'):
+            session_id = self.path[len('/pay/'):]
+            if self.server.pay(session_id) is None:
+                return self.reply(404, {'error': {'type': 'invalid_request_error', 'message': 'No such checkout.session'}})
+            self.send_response(303)
+            self.send_header('Location', self.server.sessions[session_id]['success_url'] or '/')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return None
+        return self.reply(404, {'error': {'type': 'invalid_request_error', 'message': 'Unrecognized request URL'}})
+
+
+class FakeStripeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, webhook_url=None, webhook_secret=None,
+                 latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        super().__init__((host, port), _StripeHandler)
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret or settings.STRIPE_WH
+        self.latency, self.jitter, self.error_rate = latency, jitter, error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.sessions = {}
+        self.deliveries = []  # (payload, assinatura) sem webhook_url
+        self.calls = 0
+        self.errors = 0
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    @property
+    def url(self):
+        return f'http://{self.server_address[0]}:{self.port}'
+
+    def before_call(self):
+        with self.lock:
+            self.calls += 1
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+    def should_fail(self):
+        with self.lock:
+            failed = self.error_rate and self.random.random() < self.error_rate
+            self.errors += bool(failed)
+        return failed
+
+    def create_session(self, params):
+        line_items = params.get('line_items') or []
+        amount_total = sum(
+            int(item.get('price_data', {}).get('unit_amount', 0)) * int(item.get('quantity', 1)) for item in line_items
+        )
+        with self.lock:
+            session_id = f'cs_test_fake_{next(self.ids)}'
+            session = {
+                'id': session_id,
+                'object': 'checkout.session',
+                'url': f'{self.url}/pay/{session_id}',
+                'mode': params.get('mode', 'payment'),
+                'status': 'open',
+                'payment_status': 'unpaid',
+                'amount_total': amount_total,
+                'currency': (line_items[0].get('price_data', {}).get('currency') if line_items else None) or 'brl',
+                'payment_intent': None,
+                'metadata': params.get('metadata') or {},
+                'expires_at': int(params['expires_at']) if params.get('expires_at') else None,
+                'success_url': params.get('success_url'),
+                'cancel_url': params.get('cancel_url'),
+            }
+            self.sessions[session_id] = session
+        return session
+
+    def pay(self, session_id):
+        """
+        Conclui a sessão e entrega o webhook (POST em webhook_url, ou guarda
+        em deliveries). Retorna (payload, assinatura), ou None se não existe.
+        """
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return None
+            number = next(self.ids)
+            session.update(status='complete', payment_status='paid', payment_intent=f'pi_test_fake_{number}')
+            payload = json.dumps({
+                'id': f'evt_test_fake_{number}',
+                'object': 'event',
+                'type': 'checkout.session.completed',
+                'created': int(time.time()),
+                'data': {'object': dict(session)},
+            })
+        delivery = (payload, sign_payload(payload, self.webhook_secret))
+        if self.webhook_url:
+            self.deliver(*delivery)
+        else:
+            with self.lock:
+                self.deliveries.append(delivery)
+        return delivery
+
+    def deliver(self, payload, signature):
+        request = urllib.request.Request(
+            self.webhook_url, data=payload.encode(), method='POST',
+            headers={'Content-Type': 'application/json', 'Stripe-Signature': signature},
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
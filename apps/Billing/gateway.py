@@ -0,0 +1,260 @@
+"""
+Cliente do Stripe com latência limitada, compartilhado pelo Billing.
+
+Antes, process_payment chamava o módulo global `stripe` com o cliente HTTP
+padrão (timeout de 80s, conexão nova a cada chamada): um Stripe lento
+segurava o worker do gunicorn, e qualquer erro virava uma página 500.
+
+    conexões    uma requests.Session por processo, com pool keep-alive
+                (STRIPE_POOL_SIZE): sem handshake TLS a cada chamada
+    timeouts    STRIPE_CONNECT_TIMEOUT / STRIPE_READ_TIMEOUT, e um prazo
+                total (STRIPE_DEADLINE) que as retentativas não passam
+    retentativa só em chamada idempotente (GET, ou POST com
+                idempotency_key), com espera exponencial e jitter
+                completo, até STRIPE_MAX_RETRIES
+    disjuntor   STRIPE_BREAKER_THRESHOLD chamadas que falharam de vez por
+                indisponibilidade (timeout, conexão, 5xx, 429, já com as
+                retentativas) em STRIPE_BREAKER_WINDOW
+                segundos abrem o circuito por STRIPE_BREAKER_COOLDOWN
+                segundos: as chamadas falham na hora (GatewayUnavailable,
+                o checkout oferece o Pix). Depois, uma chamada de teste
+                passa; se der certo fecha, se falhar abre de novo. O estado
+                fica no cache, compartilhado entre os workers
+    métricas    cada chamada loga operação, latência, tentativas e
+                resultado (logger Billing.gateway) e entra em `stats`
+                (p50/p99 e falhas por operação, deste processo)
+
+Erros do Stripe que não são indisponibilidade (cartão recusado, parâmetro
+inválido, chave errada) passam direto, sem retentativa; para o disjuntor
+contam como resposta (numa chamada de teste, fecham o circuito).
+"""
+import logging
+import random
+import threading
+import time
+from collections import defaultdict, deque
+
+import requests
+import stripe
+from django.conf import settings
+from django.core.cache import cache
+
+from Common.benchmark import summarize
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE = (stripe.APIConnectionError, stripe.APIError, stripe.RateLimitError)
+
+DEFAULTS = {
+    'STRIPE_CONNECT_TIMEOUT': 3.0,
+    'STRIPE_READ_TIMEOUT': 10.0,
+    'STRIPE_DEADLINE': 15.0,
+    'STRIPE_MAX_RETRIES': 2,
+    'STRIPE_POOL_SIZE': 10,
+    'STRIPE_BREAKER_THRESHOLD': 5,
+    'STRIPE_BREAKER_WINDOW': 60,
+    'STRIPE_BREAKER_COOLDOWN': 30,
+}
+
+
+def _setting(name):
+    return getattr(settings, name, DEFAULTS[name])
+
+
+class GatewayUnavailable(Exception):
+    """O Stripe não respondeu a tempo (ou o circuito está aberto): ofereça outra forma de pagamento."""
+
+
+class CircuitBreaker:
+    """Disjuntor com estado no cache (vale para todos os workers que dividem o cache)."""
+
+    def __init__(self, name, threshold, window, cooldown):
+        self.threshold, self.window, self.cooldown = threshold, window, cooldown
+        self.failures_key = f'breaker:{name}:failures'
+        self.open_key = f'breaker:{name}:open'
+        self.tripped_key = f'breaker:{name}:tripped'
+        self.probe_key = f'breaker:{name}:probe'
+
+    @property
+    def state(self):
+        if cache.get(self.open_key):
+            return 'open'
+        return 'half-open' if cache.get(self.tripped_key) else 'closed'
+
+    def allow(self, probe_timeout):
+        """Pode chamar? Meio aberto, só uma chamada de teste por vez (retorna 'probe' para ela)."""
+        state = self.state
+        if state == 'open':
+            return False
+        if state == 'half-open':
+            return 'probe' if cache.add(self.probe_key, 1, probe_timeout) else False
+        return True
+
+    def release_probe(self):
+        cache.delete(self.probe_key)
+
+    def record_success(self):
+        if cache.get(self.tripped_key):
+            cache.delete_many([self.tripped_key, self.probe_key, self.failures_key])
+            logger.warning("Stripe respondeu de novo: circuito fechado")
+
+    def record_failure(self):
+        if cache.get(self.tripped_key):
+            # A chamada de teste falhou
+            self._trip()
+            return
+        cache.add(self.failures_key, 0, self.window)
+        try:
+            failures = cache.incr(self.failures_key)
+        except ValueError:  # a janela venceu entre o add e o incr
+            failures = 1
+            cache.set(self.failures_key, failures, self.window)
+        if failures >= self.threshold:
+            self._trip()
+
+    def _trip(self):
+        cache.set(self.open_key, 1, self.cooldown)
+        cache.set(self.tripped_key, 1, None)
+        cache.delete_many([self.failures_key, self.probe_key])
+        logger.error("Stripe indisponível: circuito aberto por %ss", self.cooldown)
+
+    def reset(self):
+        cache.delete_many([self.failures_key, self.open_key, self.tripped_key, self.probe_key])
+
+
+class CallStats:
+    """Latência e falhas por operação, das últimas `size` chamadas de cada uma (deste processo)."""
+
+    def __init__(self, size=1000):
+        self.lock = threading.Lock()
+        self.timings = defaultdict(lambda: deque(maxlen=size))
+        self.counts = defaultdict(lambda: defaultdict(int))
+
+    def record(self, operation, outcome, elapsed_ms=None):
+        with self.lock:
+            self.counts[operation][outcome] += 1
+            if elapsed_ms is not None:  # rejeitada pelo disjuntor não entra na latência
+                self.timings[operation].append(elapsed_ms)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                operation: {**summarize(list(self.timings[operation])), **self.counts[operation]}
+                for operation in self.counts
+            }
+
+    def reset(self):
+        with self.lock:
+            self.timings.clear()
+            self.counts.clear()
+
+
+class StripeGateway:
+    def __init__(self):
+        self.connect_timeout = _setting('STRIPE_CONNECT_TIMEOUT')
+        self.read_timeout = _setting('STRIPE_READ_TIMEOUT')
+        self.deadline = _setting('STRIPE_DEADLINE')
+        self.max_retries = _setting('STRIPE_MAX_RETRIES')
+        pool_size = _setting('STRIPE_POOL_SIZE')
+
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        self.session = session
+        # Retentativas ficam aqui (com prazo e só no que é idempotente), não no SDK
+        self.client = stripe.StripeClient(
+            settings.STRIPE_SK,
+            base_addresses={'api': settings.STRIPE_API_BASE},
+            max_network_retries=0,
+            http_client=stripe.RequestsClient(timeout=(self.connect_timeout, self.read_timeout), session=session),
+        )
+        self.breaker = CircuitBreaker(
+            'stripe', _setting('STRIPE_BREAKER_THRESHOLD'),
+            _setting('STRIPE_BREAKER_WINDOW'), _setting('STRIPE_BREAKER_COOLDOWN'),
+        )
+        self.stats = CallStats()
+
+    def available(self):
+        return self.breaker.state != 'open'
+
+    def backoff(self, attempt):
+        """Jitter completo: aleatório entre 0 e 0,25s * 2^tentativa."""
+        return random.uniform(0, 0.25 * 2 ** attempt)
+
+    def call(self, operation, func, idempotent):
+        """Chama func() com disjuntor, prazo e retentativa; registra a latência da chamada inteira."""
+        allowed = self.breaker.allow(self.read_timeout)
+        if not allowed:
+            self.stats.record(operation, 'rejected')
+            logger.info("stripe %s rejeitada: circuito aberto", operation)
+            raise GatewayUnavailable(f"{operation}: circuito aberto")
+
+        start = time.perf_counter()
+        attempt = 0
+        outcome = 'ok'
+        try:
+            while True:
+                try:
+                    result = func()
+                except RETRYABLE as exc:
+                    wait = self.backoff(attempt)
+                    spent = time.perf_counter() - start
+                    if (not idempotent or attempt >= self.max_retries
+                            or spent + wait + self.read_timeout > self.deadline):
+                        # Só a chamada que falhou de vez conta para o disjuntor
+                        self.breaker.record_failure()
+                        outcome = 'unavailable'
+                        raise GatewayUnavailable(f"{operation}: {type(exc).__name__}: {exc}") from exc
+                    attempt += 1
+                    time.sleep(wait)
+                except stripe.StripeError:
+                    # Recusa, parâmetro inválido...: o Stripe respondeu, então está de pé
+                    self.breaker.record_success()
+                    outcome = 'error'
+                    raise
+                else:
+                    self.breaker.record_success()
+                    return result
+        finally:
+            if allowed == 'probe':
+                # Chamada de teste que saiu por outro motivo não deixa o circuito preso
+                self.breaker.release_probe()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.stats.record(operation, outcome, elapsed_ms)
+            logger.info("stripe %s %s em %.1fms (%d tentativa(s))", operation, outcome, elapsed_ms, attempt + 1)
+
+    # --- OPERAÇÕES ---
+
+    def create_checkout_session(self, params, idempotency_key):
+        """Sessão de checkout. Com a mesma chave (mesmo pedido e valor), o Stripe devolve a mesma sessão."""
+        return self.call(
+            'checkout.create',
+            lambda: self.client.v1.checkout.sessions.create(params, {'idempotency_key': idempotency_key}),
+            idempotent=True,
+        )
+
+    def retrieve_checkout_session(self, session_id):
+        return self.call(
+            'checkout.retrieve', lambda: self.client.v1.checkout.sessions.retrieve(session_id), idempotent=True,
+        )
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """O cliente do processo (criado no primeiro uso, com o pool de conexões)."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = StripeGateway()
+    return _gateway
+
+
+def reset_gateway():
+    """Descarta o cliente: o próximo get_gateway() relê as configurações."""
+    global _gateway
+    _gateway = None
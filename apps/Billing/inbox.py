@@ -0,0 +1,185 @@
+"""
+Inbox dos webhooks do Stripe.
+
+Antes, o webhook fazia tudo dentro do request (busca da fatura, Payment,
+save da fatura e do pedido) e sem deduplicar: com a resposta demorando, o
+Stripe reenviava o evento e cada reenvio virava outro Payment.
+
+    endpoint  verifica a assinatura, grava o StripeEvent (um INSERT que
+              ignora event_id repetido) e responde 200
+    worker    process_stripe_events: reivindica um lote de pendentes com um
+              UPDATE de posse (como a outbox de e-mails, Orders/outbox.py) e
+              processa cada evento numa transação junto com a marcação de
+              processado — o efeito e o DONE entram juntos ou não entram. Os
+              que falham voltam para a fila com espera crescente, até
+              STRIPE_EVENT_MAX_ATTEMPTS (aí ficam FAILED)
+    ordem     um evento só é pego quando não há evento anterior pendente do
+              mesmo pedido (nem um em posse de outro worker)
+    replay    replay_stripe_events devolve FAILED / presos para a fila
+
+O processamento também é idempotente por si (Payment por checkout session,
+pedido já aprovado não aprova de novo): reprocessar um evento não duplica.
+Pagamento confirmado sem estoque para aprovar (a reserva venceu e a
+unidade foi para outro pedido) não volta para a fila: o Payment e a fatura
+paga ficam, e o pedido vai para PAYMENT_REVIEW com uma nota na timeline.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from Assets.stock import InsufficientStock
+from Orders.models import Order, OrderTimeline
+from Orders.outbox import retry_delay
+from .models import Invoice, Payment, StripeEvent
+
+logger = logging.getLogger(__name__)
+
+LEASE = timedelta(minutes=5)
+
+
+class LeaseLost(Exception):
+    """A posse do evento venceu no meio do processamento (outro worker pegou)."""
+
+
+# --- ENDPOINT ---
+
+def sign_payload(payload, secret, timestamp=None):
+    """Cabeçalho Stripe-Signature (esquema v1) para `payload` — testes, benchmark e Stripe local."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def _order_id(event):
+    metadata = (event.get('data') or {}).get('object', {}).get('metadata') or {}
+    try:
+        return int(metadata.get('order_id'))
+    except (TypeError, ValueError):
+        return None
+
+
+def receive_event(payload, signature):
+    """
+    Verifica a assinatura e grava o evento (repetido é ignorado). Levanta
+    stripe.SignatureVerificationError ou ValueError se o payload não vale.
+    """
+    if isinstance(payload, bytes):
+        payload = payload.decode('utf-8')
+    stripe.WebhookSignature.verify_header(payload, signature, settings.STRIPE_WH, stripe.Webhook.DEFAULT_TOLERANCE)
+    event = json.loads(payload)
+    StripeEvent.objects.bulk_create([
+        StripeEvent(event_id=event['id'], event_type=event['type'], order_id=_order_id(event), payload=event)
+    ], ignore_conflicts=True)
+
+
+# --- PROCESSAMENTO ---
+
+def handle_checkout_completed(event):
+    """Pagamento do checkout do Stripe: Payment na fatura do pedido e pedido aprovado (baixa o estoque)."""
+    session = event.payload['data']['object']
+    order = Order.objects.get(pk=event.order_id)
+    # Número em branco: Invoice.save() tira o próximo da sequência do ano (numbering.py)
+    invoice, _ = Invoice.objects.get_or_create(order=order, defaults={'due_date': timezone.localdate()})
+    if not invoice.payments.filter(stripe_checkout_id=session['id']).exists():
+        Payment.objects.create(
+            invoice=invoice,
+            amount=Decimal(session.get('amount_total') or 0) / 100,  # centavos
+            method='CC',
+            stripe_checkout_id=session['id'],
+            transaction_id=session.get('payment_intent') or '',
+        )
+    if not invoice.is_paid:
+        invoice.is_paid = True
+        invoice.save(update_fields=['is_paid', 'updated_at'])
+    try:
+        # approve_payment tem a própria savepoint: a falta de estoque desfaz só a aprovação
+        order.approve_payment()
+    except InsufficientStock as exc:
+        # O cliente já pagou: o pagamento fica registrado e o pedido vai para revisão
+        logger.error("Pedido #%s pago sem estoque: %s", order.pk, exc)
+        if order.status != 'PAYMENT_REVIEW':
+            order.status = 'PAYMENT_REVIEW'
+            order.save()
+            OrderTimeline.objects.create(
+                order=order, status='PAYMENT_REVIEW', note=f"Pago, mas {exc}. Repor ou reembolsar."[:200],
+            )
+
+
+# Tipo de evento -> handler; os outros ficam registrados e são marcados como processados
+HANDLERS = {
+    'checkout.session.completed': handle_checkout_completed,
+}
+
+
+def claim_batch(batch_size, now=None):
+    now = now or timezone.now()
+    earlier_pending = StripeEvent.objects.filter(order=OuterRef('order'), pk__lt=OuterRef('pk'), status='PENDING')
+    ids = list(
+        StripeEvent.objects.filter(status='PENDING', next_attempt_at__lte=now)
+        .exclude(Exists(earlier_pending))
+        .order_by('next_attempt_at', 'pk').values_list('pk', flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    lease_until = now + LEASE
+    StripeEvent.objects.filter(pk__in=ids, status='PENDING', next_attempt_at__lte=now).update(
+        next_attempt_at=lease_until
+    )
+    return list(StripeEvent.objects.filter(pk__in=ids, status='PENDING', next_attempt_at=lease_until).order_by('pk'))
+
+
+def process_event(event):
+    with transaction.atomic():
+        handler = HANDLERS.get(event.event_type)
+        if handler and event.order_id:
+            handler(event)
+        marked = StripeEvent.objects.filter(
+            pk=event.pk, status='PENDING', next_attempt_at=event.next_attempt_at
+        ).update(status='DONE', processed_at=timezone.now(), attempts=F('attempts') + 1, last_error='')
+        if not marked:
+            # Desfaz o efeito: quem está com a posse agora processa
+            raise LeaseLost(event.event_id)
+
+
+def process_pending(batch_size=100, max_attempts=None):
+    """Processa um lote. Retorna (processados, falhas)."""
+    max_attempts = max_attempts or getattr(settings, 'STRIPE_EVENT_MAX_ATTEMPTS', 8)
+    done = failed = 0
+    for event in claim_batch(batch_size):
+        try:
+            process_event(event)
+        except LeaseLost:
+            continue
+        except Exception as exc:
+            logger.exception("Falha ao processar o evento %s do Stripe", event.event_id)
+            attempts = event.attempts + 1
+            StripeEvent.objects.filter(pk=event.pk, next_attempt_at=event.next_attempt_at).update(
+                attempts=attempts,
+                last_error=f"{type(exc).__name__}: {exc}"[:1000],
+                status='FAILED' if attempts >= max_attempts else 'PENDING',
+                next_attempt_at=timezone.now() + retry_delay(attempts),
+            )
+            failed += 1
+        else:
+            done += 1
+    return done, failed
+
+
+def replay(events, include_done=False, now=None):
+    """
+    Devolve eventos para a fila, vencendo já (FAILED, ou PENDING preso numa
+    posse ou espera longa): a próxima rodada do worker pega. Retorna quantos.
+    """
+    if not include_done:
+        events = events.exclude(status='DONE')
+    return events.update(status='PENDING', next_attempt_at=now or timezone.now())
@@ -0,0 +1,77 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Max
+from django.test import TestCase
+from django.utils import timezone
+
+from Billing.models import Invoice, InvoiceSequence
+from Billing.numbering import InvoiceNumberer, format_number
+from Clients.models import Client
+from Common.benchmark import rollback_after, summarize
+from Orders.models import Order
+
+PREFIX = 'BENCHNF'
+
+
+def legacy_next_number(year):
+    """O jeito sem sequência: o maior número do ano + 1 (varre as faturas do ano)."""
+    last = Invoice.objects.filter(invoice_number__startswith=f'{year}-').aggregate(last=Max('invoice_number'))['last']
+    return format_number(year, int(last.rsplit('-', 1)[1]) + 1 if last else 1)
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a emissão de faturas com muitas faturas no ano: número por MAX()+1 x sequência com '
+        'blocos por processo. Roda dentro de uma transação desfeita no final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--existing', type=int, default=100000, help='Faturas já emitidas no ano')
+        parser.add_argument('--invoices', type=int, default=500, help='Faturas emitidas por fluxo')
+        parser.add_argument('--block', type=int, default=50, help='INVOICE_NUMBER_BLOCK')
+
+    def handle(self, *args, **options):
+        with rollback_after():
+            year = timezone.localdate().year
+            client = Client.objects.create(user=get_user_model().objects.create(email=f'{PREFIX.lower()}@bench.local'))
+            orders = Order.objects.bulk_create(
+                [Order(client=client) for _ in range(options['existing'] + 2 * options['invoices'])], batch_size=5000,
+            )
+            Invoice.objects.bulk_create([
+                Invoice(order=order, invoice_number=format_number(year, i + 1), due_date=timezone.localdate())
+                for i, order in enumerate(orders[:options['existing']])
+            ], batch_size=5000)
+            pending = iter(orders[options['existing']:])
+
+            self.stdout.write(
+                f"🧾 {options['existing']} faturas no ano, {options['invoices']} emitidas por fluxo ({connection.vendor})"
+            )
+            self.stdout.write(f"{'numeração':<12} {'p50':>9} {'p99':>9} {'faturas/s':>10} {'escritas na sequência':>22}")
+            self._issue('MAX()+1', lambda: legacy_next_number(year), pending, options, lambda: 0)
+
+            # As faturas de antes como se tivessem saído da sequência
+            InvoiceSequence.objects.update_or_create(
+                year=year, defaults={'next_value': options['existing'] + options['invoices'] + 1}
+            )
+            numberer = InvoiceNumberer(size=options['block'])
+            self._issue('sequência', numberer.next_number, pending, options, lambda: numberer.allocations)
+
+    def _issue(self, label, next_number, orders, options, allocations):
+        timings = []
+        start = time.perf_counter()
+        for _ in range(options['invoices']):
+            begin = time.perf_counter()
+            # Cada fatura como na sua própria transação: os on_commit rodam (a transação
+            # de fora, que desfaz o benchmark, nunca faz commit)
+            with TestCase.captureOnCommitCallbacks(execute=True):
+                Invoice.objects.create(order=next(orders), invoice_number=next_number(), due_date=timezone.localdate())
+            timings.append((time.perf_counter() - begin) * 1000)
+        elapsed = time.perf_counter() - start
+        stats = summarize(timings)
+        self.stdout.write(
+            f"{label:<12} {stats['p50']:>7.2f}ms {stats['p99']:>7.2f}ms {len(timings) / elapsed:>10.1f} "
+            f"{allocations():>22}"
+        )
@@ -0,0 +1,127 @@
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client as HttpClient, override_settings
+from django.urls import reverse
+
+from Assets.models import Product
+from Billing.fake_stripe import FakeStripeServer
+from Billing.gateway import get_gateway
+from Billing.inbox import process_pending
+from Billing.models import Payment
+from Clients.models import Client
+from Common.benchmark import rollback_after, summarize
+from Orders.models import Order, OrderItem
+
+PREFIX = 'BENCHPAY'
+STEPS = ('checkout', 'pagamento', 'webhook', 'worker')
+
+
+class Command(BaseCommand):
+    help = (
+        'Carga do pagamento com cartão de ponta a ponta contra o Stripe de mentira: process_payment '
+        '(cria a sessão) -> cliente paga -> stripe_webhook -> worker. Mostra p50/p99 de cada etapa. '
+        'Roda dentro de uma transação desfeita no final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200, help='Pedidos pagos com cartão')
+        parser.add_argument('--latency', type=float, default=0.0, help='Atraso de cada chamada ao Stripe (segundos)')
+        parser.add_argument('--jitter', type=float, default=0.0, help='Atraso extra aleatório, até N segundos')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fração das chamadas ao Stripe que devolve 500')
+        parser.add_argument('--retries', type=int, default=settings.STRIPE_MAX_RETRIES,
+                            help='Retentativas do cliente (STRIPE_MAX_RETRIES)')
+        parser.add_argument('--read-timeout', type=float, default=settings.STRIPE_READ_TIMEOUT,
+                            help='Timeout de leitura do cliente (STRIPE_READ_TIMEOUT)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        fake = FakeStripeServer(
+            latency=options['latency'], jitter=options['jitter'],
+            error_rate=options['error_rate'], seed=options['seed'],
+        )
+        stripe_settings = {
+            'STRIPE_API_BASE': fake.url, 'STRIPE_MAX_RETRIES': options['retries'],
+            'STRIPE_READ_TIMEOUT': options['read_timeout'],
+        }
+        with fake, rollback_after(), override_settings(ALLOWED_HOSTS=['testserver'], **stripe_settings):
+            get_gateway().breaker.reset()
+            self._run(fake, options)
+
+    def _run(self, fake, options):
+        user = get_user_model().objects.create(email=f'{PREFIX.lower()}@bench.local')
+        client = Client.objects.create(user=user)
+        product = Product.objects.create(
+            name=PREFIX, slug=PREFIX.lower(), sku=PREFIX, product_type='COMPONENT',
+            selling_price=100, stock_quantity=10 ** 6,
+        )
+        orders = Order.objects.bulk_create([
+            Order(client=client, status='QUOTE', subtotal_amount=100, total_amount=100)
+            for _ in range(options['orders'])
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, unit_price=100, description=PREFIX) for order in orders
+        ])
+
+        http = HttpClient()
+        http.force_login(user)
+        # Aquece caches (configuração do site etc.) fora da medição
+        http.get('/')
+
+        self.stdout.write(
+            f"💳 {len(orders)} pedidos, Stripe de mentira com {options['latency'] * 1000:.0f}ms "
+            f"(+{options['jitter'] * 1000:.0f}ms) e {options['error_rate']:.0%} de erro, "
+            f"{options['retries']} retentativa(s) ({connection.vendor})"
+        )
+        timings, errors = defaultdict(list), defaultdict(int)
+        webhook_url = reverse('stripe_webhook')
+        start = time.perf_counter()
+        for order in orders:
+            begin = time.perf_counter()
+            response = http.post(reverse('process_payment', args=[order.pk]), {'payment_method': 'CARD'})
+            timings['checkout'].append((time.perf_counter() - begin) * 1000)
+            location = response.get('Location', '')
+            if not location.startswith(fake.url):
+                errors['checkout'] += 1
+                continue
+
+            begin = time.perf_counter()
+            payload, signature = fake.pay(location.rsplit('/', 1)[-1])
+            timings['pagamento'].append((time.perf_counter() - begin) * 1000)
+
+            begin = time.perf_counter()
+            response = http.post(webhook_url, payload, content_type='application/json',
+                                 HTTP_STRIPE_SIGNATURE=signature)
+            timings['webhook'].append((time.perf_counter() - begin) * 1000)
+            if response.status_code != 200:
+                errors['webhook'] += 1
+                continue
+
+            begin = time.perf_counter()
+            done, failed = process_pending(batch_size=1)
+            timings['worker'].append((time.perf_counter() - begin) * 1000)
+            errors['worker'] += failed
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(f"{'etapa':<10} {'n':>6} {'p50':>9} {'p99':>9} {'max':>9} {'erros':>6}")
+        for step in STEPS:
+            stats = summarize(timings[step])
+            self.stdout.write(
+                f"{step:<10} {len(timings[step]):>6} {stats['p50']:>7.2f}ms {stats['p99']:>7.2f}ms "
+                f"{stats['max']:>7.2f}ms {errors[step]:>6}"
+            )
+        paid = Payment.objects.filter(invoice__order__in=orders).count()
+        self.stdout.write(
+            f"{paid}/{len(orders)} pedidos pagos em {elapsed:.2f}s ({len(orders) / elapsed:.1f} pedidos/s); "
+            f"Stripe: {fake.calls} chamada(s), {fake.errors} erro(s) injetado(s)"
+        )
+        for operation, stats in get_gateway().stats.snapshot().items():
+            outcomes = ', '.join(f"{stats[key]} {key}" for key in ('ok', 'unavailable', 'rejected', 'error') if key in stats)
+            self.stdout.write(
+                f"gateway {operation}: {outcomes}; p50 {stats['p50']:.2f}ms, p99 {stats['p99']:.2f}ms "
+                f"(circuito {get_gateway().breaker.state})"
+            )
@@ -0,0 +1,112 @@
+import asyncio
+import random
+import time
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client as HttpClient, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from Billing.models import Invoice
+from Billing.status import get_hub, status_events
+from Clients.models import Client
+from Common.benchmark import rollback_after, summarize
+from Orders.models import Order
+
+PREFIX = 'BENCHPIX'
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o status do Pix em SSE com muitos clientes esperando: consultas do poller compartilhado '
+        'e atraso até o aviso, x cada cliente recarregando a página de pedidos. '
+        'Roda dentro de uma transação desfeita no final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--waiters', type=int, default=2000, help='Clientes esperando o pagamento')
+        parser.add_argument('--paid', type=int, default=50, help='Pagamentos que entram por rodada')
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument('--interval', type=float, default=0.5,
+                            help='PAYMENT_STATUS_POLL_INTERVAL (e o intervalo do polling por cliente)')
+
+    def handle(self, *args, **options):
+        with rollback_after(), override_settings(
+            PAYMENT_STATUS_POLL_INTERVAL=options['interval'], ALLOWED_HOSTS=['testserver'],
+        ):
+            user = get_user_model().objects.create(email=f'{PREFIX.lower()}@bench.local')
+            client = Client.objects.create(user=user)
+            orders = Order.objects.bulk_create([Order(client=client) for _ in range(options['waiters'])])
+            Invoice.objects.bulk_create([
+                Invoice(order=order, invoice_number=f'{PREFIX}-{order.pk}', due_date=timezone.localdate())
+                for order in orders
+            ])
+
+            # O jeito antigo: cada cliente recarregando a página dos pedidos
+            http = HttpClient()
+            http.force_login(user)
+            http.get('/')  # aquece caches fora da medição
+            with CaptureQueriesContext(connection) as page:
+                http.get(reverse('client_orders'))
+
+            self.stdout.write(
+                f"⚡ {len(orders)} clientes esperando, poller a cada {options['interval']}s ({connection.vendor})"
+            )
+            queries = []
+            with connection.execute_wrapper(lambda execute, *args: (queries.append(1), execute(*args))[1]):
+                stats = async_to_sync(self._run)([order.pk for order in orders], options, queries)
+
+            per_second = len(orders) * len(page.captured_queries) / options['interval']
+            self.stdout.write(
+                f"polling por cliente: {len(page.captured_queries)} consultas por recarga -> "
+                f"{per_second:,.0f} consultas/s"
+            )
+            self.stdout.write(
+                f"SSE: {stats['polls']} rodadas do poller, {stats['queries'] / max(stats['polls'], 1):.1f} consultas "
+                f"por rodada -> {stats['queries'] / stats['elapsed']:.1f} consultas/s"
+            )
+            wake = stats['wake']
+            self.stdout.write(
+                f"aviso do pagamento: {stats['woken']} clientes, p50 {wake['p50']:.0f}ms, "
+                f"p99 {wake['p99']:.0f}ms, max {wake['max']:.0f}ms"
+            )
+
+    async def _run(self, order_ids, options, queries):
+        hub = get_hub()
+        streams = {order_id: status_events(order_id) for order_id in order_ids}
+        await asyncio.gather(*(anext(stream) for stream in streams.values()))  # status inicial
+        # Mede só o regime: conexões abertas, o poller rodando
+        queries.clear()
+        polls_before, start = hub.polls, time.perf_counter()
+
+        rng = random.Random(0)
+        waiting = list(order_ids)
+        timings = []
+        for _ in range(options['rounds']):
+            # Fase aleatória em relação ao poller: o atraso médio fica perto de meio intervalo
+            await asyncio.sleep(options['interval'] * (1 + rng.random()))
+            batch = [waiting.pop(rng.randrange(len(waiting))) for _ in range(min(options['paid'], len(waiting)))]
+            await sync_to_async(self._pay)(batch)
+            paid_at = time.perf_counter()
+
+            async def woken(order_id):
+                await anext(streams[order_id])
+                return (time.perf_counter() - paid_at) * 1000
+
+            timings += await asyncio.gather(*(woken(order_id) for order_id in batch))
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            'polls': hub.polls - polls_before, 'queries': len(queries), 'elapsed': elapsed,
+            'woken': len(timings), 'wake': summarize(timings),
+        }
+        for stream in streams.values():
+            await stream.aclose()
+        return stats
+
+    def _pay(self, order_ids):
+        Invoice.objects.filter(order_id__in=order_ids).update(is_paid=True, updated_at=timezone.now())
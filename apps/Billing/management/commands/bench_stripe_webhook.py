@@ -0,0 +1,160 @@
+import json
+import random
+import time
+
+import stripe
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client as HttpClient, override_settings
+from django.urls import include, path, reverse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+
+from Assets.models import Product
+from Billing.inbox import process_pending, sign_payload
+from Billing.models import Invoice, Payment, StripeEvent
+from Clients.models import Client
+from Common.benchmark import rollback_after, summarize
+from Orders.models import Order, OrderItem
+
+PREFIX = 'BENCHWH'
+
+
+def legacy_handle_payment_success(session):
+    """O processamento antigo, dentro do request e sem deduplicar."""
+    invoice = Invoice.objects.get(order_id=session['metadata']['order_id'])
+    Payment.objects.create(
+        invoice=invoice, amount=session['amount_total'] / 100, method='CC',
+        stripe_checkout_id=session['id'], transaction_id=session['payment_intent'],
+    )
+    invoice.is_paid = True
+    invoice.save()
+    invoice.order.approve_payment()
+
+
+@csrf_exempt
+def legacy_stripe_webhook(request):
+    try:
+        event = stripe.Webhook.construct_event(request.body, request.META.get('HTTP_STRIPE_SIGNATURE'), settings.STRIPE_WH)
+    except (ValueError, stripe.SignatureVerificationError):
+        return HttpResponse(status=400)
+    if event['type'] == 'checkout.session.completed':
+        legacy_handle_payment_success(event['data']['object'])
+    return HttpResponse(status=200)
+
+
+# URLs do site + o webhook antigo, para os dois passarem pelos mesmos middlewares
+urlpatterns = [
+    path('bench-antigo/webhook/stripe/', legacy_stripe_webhook, name='bench_legacy_stripe_webhook'),
+    path('', include('core.urls')),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede webhooks do Stripe/s com payloads assinados localmente: processamento no request (antigo) '
+        'x inbox + worker. Inclui reenvios do mesmo evento. Roda dentro de uma transação desfeita no final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=300, help='Eventos (pedidos pagos) por fluxo')
+        parser.add_argument('--redeliveries', type=float, default=0.2,
+                            help='Fração de eventos que o Stripe reenvia (timeout/resposta lenta)')
+        parser.add_argument('--batch-size', type=int, default=100, help='Lote do worker')
+
+    def handle(self, *args, **options):
+        with rollback_after(), override_settings(ROOT_URLCONF=__name__, ALLOWED_HOSTS=['testserver']):
+            client = self._setup_client()
+            product = Product.objects.create(
+                name=f'{PREFIX}', slug=PREFIX.lower(), sku=PREFIX, product_type='COMPONENT',
+                selling_price=100, stock_quantity=10 ** 6,
+            )
+            # Aquece caches (configuração do site etc.) fora da medição
+            HttpClient().get('/')
+
+            self.stdout.write(
+                f"💳 {options['events']} eventos por fluxo, {options['redeliveries']:.0%} reenviados ({connection.vendor})"
+            )
+            self.stdout.write(
+                f"{'webhook':<10} {'entregas':>9} {'acks/s':>9} {'p50':>9} {'p99':>9} {'Payments':>9}"
+            )
+            legacy_orders = self._setup_orders(client, product, options['events'], with_invoice=True)
+            self._deliver('antigo', 'bench_legacy_stripe_webhook', legacy_orders, options)
+
+            orders = self._setup_orders(client, product, options['events'])
+            self._deliver('inbox', 'stripe_webhook', orders, options)
+
+            start = time.perf_counter()
+            processed = 0
+            while True:
+                done, failed = process_pending(batch_size=options['batch_size'])
+                processed += done + failed
+                if not (done or failed):
+                    break
+            elapsed = time.perf_counter() - start
+            payments = Payment.objects.filter(invoice__order__in=orders).count()
+            self.stdout.write(
+                f"worker: {processed} evento(s) em {elapsed:.2f}s ({processed / elapsed:.1f} eventos/s), "
+                f"{payments} Payments, {StripeEvent.objects.filter(status='FAILED').count()} FAILED"
+            )
+
+    def _deliver(self, label, url_name, orders, options):
+        rng = random.Random(0)
+        deliveries = [self._event(label, i, order) for i, order in enumerate(orders)]
+        deliveries += rng.sample(deliveries, int(len(deliveries) * options['redeliveries']))
+        rng.shuffle(deliveries)
+
+        http = HttpClient()
+        url = reverse(url_name)
+        timings = []
+        start = time.perf_counter()
+        for payload in deliveries:
+            begin = time.perf_counter()
+            response = http.post(
+                url, payload, content_type='application/json',
+                HTTP_STRIPE_SIGNATURE=sign_payload(payload, settings.STRIPE_WH),
+            )
+            timings.append((time.perf_counter() - begin) * 1000)
+            assert response.status_code == 200, response.status_code
+        elapsed = time.perf_counter() - start
+
+        stats = summarize(timings)
+        payments = Payment.objects.filter(invoice__order__in=orders).count()
+        self.stdout.write(
+            f"{label:<10} {len(deliveries):>9} {len(deliveries) / elapsed:>9.1f} "
+            f"{stats['p50']:>7.2f}ms {stats['p99']:>7.2f}ms {payments:>9}"
+        )
+
+    def _event(self, label, i, order):
+        return json.dumps({
+            'id': f'evt_{PREFIX.lower()}_{label}_{i}',
+            'type': 'checkout.session.completed',
+            'data': {'object': {
+                'id': f'cs_{PREFIX.lower()}_{label}_{i}',
+                'amount_total': int(order.total_amount * 100),
+                'payment_intent': f'pi_{PREFIX.lower()}_{label}_{i}',
+                'metadata': {'order_id': str(order.pk)},
+            }},
+        })
+
+    def _setup_client(self):
+        user = get_user_model().objects.create(email=f'{PREFIX.lower()}@bench.local')
+        return Client.objects.create(user=user)
+
+    def _setup_orders(self, client, product, total, with_invoice=False):
+        orders = Order.objects.bulk_create([
+            Order(client=client, status='QUOTE', subtotal_amount=100, total_amount=100) for _ in range(total)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, unit_price=100, description=PREFIX) for order in orders
+        ])
+        if with_invoice:
+            # O fluxo antigo supunha a fatura já criada
+            Invoice.objects.bulk_create([
+                Invoice(order=order, invoice_number=f'{PREFIX}-{order.pk}', due_date=timezone.localdate())
+                for order in orders
+            ])
+        return orders
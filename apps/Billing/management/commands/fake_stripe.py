@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from Billing.fake_stripe import FakeStripeServer
+
+
+class Command(BaseCommand):
+    help = (
+        'Sobe um Stripe de mentira (checkout + webhook assinado com STRIPE_WH). Dev: '
+        'STRIPE_API_BASE=http://127.0.0.1:12111 e --webhook-url http://127.0.0.1:8000/billing/webhook/stripe/'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=12111)
+        parser.add_argument('--webhook-url', help='Para onde entregar checkout.session.completed')
+        parser.add_argument('--latency', type=float, default=0.0, help='Atraso de cada chamada da API (segundos)')
+        parser.add_argument('--jitter', type=float, default=0.0, help='Atraso extra aleatório, até N segundos')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fração das chamadas que devolve 500')
+
+    def handle(self, *args, **options):
+        server = FakeStripeServer(
+            options['host'], options['port'], webhook_url=options['webhook_url'],
+            latency=options['latency'], jitter=options['jitter'], error_rate=options['error_rate'],
+        )
+        self.stdout.write(f"💳 Stripe de mentira em {server.url} (Ctrl+C para sair)")
+        if not options['webhook_url']:
+            self.stdout.write("   sem --webhook-url: os eventos não são entregues")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
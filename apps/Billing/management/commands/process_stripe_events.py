@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Billing.inbox import process_pending
+
+
+class Command(BaseCommand):
+    help = 'Processa os webhooks do Stripe pendentes no inbox em lotes (cron, ou --loop para rodar como worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', type=int, metavar='SEGUNDOS',
+                            help='Quando a fila esvaziar, espera N segundos e continua em vez de sair')
+
+    def handle(self, *args, **options):
+        while True:
+            # Lote cheio: provavelmente tem mais na fila, segue sem esperar
+            done, failed = process_pending(batch_size=options['batch_size'])
+            if done or failed:
+                self.stdout.write(f'💳 {done} evento(s) processado(s), {failed} falha(s).')
+            if done + failed >= options['batch_size']:
+                continue
+            if not options['loop']:
+                return
+            time.sleep(options['loop'])
@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from Billing.inbox import process_pending, replay
+from Billing.models import StripeEvent
+
+
+class Command(BaseCommand):
+    help = 'Devolve webhooks do Stripe FAILED ou presos para a fila do worker (e opcionalmente processa já)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', help='IDs de evento (evt_...) específicos')
+        parser.add_argument('--failed', action='store_true', help='Todos os FAILED')
+        parser.add_argument('--stuck', type=int, metavar='MINUTOS',
+                            help='Pendentes recebidos há mais de N minutos que ainda não saíram da fila')
+        parser.add_argument('--include-done', action='store_true',
+                            help='Reprocessa também os já processados (os handlers são idempotentes)')
+        parser.add_argument('--process', action='store_true', help='Processa a fila em seguida')
+
+    def handle(self, *args, **options):
+        if not (options['event_ids'] or options['failed'] or options['stuck'] is not None):
+            raise CommandError('Informe IDs de evento, --failed ou --stuck MINUTOS.')
+
+        replayed = 0
+        if options['event_ids']:
+            replayed += replay(
+                StripeEvent.objects.filter(event_id__in=options['event_ids']), include_done=options['include_done']
+            )
+        if options['failed']:
+            replayed += replay(StripeEvent.objects.filter(status='FAILED'))
+        if options['stuck'] is not None:
+            cutoff = timezone.now() - timedelta(minutes=options['stuck'])
+            replayed += replay(StripeEvent.objects.filter(status='PENDING', received_at__lt=cutoff))
+        self.stdout.write(f'🔁 {replayed} evento(s) de volta na fila.')
+
+        if options['process']:
+            while True:
+                done, failed = process_pending()
+                if not (done or failed):
+                    break
+                self.stdout.write(f'💳 {done} evento(s) processado(s), {failed} falha(s).')
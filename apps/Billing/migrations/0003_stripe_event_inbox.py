@@ -0,0 +1,37 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Billing', '0002_payment_stripe_checkout_id'),
+        ('Orders', '0010_cart_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=255, unique=True, verbose_name='ID do Evento')),
+                ('event_type', models.CharField(max_length=100, verbose_name='Tipo')),
+                ('payload', models.JSONField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pendente'), ('DONE', 'Processado'), ('FAILED', 'Falhou')], default='PENDING', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próxima tentativa')),
+                ('last_error', models.TextField(blank=True, verbose_name='Último erro')),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Recebido em')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Processado em')),
+                ('order', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='Orders.order')),
+            ],
+            options={
+                'verbose_name': 'Evento do Stripe',
+                'verbose_name_plural': 'Eventos do Stripe',
+                'indexes': [models.Index(condition=models.Q(('status', 'PENDING')), fields=['next_attempt_at'], name='stripe_event_pending_idx'), models.Index(condition=models.Q(('status', 'PENDING')), fields=['order', 'id'], name='stripe_event_order_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Billing', '0003_stripe_event_inbox'),
+        ('Orders', '0010_cart_updated_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['updated_at'], name='invoice_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['updated_at'], name='payment_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Billing', '0004_payment_status_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSequence',
+            fields=[
+                ('year', models.PositiveSmallIntegerField(primary_key=True, serialize=False, verbose_name='Ano')),
+                ('next_value', models.PositiveBigIntegerField(default=1, verbose_name='Próximo número livre')),
+            ],
+            options={
+                'verbose_name': 'Sequência de faturas',
+                'verbose_name_plural': 'Sequências de faturas',
+            },
+        ),
+        migrations.AlterField(
+            model_name='invoice',
+            name='invoice_number',
+            field=models.CharField(blank=True, help_text='Em branco, sai a próxima numeração do ano (ver Billing/numbering.py)', max_length=50, unique=True, verbose_name='Nota Fiscal/Recibo'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from Common.models import TimeStampedModel
 from Orders.models import Order
 
@@ -7,13 +8,44 @@ class Invoice(TimeStampedModel):
     Representa a cobrança (Fatura/Recibo) gerada a partir de um Pedido.
     """
     order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='invoice')
-    invoice_number = models.CharField("Nota Fiscal/Recibo", max_length=50, unique=True)
+    invoice_number = models.CharField(
+        "Nota Fiscal/Recibo", max_length=50, unique=True, blank=True,
+        help_text="Em branco, sai a próxima numeração do ano (ver Billing/numbering.py)",
+    )
     due_date = models.DateField("Vencimento")
     is_paid = models.BooleanField("Pago?", default=False)
 
+    class Meta:
+        indexes = [
+            # Poller do status do pagamento (status.py): o que mudou desde a última rodada
+            models.Index(fields=['updated_at'], name='invoice_updated_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self.invoice_number:
+            from .numbering import next_invoice_number
+            self.invoice_number = next_invoice_number()
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Invoice {self.invoice_number} - Pedido #{self.order.id}"
 
+class InvoiceSequence(models.Model):
+    """
+    Próximo número de fatura livre de cada ano. Cada processo reserva um
+    bloco de números de uma vez (ver Billing/numbering.py): a linha é
+    escrita uma vez por bloco, não uma vez por fatura.
+    """
+    year = models.PositiveSmallIntegerField("Ano", primary_key=True)
+    next_value = models.PositiveBigIntegerField("Próximo número livre", default=1)
+
+    class Meta:
+        verbose_name = "Sequência de faturas"
+        verbose_name_plural = "Sequências de faturas"
+
+    def __str__(self):
+        return f"{self.year}: {self.next_value}"
+
 class Payment(TimeStampedModel):
     """
     Registra cada transação financeira recebida para uma fatura.
@@ -31,6 +63,9 @@ class Payment(TimeStampedModel):
     method = models.CharField("Método", max_length=10, choices=METHOD_CHOICES)
     transaction_id = models.CharField("ID da Transação", max_length=100, blank=True, help_text="ID do Pix ou código da maquininha")
 
+    class Meta:
+        indexes = [models.Index(fields=['updated_at'], name='payment_updated_idx')]
+
     def __str__(self):
         return f"Pagamento R$ {self.amount} ({self.get_method_display()})"
 
@@ -44,3 +79,42 @@ class Refund(TimeStampedModel):
 
     def __str__(self):
         return f"Estorno R$ {self.amount} - {self.reason[:30]}..."
+
+class StripeEvent(models.Model):
+    """
+    Inbox dos webhooks do Stripe: o endpoint só verifica, grava e responde;
+    o worker processa depois (ver Billing/inbox.py). event_id único = o
+    reenvio do mesmo evento pelo Stripe não entra duas vezes.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pendente'),
+        ('DONE', 'Processado'),
+        ('FAILED', 'Falhou'),
+    ]
+
+    event_id = models.CharField("ID do Evento", max_length=255, unique=True)
+    event_type = models.CharField("Tipo", max_length=100)
+    # Sem FK no banco: o INSERT do webhook não pode falhar por causa de um pedido apagado
+    order = models.ForeignKey(
+        Order, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+'
+    )
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField("Tentativas", default=0)
+    next_attempt_at = models.DateTimeField("Próxima tentativa", default=timezone.now)
+    last_error = models.TextField("Último erro", blank=True)
+    received_at = models.DateTimeField("Recebido em", default=timezone.now)
+    processed_at = models.DateTimeField("Processado em", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Evento do Stripe"
+        verbose_name_plural = "Eventos do Stripe"
+        indexes = [
+            # Fila do worker: só os pendentes, na ordem de tentativa
+            models.Index(fields=['next_attempt_at'], name='stripe_event_pending_idx', condition=models.Q(status='PENDING')),
+            # "Tem evento anterior pendente do mesmo pedido?" (ordem por pedido)
+            models.Index(fields=['order', 'id'], name='stripe_event_order_idx', condition=models.Q(status='PENDING')),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id} ({self.get_status_display()})"
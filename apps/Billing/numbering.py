@@ -0,0 +1,98 @@
+"""
+Numeração das faturas: "2026-000123", recomeçando a cada ano.
+
+invoice_number é único e ninguém gerava o número: quem emitisse fatura
+teria de achar o próximo (MAX() na tabela e nova tentativa no
+IntegrityError quando dois pedidos pagam juntos) — ou, como o inbox fazia,
+usar "PED-<pk>" como remendo.
+
+    sequência  InvoiceSequence guarda o próximo número livre de cada ano
+    bloco      cada processo reserva INVOICE_NUMBER_BLOCK números de uma vez
+               (um UPDATE na linha do ano) e vai entregando da memória: numa
+               onda de vendas, a linha é travada uma vez a cada bloco, não a
+               cada fatura, e nenhuma fatura varre a tabela de faturas
+    buracos    aceitos: o resto do bloco de um processo que reiniciou, ou de
+               uma transação desfeita, não volta. Entre processos a ordem
+               dos números também não segue a ordem de emissão
+
+Dentro de uma transação maior (o worker do inbox, por exemplo) a trava da
+linha do ano dura até o commit dela — mas só na fatura que abre um bloco —
+e o resto do bloco só fica para as próximas faturas depois do commit.
+Invoice.save() chama next_invoice_number() quando o número vem em branco.
+"""
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import InvoiceSequence
+
+
+def block_size():
+    return getattr(settings, 'INVOICE_NUMBER_BLOCK', 50)
+
+
+def allocate_block(year, size):
+    """Reserva [início, fim) na sequência do ano. Uma transação curta, uma linha."""
+    with transaction.atomic():
+        # O UPDATE trava a linha antes da leitura: dois processos nunca leem o mesmo fim
+        updated = InvoiceSequence.objects.filter(year=year).update(next_value=F('next_value') + size)
+        if not updated:
+            InvoiceSequence.objects.bulk_create([InvoiceSequence(year=year)], ignore_conflicts=True)
+            InvoiceSequence.objects.filter(year=year).update(next_value=F('next_value') + size)
+        end = InvoiceSequence.objects.values_list('next_value', flat=True).get(year=year)
+    return end - size, end
+
+
+class InvoiceNumberer:
+    """Os blocos reservados por este processo, um por ano."""
+
+    def __init__(self, size=None):
+        self.size = size
+        self.lock = threading.Lock()
+        self.blocks = {}  # ano -> [próximo, fim)
+        self.allocations = 0
+
+    def next_value(self, year):
+        with self.lock:
+            start, end = self.blocks.get(year, (0, 0))
+            if start < end:
+                self.blocks[year] = (start + 1, end)
+                return start
+            outer = transaction.get_connection().in_atomic_block
+            start, end = allocate_block(year, self.size or block_size())
+            self.allocations += 1
+            if outer:
+                # A reserva só vale se a transação de quem chamou fizer commit: se
+                # for desfeita, outro processo recebe esse mesmo bloco
+                transaction.on_commit(lambda: self._keep(year, start + 1, end))
+            else:
+                self.blocks[year] = (start + 1, end)
+            return start
+
+    def _keep(self, year, start, end):
+        with self.lock:
+            current_start, current_end = self.blocks.get(year, (0, 0))
+            if current_start >= current_end:  # senão o resto vira buraco
+                self.blocks[year] = (start, end)
+
+    def next_number(self, today=None):
+        year = (today or timezone.localdate()).year
+        return format_number(year, self.next_value(year))
+
+    def reset(self):
+        with self.lock:
+            self.blocks.clear()
+
+
+def format_number(year, value):
+    return f"{year}-{value:06d}"
+
+
+_numberer = InvoiceNumberer()
+
+
+def next_invoice_number(today=None):
+    return _numberer.next_number(today)
@@ -0,0 +1,11 @@
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .gateway import reset_gateway
+
+
+@receiver(setting_changed)
+def stripe_settings_changed(sender, setting, **kwargs):
+    # override_settings(STRIPE_API_BASE=...) nos testes e benchmarks
+    if setting.startswith('STRIPE_'):
+        reset_gateway()
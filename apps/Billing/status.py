@@ -0,0 +1,188 @@
+"""
+Status do pagamento empurrado para o navegador (SSE), com um poller só.
+
+Antes, a única forma de a página do Pix saber que o pagamento entrou era
+recarregar uma página do pedido a cada poucos segundos: a view inteira e
+as consultas dela rodando de novo para cada cliente esperando.
+
+    endpoint  payment_status_stream (ASGI): confere o dono do pedido uma
+              vez, manda o status atual e segura a conexão; cada mudança
+              vira um evento `status`. Pago ou cancelado, encerra
+    hub       um por processo (event loop): guarda quem espera qual
+              pedido. Uma tarefa só consulta o banco a cada
+              PAYMENT_STATUS_POLL_INTERVAL segundos, e só enquanto houver
+              alguém esperando: faturas e pagamentos com updated_at desde
+              a rodada anterior (pelos índices de updated_at) — o custo é
+              o das mudanças, não o de quantos clientes estão esperando
+    acorda    o hub lê o status dos pedidos que mudaram e acorda só quem
+              espera esses pedidos
+
+A janela de cada rodada começa POLL_OVERLAP antes da anterior: uma
+transação que carimbou updated_at e só fez commit depois não escapa, e a
+releitura não incomoda (só acorda quem vê um status diferente).
+Sob WSGI não há como segurar a conexão: o endpoint responde o status atual
+e pede ao EventSource para reconectar em alguns segundos.
+"""
+import asyncio
+import json
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from Orders.models import Order
+from .models import Invoice, Payment
+
+POLL_OVERLAP = timedelta(seconds=5)
+KEEPALIVE = 15  # comentário SSE para proxies não derrubarem a conexão parada
+ASGI_RETRY_MS = 1000
+WSGI_RETRY_MS = 5000
+
+
+def poll_interval():
+    return getattr(settings, 'PAYMENT_STATUS_POLL_INTERVAL', 1.0)
+
+
+def stream_timeout():
+    return getattr(settings, 'PAYMENT_STATUS_STREAM_TIMEOUT', 55)
+
+
+def order_states(order_ids):
+    """{pedido: {'status', 'paid', 'paid_amount'}} — uma consulta."""
+    rows = (
+        Order.objects.filter(pk__in=order_ids)
+        .values('pk', 'status', 'invoice__is_paid')
+        .annotate(paid_amount=Sum('invoice__payments__amount'))
+    )
+    return {
+        row['pk']: {
+            'status': row['status'],
+            'paid': bool(row['invoice__is_paid']),
+            'paid_amount': str(row['paid_amount'] or 0),
+        }
+        for row in rows
+    }
+
+
+def changed_orders(since):
+    """Pedidos cuja fatura ou pagamento mudou desde `since`."""
+    invoices = Invoice.objects.filter(updated_at__gte=since).values_list('order_id', flat=True)
+    payments = Payment.objects.filter(updated_at__gte=since).values_list('invoice__order_id', flat=True)
+    return set(invoices.union(payments))
+
+
+def is_final(state):
+    # Só orçamento ainda espera pagamento; aprovado (ou adiante) e cancelado, acabou
+    return state is None or state['paid'] or state['status'] != 'QUOTE'
+
+
+class Waiter:
+    def __init__(self, order_id):
+        self.order_id = order_id
+        self.event = asyncio.Event()
+        self.state = None
+
+    def wake(self, state):
+        if state != self.state:
+            self.state = state
+            self.event.set()
+
+    async def next_state(self, timeout):
+        """Espera uma mudança (ou o timeout). Retorna o novo status, ou None se nada mudou."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.event.clear()
+        return self.state
+
+
+class PaymentStatusHub:
+    def __init__(self):
+        self.waiters = {}  # pedido -> {Waiter}
+        self.task = None
+        self.polls = 0
+
+    def subscribe(self, order_id):
+        waiter = Waiter(order_id)
+        self.waiters.setdefault(order_id, set()).add(waiter)
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return waiter
+
+    def unsubscribe(self, waiter):
+        waiters = self.waiters.get(waiter.order_id)
+        if waiters is not None:
+            waiters.discard(waiter)
+            if not waiters:
+                del self.waiters[waiter.order_id]
+
+    async def run(self):
+        since = timezone.now() - POLL_OVERLAP
+        while self.waiters:
+            await asyncio.sleep(poll_interval())
+            if not self.waiters:
+                break
+            started = timezone.now()
+            await self.poll(since)
+            since = started - POLL_OVERLAP
+
+    async def poll(self, since):
+        self.polls += 1
+        states = await sync_to_async(self._read)(since, set(self.waiters))
+        for order_id, state in states.items():
+            for waiter in list(self.waiters.get(order_id, ())):
+                waiter.wake(state)
+
+    @staticmethod
+    def _read(since, watched):
+        order_ids = changed_orders(since) & watched
+        return order_states(order_ids) if order_ids else {}
+
+
+def sse_event(state, retry=None):
+    lines = [f"retry: {retry}"] if retry else []
+    lines += ["event: status", f"data: {json.dumps(state)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+async def status_events(order_id):
+    """Eventos do pedido: o status atual e depois cada mudança, até ficar final ou dar o tempo."""
+    hub = get_hub()
+    # Inscreve antes de ler: uma mudança entre a leitura e a inscrição não se perde
+    waiter = hub.subscribe(order_id)
+    try:
+        state = (await sync_to_async(order_states)([order_id])).get(order_id)
+        waiter.state = state
+        waiter.event.clear()
+        yield sse_event(state, retry=ASGI_RETRY_MS)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + stream_timeout()
+        while not is_final(state):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            changed = await waiter.next_state(min(remaining, KEEPALIVE))
+            if changed is None:
+                yield ": keep-alive\n\n"
+                continue
+            state = changed
+            yield sse_event(state)
+    finally:
+        hub.unsubscribe(waiter)
+
+
+_hubs = {}
+
+
+def get_hub():
+    """O hub do event loop atual (um por processo ASGI; testes criam loops novos)."""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        for old_loop in [old for old in _hubs if old.is_closed()]:
+            del _hubs[old_loop]
+        hub = _hubs[loop] = PaymentStatusHub()
+    return hub
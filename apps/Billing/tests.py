@@ -1,3 +1,245 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+from datetime import date, timedelta
 
-# Create your tests here.
+import stripe
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from Assets.models import Product
+from Clients.models import Client
+from Orders.models import Order, OrderItem
+from Orders.reservations import release_expired, reserve_order
+from .fake_stripe import FakeStripeServer
+from .gateway import get_gateway
+from .status import get_hub
+from .inbox import claim_batch, process_pending, sign_payload
+from .models import Invoice, Payment, StripeEvent
+from .numbering import InvoiceNumberer
+
+
+class StripeInboxTests(TestCase):
+    def setUp(self):
+        client_obj = Client.objects.create(user=get_user_model().objects.create_user(email='pagador@teste.com'))
+        product = Product.objects.create(name="Bateria", sku="BAT", selling_price=100, stock_quantity=5)
+        self.order = Order.objects.create(client=client_obj)
+        OrderItem.objects.create(order=self.order, product=product, quantity=2)
+
+    def _event(self, event_id='evt_1', order_id=None, event_type='checkout.session.completed'):
+        return json.dumps({
+            'id': event_id,
+            'type': event_type,
+            'data': {'object': {
+                'id': f'cs_{event_id}', 'amount_total': 20000, 'payment_intent': f'pi_{event_id}',
+                'metadata': {'order_id': str(order_id or self.order.pk)},
+            }},
+        })
+
+    def _post(self, payload, signature=None):
+        return self.client.post(
+            reverse('stripe_webhook'), payload, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=signature or sign_payload(payload, settings.STRIPE_WH),
+        )
+
+    def test_webhook_only_stores_and_worker_processes_once(self):
+        payload = self._event()
+        self.assertEqual(self._post(payload, signature='t=1,v1=falsa').status_code, 400)
+
+        # Reenvio do mesmo evento: um registro só, e nada processado no request
+        for _ in range(2):
+            self.assertEqual(self._post(payload).status_code, 200)
+        self.assertEqual(StripeEvent.objects.get().status, 'PENDING')
+        self.assertFalse(Payment.objects.exists())
+
+        self.assertEqual(process_pending(), (1, 0))
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.invoice.is_paid), ('APPROVED', True))
+        self.assertEqual(list(Payment.objects.values_list('amount', flat=True)), [200])
+        self.assertEqual(self.order.items.get().product.stock_quantity, 3)
+
+        # Reprocessar (replay de um já processado) não duplica
+        call_command('replay_stripe_events', 'evt_1', include_done=True, process=True, stdout=io.StringIO())
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_payment_without_stock_is_kept_for_review(self):
+        # A reserva venceu e a unidade foi vendida a outro antes do webhook
+        Product.objects.update(stock_quantity=1)
+        self._post(self._event())
+        with self.assertLogs('Billing.inbox', level='ERROR'):
+            self.assertEqual(process_pending(), (1, 0))
+
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.invoice.is_paid), ('PAYMENT_REVIEW', True))
+        self.assertEqual(list(Payment.objects.values_list('amount', flat=True)), [200])
+        self.assertEqual(StripeEvent.objects.get().status, 'DONE')
+        self.assertIn("Estoque insuficiente para: Bateria", self.order.timeline.get().note)
+        self.assertEqual(Product.objects.get().stock_quantity, 1)
+
+    def test_events_of_an_order_are_processed_in_order(self):
+        self._post(self._event('evt_1'))
+        self._post(self._event('evt_2', event_type='charge.refunded'))
+        # Outro worker está com o primeiro: o segundo, do mesmo pedido, espera
+        first = claim_batch(1)
+        self.assertEqual([event.event_id for event in first], ['evt_1'])
+        self.assertEqual(claim_batch(10), [])
+
+    def test_failures_retry_then_replay(self):
+        self._post(self._event(order_id=999))
+        with self.assertLogs('Billing.inbox', level='ERROR'):
+            self.assertEqual(process_pending(max_attempts=2), (0, 1))
+        event = StripeEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), ('PENDING', 1))
+        self.assertIn('DoesNotExist', event.last_error)
+
+        StripeEvent.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        with self.assertLogs('Billing.inbox', level='ERROR'):
+            process_pending(max_attempts=2)
+        self.assertEqual(StripeEvent.objects.get().status, 'FAILED')
+
+        out = io.StringIO()
+        call_command('replay_stripe_events', failed=True, stdout=out)
+        self.assertIn('1 evento(s) de volta na fila', out.getvalue())
+        self.assertEqual(StripeEvent.objects.get().status, 'PENDING')
+
+
+class FakeStripeFlowTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(email='cartao@teste.com')
+        product = Product.objects.create(name="Motor", sku="MOT", selling_price=150, stock_quantity=5)
+        self.order = Order.objects.create(client=Client.objects.create(user=user))
+        OrderItem.objects.create(order=self.order, product=product, quantity=1)
+        self.order.refresh_from_db()
+        self.client.force_login(user)
+        # O estado do disjuntor fica no cache, que sobrevive entre os testes
+        self.addCleanup(lambda: get_gateway().breaker.reset())
+
+    def test_card_checkout_to_paid_order(self):
+        order = self.order
+
+        with FakeStripeServer() as fake, self.settings(STRIPE_API_BASE=fake.url):
+            response = self.client.post(reverse('process_payment', args=[order.pk]), {'payment_method': 'CARD'})
+            session_id = response['Location'].rsplit('/', 1)[-1]
+            self.assertEqual(fake.sessions[session_id]['amount_total'], int(order.total_amount * 100))
+            # A sessão vence junto com a reserva feita para o pagamento
+            reservation = order.reservations.get()
+            self.assertEqual(fake.sessions[session_id]['expires_at'], int(reservation.expires_at.timestamp()))
+
+            payload, signature = fake.pay(session_id)
+        self.assertEqual(self._webhook(payload, signature).status_code, 200)
+        self.assertEqual(process_pending(), (1, 0))
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'APPROVED')
+        self.assertEqual(order.invoice.payments.get().stripe_checkout_id, session_id)
+
+    def test_card_refused_when_hold_was_released_and_stock_is_gone(self):
+        reserve_order(self.order, self.order.stock_quantities())
+        self.order.reservations.update(expires_at=timezone.now() - timedelta(minutes=1))
+        release_expired()
+        Product.objects.update(stock_quantity=0)  # a última unidade foi vendida a outro
+
+        with FakeStripeServer() as fake, self.settings(STRIPE_API_BASE=fake.url):
+            response = self.client.post(reverse('process_payment', args=[self.order.pk]), {'payment_method': 'CARD'})
+        self.assertContains(response, "Motor esgotou", status_code=409)
+        self.assertEqual(fake.calls, 0)
+
+    def _webhook(self, payload, signature):
+        return self.client.post(reverse('stripe_webhook'), payload, content_type='application/json',
+                                HTTP_STRIPE_SIGNATURE=signature)
+
+    def test_breaker_fails_fast_and_offers_pix(self):
+        url = reverse('process_payment', args=[self.order.pk])
+        with FakeStripeServer(error_rate=1) as fake, self.settings(
+            STRIPE_API_BASE=fake.url, STRIPE_MAX_RETRIES=1, STRIPE_BREAKER_THRESHOLD=2,
+        ):
+            # Cada checkout: erro + 1 retentativa; o segundo que falha de vez abre o circuito
+            with self.assertLogs('Billing.gateway', level='ERROR'):
+                for _ in range(2):
+                    response = self.client.post(url, {'payment_method': 'CARD'})
+                    self.assertEqual(response.status_code, 503)
+            self.assertEqual((fake.calls, get_gateway().breaker.state), (4, 'open'))
+
+            # Aberto: nem chega ao Stripe, e a página já vem com o Pix marcado
+            response = self.client.post(url, {'payment_method': 'CARD'})
+            self.assertEqual((response.status_code, fake.calls), (503, 4))
+            self.assertContains(response, 'value="PIX" checked', status_code=503)
+            self.assertEqual(get_gateway().stats.snapshot()['checkout.create']['rejected'], 1)
+
+    def test_probe_answered_with_stripe_error_closes_circuit(self):
+        with FakeStripeServer() as fake, self.settings(STRIPE_API_BASE=fake.url):
+            breaker = get_gateway().breaker
+            with self.assertLogs('Billing.gateway', level='WARNING') as logs:
+                breaker._trip()
+                cache.delete(breaker.open_key)  # passou o cooldown: meio aberto
+                # A chamada de teste recebe um 404 do Stripe: não é indisponibilidade
+                with self.assertRaises(stripe.InvalidRequestError):
+                    get_gateway().retrieve_checkout_session('cs_test_nao_existe')
+            self.assertEqual(breaker.state, 'closed')
+            self.assertIn("circuito fechado", logs.output[-1])
+            self.assertIsNone(cache.get(breaker.probe_key))
+
+
+class PaymentStatusStreamTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='pix@teste.com')
+        self.order = Order.objects.create(client=Client.objects.create(user=self.user))
+        self.invoice = Invoice.objects.create(order=self.order, invoice_number='PIX-1', due_date=timezone.localdate())
+        self.url = reverse('payment_status_stream', args=[self.order.pk])
+
+    @override_settings(PAYMENT_STATUS_POLL_INTERVAL=0.05)
+    async def test_stream_is_woken_by_the_payment(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertIn(b'"paid": false', await anext(stream))
+        self.assertEqual(len(get_hub().waiters), 1)
+
+        await Payment.objects.acreate(invoice=self.invoice, amount=10, method='PIX')
+        self.invoice.is_paid = True
+        await self.invoice.asave()
+        self.assertIn(b'"paid": true', await asyncio.wait_for(anext(stream), 2))
+        # Pago: o stream termina e o pedido sai do hub
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        self.assertEqual(get_hub().waiters, {})
+
+    def test_wsgi_answers_current_status_and_asks_to_reconnect(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.client.force_login(self.user)
+        response = self.client.get(self.url)
+        self.assertTrue(response.content.startswith(b'retry: 5000'))
+        self.assertIn(b'"status": "QUOTE"', response.content)
+
+
+class InvoiceNumberingTests(TestCase):
+    def _next(self, numberer, day=date(2026, 5, 1)):
+        with self.captureOnCommitCallbacks(execute=True):
+            return numberer.next_number(day)
+
+    def test_each_worker_takes_a_block_per_year(self):
+        first, second = InvoiceNumberer(size=3), InvoiceNumberer(size=3)
+        numbers = [self._next(worker) for worker in (first, second, first, first, first)]
+        self.assertEqual(numbers, ['2026-000001', '2026-000004', '2026-000002', '2026-000003', '2026-000007'])
+        self.assertEqual(first.allocations, 2)
+        self.assertEqual(self._next(second, date(2027, 1, 2)), '2027-000001')
+
+    def test_block_of_rolled_back_transaction_is_not_reused(self):
+        numberer = InvoiceNumberer(size=10)
+        with self.assertRaises(ZeroDivisionError), transaction.atomic():
+            lost = numberer.next_number(date(2026, 5, 1))
+            1 / 0
+        # A reserva foi desfeita junto: o bloco sai de novo da sequência, sem duplicar
+        self.assertEqual(self._next(numberer), lost)
+        self.assertEqual(self._next(numberer), '2026-000002')
+
+    def test_invoice_without_number_gets_the_next_one(self):
+        order = Order.objects.create(client=Client.objects.create(user=get_user_model().objects.create_user(email='nf@teste.com')))
+        invoice = Invoice.objects.create(order=order, due_date=timezone.localdate())
+        self.assertRegex(invoice.invoice_number, rf'^{timezone.localdate().year}-\d{{6}}$')
@@ -3,6 +3,7 @@ from . import views
 # urls.py
 urlpatterns = [
     path('pagamento/<int:order_id>/', views.process_payment, name='process_payment'),
+    path('pagamento/<int:order_id>/status/', views.payment_status_stream, name='payment_status_stream'),
     path('webhook/stripe/', views.stripe_webhook, name='stripe_webhook'),
     path('webhook/stripe/', views.stripe_webhook, name='stripe_webhook'), # Adicione esta linha   
     # URL de retorno do Stripe
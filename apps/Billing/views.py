@@ -1,12 +1,18 @@
 import stripe  # import mercadopago <-- Comentei também
 from django.conf import settings
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib import messages
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from Assets.stock import InsufficientStock
 from Orders.models import Order
+from Orders.reservations import hold_for_payment
 from django.views.decorators.csrf import csrf_exempt
 import time # Para simular um tempinho de processamento
-from .models import Invoice, Payment
+from .gateway import GatewayUnavailable, get_gateway
+from .inbox import receive_event
+from .status import WSGI_RETRY_MS, order_states, sse_event, status_events
 
 
 stripe.api_key = settings.STRIPE_SK
@@ -14,91 +20,97 @@ stripe.api_key = settings.STRIPE_SK
 
 def process_payment(request, order_id):
     order = get_object_or_404(Order, id=order_id, client__user=request.user)
+    gateway = get_gateway()
+    # Com o Stripe fora (circuito aberto), a página já chega oferecendo o Pix
+    context = {'order': order, 'card_unavailable': not gateway.available()}
 
     if request.method == 'POST':
         payment_method = request.POST.get('payment_method')
 
         if payment_method == 'CARD':
+            if order.status != 'QUOTE':
+                context['payment_error'] = "Este pedido não está aguardando pagamento."
+                return render(request, 'billing/checkout.html', context, status=409)
             try:
-                # Criando a sessão no Stripe
-                checkout_session = stripe.checkout.Session.create(
-                    payment_method_types=['card'],
-                    line_items=[{
+                # A sessão vence junto com a reserva: sem reserva, sem cobrança
+                expires_at = hold_for_payment(order)
+            except InsufficientStock as exc:
+                context['payment_error'] = f"O prazo do pedido venceu e {exc.products[0].name} esgotou."
+                return render(request, 'billing/checkout.html', context, status=409)
+
+            amount = int(order.total_amount * 100) # Stripe usa centavos
+            try:
+                # Criando a sessão no Stripe (mesma chave = mesma sessão num clique duplo)
+                checkout_session = gateway.create_checkout_session({
+                    'payment_method_types': ['card'],
+                    'line_items': [{
                         'price_data': {
-                            'currency': 'brl', # Valorizando seu plano para a Irlanda
-                            'product_data': {'name': f'Pedido #{order.id}'},
-                            'unit_amount': int(order.total_amount * 100),
-                            'currency': 'eur', # Valorizando seu plano para a Irlanda
+                            'currency': 'brl',
                             'product_data': {'name': f'Pedido #{order.id}'},
-                            'unit_amount': int(order.total_price * 100), # Stripe usa centavos
+                            'unit_amount': amount,
                         },
                         'quantity': 1,
                     }],
-                    mode='payment',
-                    success_url=request.build_absolute_uri('/billing/sucesso/'),
-                    cancel_url=request.build_absolute_uri(f'/billing/pagamento/{order.id}/'),
-                    metadata={'order_id': order.id}
-                )
+                    'mode': 'payment',
+                    'success_url': request.build_absolute_uri('/billing/sucesso/'),
+                    'cancel_url': request.build_absolute_uri(f'/billing/pagamento/{order.id}/'),
+                    'metadata': {'order_id': order.id},
+                    'expires_at': int(expires_at.timestamp()),
+                }, idempotency_key=f'checkout-{order.id}-{amount}-{int(expires_at.timestamp())}')
+            except GatewayUnavailable:
+                context['card_unavailable'] = True
+                return render(request, 'billing/checkout.html', context, status=503)
+            except stripe.StripeError as e:
+                context['payment_error'] = e.user_message or "Não foi possível iniciar o pagamento com cartão."
+                return render(request, 'billing/checkout.html', context, status=502)
+
+            # Se o request veio do HTMX, enviamos o header de redirecionamento
+            if request.headers.get('HX-Request'):
+                response = HttpResponse(status=204)
+                response['HX-Redirect'] = checkout_session.url
+                return response
+
+            return redirect(checkout_session.url, code=303)
 
-                # Se o request veio do HTMX, enviamos o header de redirecionamento
-                if request.headers.get('HX-Request'):
-                    response = HttpResponse(status=204)
-                    response['HX-Redirect'] = checkout_session.url
-                    return response
-                
-                return redirect(checkout_session.url, code=303)
-            except Exception as e:
-                return HttpResponse(f"Erro Real do Stripe: {str(e)}", status=500)
+        if payment_method == 'PIX':
+            # A página do Pix acompanha o pagamento por payment_status_stream
+            return render(request, 'billing/pix_payment.html', {'order': order})
 
-            except Exception as e:
-                messages.error(request, f"Erro no Stripe: {str(e)}")
-    
-    return render(request, 'billing/checkout.html', {'order': order})
+    return render(request, 'billing/checkout.html', context)
 
 
 
 
 @csrf_exempt
 def stripe_webhook(request):
-    payload = request.body
-    sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
-    endpoint_secret = settings.STRIPE_WEBHOOK_SECRET
-
+    """Só verifica, grava no inbox e responde; o worker process_stripe_events faz o resto (ver inbox.py)."""
     try:
-        event = stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
-    except (ValueError, stripe.error.SignatureVerificationError):
+        receive_event(request.body, request.META.get('HTTP_STRIPE_SIGNATURE'))
+    except (ValueError, KeyError, stripe.SignatureVerificationError):
         return HttpResponse(status=400)
 
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        handle_payment_success(session)
-
     return HttpResponse(status=200)
 
-def handle_payment_success(session):
-    order_id = session.get('metadata', {}).get('order_id')
-    amount_total = session.get('amount_total') / 100 # Converte centavos para Euro/Real
-    
-    # Busca a Invoice vinculada ao Pedido
-    invoice = Invoice.objects.get(order_id=order_id)
-    
-    # Cria o registro de pagamento no seu banco
-    Payment.objects.create(
-        invoice=invoice,
-        amount=amount_total,
-        method='CC',
-        stripe_checkout_id=session.get('id'),
-        transaction_id=session.get('payment_intent')
-    )
-    
-    # Atualiza o status da fatura
-    invoice.is_paid = True
-    invoice.save()
-    
-    # Atualiza o pedido (lógica que você já tem no Orders)
-    invoice.order.status = 'PAID' # Exemplo
-    invoice.order.save()
-
+async def payment_status_stream(request, order_id):
+    """
+    Status do pagamento do pedido em Server-Sent Events (ver status.py). Sob
+    ASGI a conexão fica aberta e o poller compartilhado acorda quando a
+    fatura/pagamento muda; sob WSGI responde o status atual e o navegador
+    reconecta sozinho.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        raise Http404
+    await aget_object_or_404(Order, id=order_id, client__user=user)
+
+    if not isinstance(request, ASGIRequest):
+        state = (await sync_to_async(order_states)([order_id])).get(order_id)
+        response = HttpResponse(sse_event(state, retry=WSGI_RETRY_MS), content_type='text/event-stream')
+    else:
+        response = StreamingHttpResponse(status_events(order_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx não segura os eventos
+    return response
 
 def payment_success(request):
     """
@@ -0,0 +1,52 @@
+"""
+Utilitários compartilhados pelos comandos de benchmark (bench_*).
+
+Os benchmarks rodam dentro de uma transação que é desfeita no final,
+então podem gerar catálogos enormes sem sujar o banco de desenvolvimento.
+"""
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rollback_after():
+    """Executa o bloco numa transação e desfaz tudo ao sair."""
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback()
+    except _Rollback:
+        pass
+
+
+def measure(func, repeat=20):
+    """Roda func() `repeat` vezes e devolve as latências em milissegundos."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(timings):
+    return {
+        'p50': statistics.median(timings) if timings else 0.0,
+        'p99': percentile(timings, 99),
+        'max': max(timings) if timings else 0.0,
+    }
@@ -0,0 +1,37 @@
+"""
+Transação que vai escrever, com o lock de escrita desde o começo.
+
+No SQLite, uma transação comum (BEGIN DEFERRED) que lê antes de escrever
+só pede o lock de escrita no primeiro INSERT/UPDATE: com outro checkout
+gravando, ela espera bem mais (ou recebe "database is locked") do que se
+tivesse pedido o lock no BEGIN. BEGIN IMMEDIATE em todas as transações
+(OPTIONS transaction_mode) resolveria, mas serializaria também as
+transações que só leem.
+
+write_transaction() abre só a transação de quem vai escrever com
+BEGIN IMMEDIATE. Em outros bancos (ou dentro de uma transação já aberta)
+é um transaction.atomic() comum.
+"""
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+@contextmanager
+def write_transaction(using=None):
+    connection = transaction.get_connection(using)
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    # O modo é lido no BEGIN (e relido das OPTIONS a cada conexão nova)
+    connection.ensure_connection()
+    previous = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            connection.transaction_mode = previous
+            yield
+    finally:
+        connection.transaction_mode = previous
@@ -0,0 +1,101 @@
+"""
+Servidor SMTP de mentira para desenvolvimento e testes (só biblioteca padrão).
+
+Aceita tudo, guarda as mensagens em memória e conta as conexões abertas,
+para conferir que o worker da outbox reaproveita uma conexão por lote.
+Destinatário com REJECT_MARKER no endereço recebe 550 (teste de falha e
+retry). Uso: comando fake_smtp, ou nos testes:
+
+    with FakeSMTPServer() as smtp:
+        ... EMAIL_HOST='127.0.0.1', EMAIL_PORT=smtp.port ...
+        smtp.messages  # [(remetente, [destinatários], bytes)]
+"""
+import socketserver
+import threading
+
+REJECT_MARKER = 'recusar'
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply('220 fake-smtp pronto')
+        mail_from, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, arg = line.decode('utf-8', 'replace').strip().partition(' ')
+            command = command.upper()
+            if command == 'EHLO':
+                self.wfile.write(b'250-fake-smtp\r\n250 8BITMIME\r\n')
+            elif command in ('HELO', 'NOOP'):
+                self.reply('250 OK')
+            elif command == 'MAIL':
+                mail_from, recipients = arg.partition(':')[2].strip(' <>'), []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                address = arg.partition(':')[2].strip(' <>')
+                if REJECT_MARKER in address.lower():
+                    self.reply('550 destinatário recusado')
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 termine com <CRLF>.<CRLF>')
+                data = []
+                for raw in self.rfile:
+                    if raw in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(raw[1:] if raw.startswith(b'..') else raw)
+                server.deliver(mail_from, recipients, b''.join(data))
+                self.reply('250 OK: mensagem aceita')
+            elif command == 'RSET':
+                mail_from, recipients = None, []
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 tchau')
+                return
+            else:
+                self.reply('502 comando não implementado')
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, on_message=None):
+        super().__init__((host, port), _SMTPHandler)
+        self.lock = threading.Lock()
+        self.messages = []
+        self.connections = 0
+        self.on_message = on_message
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def deliver(self, mail_from, recipients, data):
+        with self.lock:
+            self.messages.append((mail_from, recipients, data))
+        if self.on_message:
+            self.on_message(mail_from, recipients, data)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,27 @@
+from email import message_from_bytes, policy
+
+from django.core.management.base import BaseCommand
+
+from Common.fake_smtp import FakeSMTPServer
+
+
+class Command(BaseCommand):
+    help = 'Sobe um SMTP de mentira que só mostra as mensagens no terminal (dev: EMAIL_PORT=1025)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=1025)
+
+    def handle(self, *args, **options):
+        server = FakeSMTPServer(options['host'], options['port'], on_message=self._show)
+        self.stdout.write(f"📭 SMTP de mentira em {options['host']}:{server.port} (Ctrl+C para sair)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+    def _show(self, mail_from, recipients, data):
+        message = message_from_bytes(data, policy=policy.default)
+        self.stdout.write(f"📨 {mail_from} -> {', '.join(recipients)}: {message['subject']}")
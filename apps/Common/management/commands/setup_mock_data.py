@@ -180,8 +180,7 @@ class Command(BaseCommand):
                 status=status
             )
             
-            # Adicionar itens ao pedido
-            total = 0
+            # Adicionar itens ao pedido (o total é ajustado a cada item, ver Orders/totals.py)
             for _ in range(random.randint(1, 4)):
                 prod = random.choice(products_list)
                 qty = random.randint(1, 2)
@@ -194,11 +193,6 @@ class Command(BaseCommand):
                     unit_price=price,
                     description=prod.name
                 )
-                total += (price * qty)
-            
-            # Atualiza total do pedido
-            order.total_amount = total
-            order.save()
 
         self.stdout.write('🛒 15 Pedidos gerados.')
 
@@ -0,0 +1,320 @@
+"""
+Paginação por cursor (keyset).
+
+Em vez de OFFSET (que fica mais lento quanto mais fundo o cliente navega),
+cada página guarda os valores de ordenação do último/primeiro item e a
+próxima consulta começa dali: "WHERE (a, b, id) > (x, y, z) LIMIT n".
+
+O cursor é assinado (django.core.signing), então um cursor adulterado ou de
+outra ordenação simplesmente volta para a primeira página.
+"""
+import hashlib
+import json
+import math
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+
+CURSOR_SALT = 'Common.pagination.cursor'
+
+
+class CursorPage:
+    """Página com a mesma interface básica do Page do Django (para os templates)."""
+
+    def __init__(self, object_list, number, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __repr__(self):
+        return f"<CursorPage {self.number}>"
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Paginador keyset para um queryset e uma ordenação.
+
+    ordering: campos como no order_by() ('-is_featured', '-created_at').
+        O pk é acrescentado como desempate. Campos de relações também valem
+        ('-specs__max_speed'): viram uma anotação no queryset. Se algum campo
+        não for coluna (ex: 'search_rank' da busca), cai para OFFSET dentro do cursor.
+
+    count_mode: como obter o total (usado só se o template pedir):
+        'exact'     -> COUNT(*) a cada request
+        'cached'    -> COUNT(*) guardado no cache por `count_timeout` segundos
+        'estimated' -> estimativa do planner (PostgreSQL); nos outros bancos = 'cached'
+
+    count_key: chave de cache do total. Por padrão é um hash do SQL; quem
+        tem um versionamento próprio (ex: catálogo) pode passar a sua.
+
+    not_null: campos da ordenação que o queryset já garante não nulos
+        (ex: filtrado com __isnull=False). Evita o "OR campo IS NULL" no
+        WHERE, que impede o uso do índice.
+    """
+
+    def __init__(self, queryset, per_page, ordering, count_mode=None, count_timeout=60, count_key=None,
+                 not_null=()):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.count_mode = count_mode or getattr(settings, 'PAGINATION_COUNT_MODE', 'cached')
+        self.count_timeout = count_timeout
+        self.count_key = count_key
+
+        self.keys, self.annotations = self._resolve_keys(queryset.model, ordering, not_null)
+        self.keyset = self.keys is not None
+        self.ordering = list(ordering)
+        # Assinatura da ordenação: cursor de outra ordenação é descartado
+        self.signature = ','.join(self.ordering)
+
+    # --- ORDENAÇÃO ---
+
+    @staticmethod
+    def _resolve_keys(model, ordering, not_null=()):
+        """
+        Retorna ([(attname, field, descending, nullable), ...], anotações).
+        Campos de relação ('specs__max_speed') são anotados como '_cursor_<n>';
+        nullable considera também a relação ausente (LEFT JOIN -> NULL).
+        """
+        keys = []
+        annotations = {}
+        for index, name in enumerate(ordering):
+            descending = name.startswith('-')
+            path = name.lstrip('-').split('__')
+            current, nullable = model, False
+            try:
+                for part in path[:-1]:
+                    relation = current._meta.get_field(part)
+                    if not relation.is_relation or relation.many_to_many or relation.one_to_many:
+                        return None, {}
+                    nullable = nullable or relation.null or not relation.concrete
+                    current = relation.related_model
+                field = current._meta.get_field(path[-1])
+            except FieldDoesNotExist:
+                return None, {}
+            if not getattr(field, 'concrete', False) or field.is_relation:
+                return None, {}
+
+            attname = field.attname
+            if len(path) > 1:
+                attname = f'_cursor_{index}'
+                annotations[attname] = F('__'.join(path))
+            nullable = (nullable or field.null) and name.lstrip('-') not in not_null
+            keys.append((attname, field, descending, nullable))
+
+        last_descending = keys[-1][2] if keys else False
+        pk = model._meta.pk
+        keys.append((pk.attname, pk, last_descending, False))
+        return keys, annotations
+
+    def _base_queryset(self):
+        return self.queryset.annotate(**self.annotations) if self.annotations else self.queryset
+
+    def _order_by(self, reverse=False):
+        expressions = []
+        for attname, field, descending, nullable in self.keys:
+            descending = descending != reverse
+            nulls = {}
+            if nullable:
+                # NULL sempre depois dos valores (ex: produto sem preço)
+                nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+            expressions.append(F(attname).desc(**nulls) if descending else F(attname).asc(**nulls))
+        return expressions
+
+    def _seek(self, values, forward):
+        """
+        Monta o WHERE do keyset: (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ...
+        respeitando a direção de cada campo e NULLs no fim.
+        """
+        condition = Q(pk__in=[])  # falso
+        equal = Q()
+        for (attname, field, descending, nullable), value in zip(self.keys, values):
+            lookup = 'lt' if descending == forward else 'gt'
+            if value is None:
+                # Depois de NULL só vem NULL; antes de NULL vem todo valor não nulo
+                strict = None if forward else Q(**{f'{attname}__isnull': False})
+                same = Q(**{f'{attname}__isnull': True})
+            else:
+                strict = Q(**{f'{attname}__{lookup}': value})
+                if forward and nullable:
+                    strict |= Q(**{f'{attname}__isnull': True})
+                same = Q(**{attname: value})
+            if strict is not None:
+                condition |= equal & strict
+            equal &= same
+
+        # Limite redundante no 1º campo (k1 >= v1): sem ele o OR acima vira
+        # "MULTI-INDEX OR" + ordenação em memória; com ele o banco faz um range
+        # scan no índice, já na ordem da página.
+        attname, field, descending, nullable = self.keys[0]
+        first = values[0]
+        if first is not None and not (forward and nullable):
+            lookup = 'lte' if descending == forward else 'gte'
+            condition = Q(**{f'{attname}__{lookup}': first}) & condition
+        return condition
+
+    # --- CURSOR ---
+
+    def _values_of(self, obj):
+        return [getattr(obj, attname) for attname, _, _, _ in self.keys]
+
+    @staticmethod
+    def _serialize(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    def _encode(self, number, direction, obj=None, offset=None):
+        payload = {'s': self.signature, 'n': number, 'd': direction}
+        if offset is not None:
+            payload['o'] = offset
+        else:
+            payload['v'] = [self._serialize(v) for v in self._values_of(obj)]
+        return signing.dumps(payload, salt=CURSOR_SALT, compress=True)
+
+    def _decode(self, cursor):
+        if not cursor:
+            return None
+        try:
+            payload = signing.loads(cursor, salt=CURSOR_SALT)
+        except signing.BadSignature:
+            return None
+        if not isinstance(payload, dict) or payload.get('s') != self.signature:
+            return None
+        if not isinstance(payload.get('n'), int) or payload.get('d') not in ('n', 'p'):
+            return None
+        if self.keyset:
+            values = payload.get('v')
+            if not isinstance(values, list) or len(values) != len(self.keys):
+                return None
+            try:
+                payload['v'] = [
+                    None if v is None else field.to_python(v)
+                    for (_, field, _, _), v in zip(self.keys, values)
+                ]
+            except (ValidationError, TypeError, ValueError):
+                return None
+        elif not isinstance(payload.get('o'), int):
+            return None
+        return payload
+
+    # --- PÁGINAS ---
+
+    def get_page(self, cursor=None):
+        payload = self._decode(cursor)
+        if not self.keyset:
+            return self._offset_page(payload)
+
+        queryset = self._base_queryset()
+        if payload is None:
+            rows = list(queryset.order_by(*self._order_by())[:self.per_page + 1])
+            return self._build_page(rows, number=1, has_previous=False)
+
+        number = max(1, payload['n'])
+        if payload['d'] == 'p':
+            rows = list(
+                queryset.filter(self._seek(payload['v'], forward=False))
+                .order_by(*self._order_by(reverse=True))[:self.per_page + 1]
+            )
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            if not has_previous:
+                number = 1
+            return self._build_page(rows, number, has_previous=has_previous, has_next=True)
+
+        rows = list(
+            queryset.filter(self._seek(payload['v'], forward=True))
+            .order_by(*self._order_by())[:self.per_page + 1]
+        )
+        return self._build_page(rows, number, has_previous=True)
+
+    def _build_page(self, rows, number, has_previous, has_next=None):
+        if has_next is None:
+            has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        next_cursor = self._encode(number + 1, 'n', rows[-1]) if has_next and rows else None
+        previous_cursor = self._encode(number - 1, 'p', rows[0]) if has_previous and rows else None
+        return CursorPage(rows, number, self, next_cursor, previous_cursor)
+
+    def _offset_page(self, payload):
+        offset = payload['o'] if payload else 0
+        offset = max(0, offset)
+        rows = list(self.queryset.order_by(*self.ordering)[offset:offset + self.per_page + 1])
+        number = offset // self.per_page + 1
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        next_cursor = self._encode(number + 1, 'n', offset=offset + self.per_page) if has_next else None
+        previous_cursor = (
+            self._encode(number - 1, 'p', offset=max(0, offset - self.per_page)) if offset > 0 else None
+        )
+        return CursorPage(rows, number, self, next_cursor, previous_cursor)
+
+    # --- TOTAL ---
+
+    @cached_property
+    def count(self):
+        if self.count_mode == 'exact':
+            return self.queryset.count()
+        if self.count_mode == 'estimated':
+            estimate = self._estimated_count()
+            if estimate is not None:
+                return estimate
+        return self._cached_count()
+
+    @property
+    def num_pages(self):
+        return max(1, math.ceil(self.count / self.per_page))
+
+    def _cache_key(self):
+        if self.count_key:
+            return self.count_key
+        sql = str(self.queryset.order_by().query)
+        return 'pagination_count:' + hashlib.md5(sql.encode()).hexdigest()
+
+    def _cached_count(self):
+        key = self._cache_key()
+        total = cache.get(key)
+        if total is None:
+            total = self.queryset.count()
+            cache.set(key, total, self.count_timeout)
+        return total
+
+    def _estimated_count(self):
+        connection = connections[self.queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = self.queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
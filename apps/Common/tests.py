@@ -1,3 +1,76 @@
-from django.test import TestCase
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from Assets.models import Product, TechnicalSpec
+from .db import write_transaction
+from .pagination import CursorPaginator
+
+
+class CursorPaginatorTests(TestCase):
+    def setUp(self):
+        # Preços repetidos e nulos para exercitar desempate e NULLs no fim
+        prices = [100, 200, 200, None, 50, 200, None, 300, 150, 100, 75]
+        for i, price in enumerate(prices):
+            Product.objects.create(name=f"Produto {i}", sku=f"P-{i}", selling_price=price)
+        self.queryset = Product.objects.all()
+
+    def _walk(self, ordering, per_page=3):
+        paginator = CursorPaginator(self.queryset, per_page, ordering, count_mode='exact')
+        page = paginator.get_page()
+        pages = [page]
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            pages.append(page)
+        return paginator, pages
+
+    def test_forward_matches_offset_ordering(self):
+        for ordering in (['selling_price'], ['-selling_price'], ['-is_featured', '-created_at']):
+            paginator, pages = self._walk(ordering)
+            seen = [p.pk for page in pages for p in page]
+            expected = [p.pk for p in self.queryset.order_by(*paginator._order_by())]
+            self.assertEqual(seen, expected, ordering)
+            self.assertEqual([page.number for page in pages], list(range(1, len(pages) + 1)))
+
+    def test_backward_returns_same_pages(self):
+        paginator, pages = self._walk(['selling_price'])
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = paginator.get_page(page.previous_cursor)
+            self.assertEqual([p.pk for p in page], [p.pk for p in expected])
+            self.assertEqual(page.number, expected.number)
+        self.assertFalse(page.has_previous())
+
+    def test_tampered_cursor_restarts(self):
+        paginator = CursorPaginator(self.queryset, 3, ['selling_price'])
+        first = paginator.get_page()
+        self.assertEqual(list(paginator.get_page('lixo')), list(first))
+
+        other = CursorPaginator(self.queryset, 3, ['-created_at'])
+        self.assertEqual(other.get_page(first.next_cursor).number, 1)
+
+    def test_related_field_ordering_uses_keyset(self):
+        speeds = [40, None, 25, 40, 60, None, 32]
+        for product, speed in zip(self.queryset.order_by('pk'), speeds):
+            TechnicalSpec.objects.create(product=product, max_speed=speed)
+
+        paginator, pages = self._walk(['-specs__max_speed'])
+        self.assertTrue(paginator.keyset)
+        seen = [p.pk for page in pages for p in page]
+        expected = [p.pk for p in self.queryset.annotate(**paginator.annotations).order_by(*paginator._order_by())]
+        self.assertEqual(seen, expected)
+        # Maior velocidade primeiro; sem velocidade (NULL ou sem ficha) no fim
+        self.assertEqual(pages[0][0]._cursor_0, 60)
+        self.assertIsNone(pages[-1][-1]._cursor_0)
+
+
+class WriteTransactionTests(TransactionTestCase):
+    def test_only_write_transaction_takes_lock_at_begin(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("BEGIN IMMEDIATE é só do SQLite")
+        with CaptureQueriesContext(connection) as captured:
+            with write_transaction():
+                Product.objects.count()
+            with transaction.atomic():
+                Product.objects.count()
+        self.assertEqual([q['sql'] for q in captured if q['sql'].startswith('BEGIN')], ['BEGIN IMMEDIATE', 'BEGIN'])
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from unfold.admin import ModelAdmin, TabularInline
 from unfold.decorators import display # Helper para badges
-from .models import Order, OrderItem, OrderTimeline
+from .models import Order, OrderItem, OrderTimeline, OutboxEmail, StockReservation
 
 class OrderItemInline(TabularInline):
     model = OrderItem
@@ -13,6 +13,8 @@ class OrderAdmin(ModelAdmin):
     list_display = ('id', 'client', 'show_status', 'total_amount', 'created_at')
     list_filter = ('status', 'created_at') # O Unfold cria filtros laterais bonitos auto
     search_fields = ('client__user__email', 'id')
+    # Totais mantidos pelos itens (Orders/totals.py)
+    readonly_fields = ('subtotal_amount', 'total_amount')
     
     inlines = [OrderItemInline]
 
@@ -21,6 +23,7 @@ class OrderAdmin(ModelAdmin):
         description="Status",
         label={
             'QUOTE': 'info',      # Azul
+            'PAYMENT_REVIEW': 'danger', # Pago sem estoque: alguém precisa resolver
             'APPROVED': 'primary', # Roxo
             'IN_PROGRESS': 'warning', # Amarelo (Oficina trabalhando)
             'READY': 'success',   # Verde
@@ -30,3 +33,29 @@ class OrderAdmin(ModelAdmin):
     )
     def show_status(self, obj):
         return obj.status
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(ModelAdmin):
+    list_display = ('order', 'product', 'quantity', 'expires_at')
+    list_select_related = ('order', 'product')
+    readonly_fields = ('order', 'product', 'quantity', 'expires_at')
+
+    # Reserva mexe no reserved_quantity do produto: só o checkout cria, e apagar
+    # pelo admin passa pelo release() para devolver a quantidade ao disponível
+    def has_add_permission(self, request):
+        return False
+
+    def delete_model(self, request, obj):
+        StockReservation.objects.filter(pk=obj.pk).release()
+
+    def delete_queryset(self, request, queryset):
+        queryset.release()
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(ModelAdmin):
+    list_display = ('subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('to', 'subject')
+    readonly_fields = ('to', 'subject', 'body', 'attempts', 'last_error', 'created_at', 'sent_at')
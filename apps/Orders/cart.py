@@ -1,108 +1,536 @@
-from decimal import Decimal
+"""
+Carrinho: cliente logado no cache com gravação no banco depois
+(write-behind); visitante num cookie assinado, sem tocar no banco.
+
+Do cliente logado, o conteúdo ({produto: quantidade} + cupom) fica no cache
+padrão (CACHES: locmem no processo, ou Redis/Memcached compartilhado entre
+processos):
+
+    leitura   cache; se faltar, carrega Cart/CartItem do banco (2 queries)
+              e guarda no cache
+    mudança   grava só no cache e agenda a persistência fora do request;
+              várias mudanças em sequência viram uma escrita só
+              (CART_WRITE_BEHIND_SECONDS; 0 = grava no próprio request)
+    checkout  persist() síncrono antes de criar o pedido; depois forget()
+
+Para o cliente logado o banco continua sendo a fonte da verdade: o cache é
+uma cópia descartável (expira em CART_CACHE_TIMEOUT e é recarregada do
+banco). Com o cache padrão (locmem) cada worker tem a sua cópia, então:
+
+    revisão   Cart.revision sobe a cada gravação do carrinho (daqui, do
+              checkout, do merge do cookie); a cópia em cache guarda a
+              revisão de onde saiu
+    leitura   antes de usar a cópia, uma query confere (Cart, revisão) do
+              cliente no banco; diferente = outro worker gravou, o checkout
+              esvaziou ou a limpeza apagou: o carrinho volta do banco
+    gravação  UPDATE condicional na revisão da cópia: se o banco andou, a
+              cópia velha não sobrescreve nada (nem recria Cart apagado)
+    rebase    nos dois casos, a mudança ainda não gravada da cópia (linha
+              diferente da base, o conteúdo do banco de onde ela saiu) é
+              refeita sobre o banco; linha que o banco também mudou fica
+              como está lá (ex.: o checkout levou o produto)
+
+A gravação em segundo plano é uma thread só por processo, com um prazo por
+carrinho. Quem altera Cart/CartItem direto no banco (admin, scripts) sobe
+a revisão ou chama forget_cart(owner).
+
+Visitante não tem sessão, Cart nem cache: o carrinho vai inteiro num cookie
+assinado (CART_COOKIE_NAME, "12.1-30.2_5" = produto.quantidade-..._cupom),
+gravado na resposta pelo CartCookieMiddleware só quando muda. Robô ou
+curioso que só navega não gera linha nenhuma. No login (signal em
+Orders/signals.py) — ou no primeiro acesso ao carrinho já logado, caso do
+checkout — o cookie é somado ao Cart do cliente num merge em lote e apagado.
+"""
+import atexit
+import heapq
+import logging
+import threading
+import time
+
 from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
 from Assets.models import Product
-from .models import Coupon 
+from Clients.models import Client
+from .models import Cart, CartItem, Coupon
+from .pricing import price_lines
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'cart'
+COOKIE_SALT = 'Orders.cart'
+
+
+def _cache_key(owner):
+    return f'{CACHE_PREFIX}:{owner}'
+
+
+def _empty_state():
+    # version/saved: mudanças deste estado; cart_id/revision: de que linha do banco ele saiu;
+    # base: o conteúdo do banco nessa revisão (o que mudou desde então está pendente)
+    return {
+        'cart_id': None, 'revision': 0, 'lines': {}, 'coupon_id': None, 'version': 0, 'saved': 0,
+        'base': {'lines': {}, 'coupon_id': None},
+    }
+
+
+def _cart_lookup(owner):
+    # owner = 'user:<id>' (só cliente logado tem carrinho no banco)
+    return {'user__user_id': owner.partition(':')[2]}
+
+
+def load_state(owner):
+    """Estado do carrinho a partir do banco (fonte da verdade)."""
+    state = _empty_state()
+    cart = Cart.objects.filter(**_cart_lookup(owner)).order_by('-pk').values('pk', 'coupon_id', 'revision').first()
+    if cart:
+        state['cart_id'], state['coupon_id'], state['revision'] = cart['pk'], cart['coupon_id'], cart['revision']
+        state['lines'] = dict(CartItem.objects.filter(cart_id=cart['pk']).values_list('product_id', 'quantity'))
+    state['base'] = {'lines': dict(state['lines']), 'coupon_id': state['coupon_id']}
+    return state
+
+
+def _db_revision(owner):
+    """(Cart, revisão) do cliente no banco; (None, 0) se não tem carrinho."""
+    row = Cart.objects.filter(**_cart_lookup(owner)).order_by('-pk').values_list('pk', 'revision').first()
+    return row or (None, 0)
+
+
+def is_current(owner, state):
+    """A cópia em cache saiu do que está no banco agora?"""
+    return (state['cart_id'], state['revision']) == _db_revision(owner)
+
+
+def _db_cart(owner):
+    cart = Cart.objects.filter(**_cart_lookup(owner)).order_by('-pk').first()
+    if cart:
+        return cart
+    client, _ = Client.objects.get_or_create(user_id=owner.partition(':')[2])
+    return Cart.objects.create(user=client)
+
+
+def _write_state(owner, state):
+    """
+    Grava o estado sobre a revisão de onde ele saiu. Retorna o Cart, ou None
+    se o banco andou desde então (a cópia está velha e não grava nada).
+    """
+    with transaction.atomic():
+        if state['cart_id']:
+            claimed = Cart.objects.filter(pk=state['cart_id'], revision=state['revision']).update(
+                coupon_id=state['coupon_id'], updated_at=timezone.now(), revision=F('revision') + 1,
+            )
+            if not claimed:
+                return None
+            cart = Cart.objects.get(pk=state['cart_id'])
+        else:
+            if Cart.objects.filter(**_cart_lookup(owner)).exists():
+                return None  # outro worker criou o carrinho antes
+            client, _ = Client.objects.get_or_create(user_id=owner.partition(':')[2])
+            cart = Cart.objects.create(user=client, coupon_id=state['coupon_id'], revision=1)
+
+        # Produto apagado enquanto estava no carrinho some na gravação
+        lines = state['lines']
+        if lines:
+            existing = set(Product.objects.filter(pk__in=list(lines)).values_list('pk', flat=True))
+            lines = {pk: quantity for pk, quantity in lines.items() if pk in existing}
+        current = {item.product_id: item for item in CartItem.objects.filter(cart=cart)}
+        CartItem.objects.filter(cart=cart).exclude(product_id__in=list(lines)).delete()
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, product_id=pk, quantity=quantity) for pk, quantity in lines.items() if pk not in current
+        ])
+        changed = [item for pk, item in current.items() if pk in lines and item.quantity != lines[pk]]
+        for item in changed:
+            item.quantity = lines[item.product_id]
+        CartItem.objects.bulk_update(changed, ['quantity'])
+    return cart
+
+
+def _rebase(state, fresh):
+    """
+    Refaz as mudanças pendentes de state (o que difere da base de onde ela
+    saiu) sobre fresh. Linha (ou cupom) que fresh também mudou em relação à
+    base fica como está em fresh.
+    """
+    base, lines = state['base'], dict(fresh['lines'])
+    for pk in set(state['lines']) | set(base['lines']):
+        ours, was = state['lines'].get(pk), base['lines'].get(pk)
+        if ours == was or fresh['lines'].get(pk) != was:
+            continue
+        if ours is None:
+            lines.pop(pk, None)
+        else:
+            lines[pk] = ours
+    coupon_id = fresh['coupon_id']
+    if state['coupon_id'] != base['coupon_id'] and fresh['coupon_id'] == base['coupon_id']:
+        coupon_id = state['coupon_id']
+
+    rebased = dict(fresh, lines=lines, coupon_id=coupon_id, version=state['version'], saved=state['saved'])
+    if (lines, coupon_id) == (fresh['lines'], fresh['coupon_id']) and fresh['saved'] == fresh['version']:
+        rebased['saved'] = state['version']  # nada sobrou para gravar
+    return rebased
+
+
+def _rebase_on_db(owner, state):
+    """A cópia velha do cache refeita sobre o que está no banco agora."""
+    fresh = load_state(owner)
+    if state['cart_id'] and fresh['cart_id'] != state['cart_id']:
+        # O Cart foi apagado (limpeza, admin): o carrinho recomeça do banco
+        logger.info("Carrinho %s em cache era de um Cart apagado; descartado", owner)
+        return dict(fresh, version=state['version'], saved=state['version'])
+    return _rebase(state, fresh)
+
+
+# Mudança no request e anotação da gravação em segundo plano no mesmo estado do cache
+_state_lock = threading.Lock()
+
+
+def persist_cart(owner, attempts=3):
+    """Grava o estado do cache em Cart/CartItem (se houver mudança não salva). Retorna o Cart."""
+    state = cache.get(_cache_key(owner))
+    if state is None:
+        return None
+    if state['saved'] == state['version'] and state['cart_id']:
+        return Cart.objects.filter(pk=state['cart_id']).first()
+
+    pending, cart = state, None
+    for _ in range(attempts):
+        if pending['saved'] == pending['version']:
+            cart = Cart.objects.filter(pk=pending['cart_id']).first() if pending['cart_id'] else None
+            break
+        cart = _write_state(owner, pending)
+        if cart is not None:
+            pending = dict(pending, cart_id=cart.pk, revision=cart.revision, saved=pending['version'])
+            break
+        # O banco andou desde a cópia: a mudança pendente vai por cima dele
+        pending = _rebase_on_db(owner, pending)
+    else:
+        logger.warning("Carrinho %s: banco mudou a cada tentativa; a gravação fica para depois", owner)
+
+    with _state_lock:
+        latest = cache.get(_cache_key(owner))
+        if latest is not None and latest['version'] >= state['version']:
+            # Mudança feita no cache durante a gravação (latest além de state) vai por
+            # cima do que foi gravado, como no rebase
+            if pending['saved'] == pending['version']:
+                pending = dict(pending, base={'lines': dict(pending['lines']), 'coupon_id': pending['coupon_id']})
+            latest = dict(latest, base={'lines': state['lines'], 'coupon_id': state['coupon_id']})
+            cache.set(_cache_key(owner), _rebase(latest, pending), _timeout())
+    return cart or Cart.objects.filter(**_cart_lookup(owner)).order_by('-pk').first()
+
+
+def forget_cart(owner):
+    """Descarta a cópia em cache (a próxima leitura vem do banco)."""
+    _write_behind.cancel(owner)
+    cache.delete(_cache_key(owner))
+
+
+def _timeout():
+    return getattr(settings, 'CART_CACHE_TIMEOUT', 86400)
+
+
+# --- GRAVAÇÃO EM SEGUNDO PLANO ---
+
+class _WriteBehind:
+    """
+    Uma thread só para o processo inteiro: cada carrinho ganha um prazo, e
+    as mudanças dentro dele viram uma gravação só.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._due = {}  # dono -> prazo (time.monotonic)
+        self._heap = []  # (prazo, dono); entradas canceladas ficam e são puladas
+        self._thread = None
 
- 
-class Cart:
+    def schedule(self, owner, delay):
+        with self._cond:
+            if owner in self._due:
+                return
+            due = time.monotonic() + delay
+            self._due[owner] = due
+            heapq.heappush(self._heap, (due, owner))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='cart-write-behind', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def cancel(self, owner):
+        with self._cond:
+            self._due.pop(owner, None)
+
+    def _next_batch(self):
+        """Espera o próximo prazo vencer e devolve os donos vencidos."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                ready = []
+                while self._heap and self._heap[0][0] <= now:
+                    due, owner = heapq.heappop(self._heap)
+                    if self._due.get(owner) == due:
+                        del self._due[owner]
+                        ready.append(owner)
+                if ready:
+                    return ready
+                self._cond.wait(self._heap[0][0] - now if self._heap else None)
+
+    def _loop(self):
+        while True:
+            owners = self._next_batch()
+            close_old_connections()
+            for owner in owners:
+                try:
+                    persist_cart(owner)
+                except Exception:
+                    logger.exception("Falha ao gravar o carrinho %s", owner)
+            close_old_connections()
+
+    def flush(self):
+        """Grava agora tudo que estava agendado (testes, desligamento)."""
+        with self._cond:
+            owners, self._due = list(self._due), {}
+            self._heap = []
+        for owner in owners:
+            persist_cart(owner)
+
+
+_write_behind = _WriteBehind()
+flush_pending_carts = _write_behind.flush
+atexit.register(flush_pending_carts)
+
+
+# --- CARRINHO DO VISITANTE (COOKIE) ---
+
+def _cookie_name():
+    return getattr(settings, 'CART_COOKIE_NAME', 'cart')
+
+
+def _cookie_max_age():
+    return getattr(settings, 'CART_COOKIE_MAX_AGE', 30 * 86400)
+
+
+def encode_cookie(state):
+    """'12.1-30.2_5': produto.quantidade separados por '-', cupom depois do '_'."""
+    value = '-'.join(f'{pk}.{quantity}' for pk, quantity in state['lines'].items())
+    if state['coupon_id']:
+        value += f"_{state['coupon_id']}"
+    return value
+
+
+def decode_cookie(value):
+    state = _empty_state()
+    lines, _, coupon_id = value.partition('_')
+    try:
+        for line in filter(None, lines.split('-')):
+            pk, _, quantity = line.partition('.')
+            if int(quantity) > 0:
+                state['lines'][int(pk)] = int(quantity)
+        state['coupon_id'] = int(coupon_id) if coupon_id else None
+    except ValueError:
+        return _empty_state()
+    return state
+
+
+def read_cookie(request):
+    """Estado do carrinho do cookie; ausente, adulterado ou vencido = vazio."""
+    value = request.get_signed_cookie(_cookie_name(), default='', salt=COOKIE_SALT, max_age=_cookie_max_age())
+    return decode_cookie(value)
+
+
+def write_cookie(response, state=None):
+    """Grava o estado no cookie assinado; sem estado (ou carrinho vazio) apaga o cookie."""
+    if state is None or (not state['lines'] and not state['coupon_id']):
+        response.delete_cookie(_cookie_name())
+        return
+    response.set_signed_cookie(
+        _cookie_name(), encode_cookie(state), salt=COOKIE_SALT, max_age=_cookie_max_age(),
+        httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+    )
+
+
+def promote_cookie_cart(request, user):
+    """
+    Soma o carrinho do cookie ao Cart do cliente, num merge em lote (uma
+    transação: itens novos num INSERT, quantidades somadas num UPDATE), e
+    marca o cookie para ser apagado na resposta.
+    """
+    if getattr(request, '_cart_cookie_promoted', False) or _cookie_name() not in request.COOKIES:
+        return None
+    request._cart_cookie_promoted = True
+    state = read_cookie(request)
+    if not state['lines'] and not state['coupon_id']:
+        return None
+
+    owner = f'user:{user.pk}'
+    # Mudança do cliente ainda no cache entra antes do merge
+    _write_behind.cancel(owner)
+    persist_cart(owner)
+    with transaction.atomic():
+        cart = _db_cart(owner)
+        lines = state['lines']
+        existing = set(Product.objects.filter(pk__in=list(lines)).values_list('pk', flat=True))
+        current = {item.product_id: item for item in CartItem.objects.filter(cart=cart, product_id__in=existing)}
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, product_id=pk, quantity=quantity)
+            for pk, quantity in lines.items() if pk in existing and pk not in current
+        ])
+        for item in current.values():
+            item.quantity += lines[item.product_id]
+        CartItem.objects.bulk_update(list(current.values()), ['quantity'])
+        changes = {'updated_at': timezone.now(), 'revision': F('revision') + 1}
+        if state['coupon_id'] and Coupon.objects.filter(pk=state['coupon_id'], active=True).exists():
+            changes['coupon_id'] = state['coupon_id']
+        Cart.objects.filter(pk=cart.pk).update(**changes)
+    forget_cart(owner)
+    return cart
+
+
+# --- CARRINHO DO REQUEST ---
+
+class CartStore:
     def __init__(self, request):
-        self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
-        # Recupera o cupom da sessão (se existir)
-        self.coupon_id = self.session.get('coupon_id')
+        self.request = request
+        self._state = None
+        self._pricing = None
+        # Visitante: o CartCookieMiddleware regrava o cookie se mudou
+        self.cookie_dirty = False
+
+    @property
+    def owner(self):
+        """'user:<id>' do cliente logado; None para visitante (carrinho no cookie)."""
+        if self.request.user.is_authenticated:
+            return f'user:{self.request.user.pk}'
+        return None
+
+    @property
+    def state(self):
+        if self._state is None:
+            owner = self.owner
+            if owner is None:
+                self._state = read_cookie(self.request)
+                return self._state
+            # Logou sem passar pelo login do site (ou o signal falhou): o checkout ainda junta o cookie
+            promote_cookie_cart(self.request, self.request.user)
+            state = cache.get(_cache_key(owner))
+            if state is not None and not is_current(owner, state):
+                # Outro worker gravou, o checkout esvaziou ou a limpeza apagou: o que
+                # ainda não foi gravado daqui vai por cima do banco (a gravação agendada segue)
+                state = _rebase_on_db(owner, state)
+                cache.set(_cache_key(owner), state, _timeout())
+            if state is None:
+                state = load_state(owner)
+                cache.set(_cache_key(owner), state, _timeout())
+            self._state = state
+        return self._state
+
+    @property
+    def lines(self):
+        return self.state['lines']
+
+    @property
+    def coupon_id(self):
+        return self.state['coupon_id']
+
+    def __len__(self):
+        return sum(self.lines.values())
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def quantity(self, product_id):
+        return self.lines.get(product_id, 0)
 
     def add(self, product, quantity=1, update_quantity=False):
-            """
-            Adiciona um produto ao carrinho com verificação de estoque.
-            """
-            product_id = str(product.id)
-            if product_id not in self.cart:
-                self.cart[product_id] = {'quantity': 0, 'price': str(product.selling_price)}
-            
-            # 1. Calcula a quantidade final desejada
-            current_qty_in_cart = self.cart[product_id]['quantity']
-            
-            if update_quantity:
-                desired_qty = quantity
-            else:
-                desired_qty = current_qty_in_cart + quantity
-
-            # 2. VALIDAÇÃO DE ESTOQUE (A melhoria robusta)
-            # Se a quantidade desejada for maior que o estoque real, lançamos erro ou limitamos.
-            if desired_qty > product.stock_quantity:
-                # Opção A: Lança erro (vamos tratar na view)
-                # Opção B: Trava no máximo disponível (vamos usar esta, é mais amigável)
-                self.cart[product_id]['quantity'] = product.stock_quantity
-                limit_reached = True # Flag para avisar o usuário
-            else:
-                self.cart[product_id]['quantity'] = desired_qty
-                limit_reached = False
-                
-            self.save()
-            return limit_reached # Retorna True se o estoque limitou a adição
-
-    def remove(self, product):
         """
-        Remove um produto do carrinho.
+        Adiciona (ou define, com update_quantity) a quantidade de um produto,
+        limitada ao disponível. Retorna True se o estoque limitou.
         """
-        product_id = str(product.id)
-        if product_id in self.cart:
-            del self.cart[product_id]
-            self.save()
+        desired = quantity if update_quantity else self.quantity(product.pk) + quantity
+        limit_reached = desired > product.available_quantity
+        desired = min(desired, product.available_quantity)
+        if desired <= 0:
+            self.remove(product.pk)
+        else:
+            self._change(lambda state: state['lines'].__setitem__(product.pk, desired))
+        return limit_reached
 
-    def __iter__(self):
-        """
-        Itera sobre os itens do carrinho e busca os produtos no banco de dados.
-        """
-        product_ids = self.cart.keys()
-        # Busca os produtos reais no banco
-        products = Product.objects.filter(id__in=product_ids)
-        cart = self.cart.copy()
+    def remove(self, product_id):
+        if product_id in self.lines:
+            self._change(lambda state: state['lines'].pop(product_id, None))
 
-        for product in products:
-            cart[str(product.id)]['product'] = product
+    def set_coupon(self, coupon):
+        self._change(lambda state: state.__setitem__('coupon_id', coupon.pk if coupon else None))
 
-        for item in cart.values():
-            item['price'] = Decimal(item['price'])
-            item['total_price'] = item['price'] * item['quantity']
-            yield item
+    def pricing(self):
+        """Linhas, subtotal, desconto e total (uma query; memoizado até a próxima mudança)."""
+        if self._pricing is None:
+            self._pricing = price_lines(self.lines, self.coupon_id)
+        return self._pricing
 
-    def __len__(self):
+    def persist(self):
         """
-        Conta quantos itens tem no carrinho.
+        Grava já (checkout). Retorna o Cart do banco (ou None se o carrinho
+        nunca existiu). Se o que ficou no banco não é o que este request leu
+        (cópia refeita sobre o banco, cache perdido), o preço memoizado deixa
+        de valer: priced() passa a ser None.
         """
-        return sum(item['quantity'] for item in self.cart.values())
-
-    def get_total_price(self):
-        return sum(Decimal(item['price']) * item['quantity'] for item in self.cart.values())
+        owner = self.owner
+        if owner is None:
+            return None
+        _write_behind.cancel(owner)
+        # Sem estado no cache, o banco já está em dia
+        cart = persist_cart(owner) or Cart.objects.filter(**_cart_lookup(owner)).order_by('-pk').first()
+        saved = cache.get(_cache_key(owner))
+        if saved is None or saved['saved'] != saved['version'] or cart is None or (
+            (saved['cart_id'], saved['revision'], saved['lines'], saved['coupon_id'])
+            != (cart.pk, cart.revision, self.lines, self.coupon_id)
+        ):
+            self._pricing = None
+        return cart
 
+    def priced(self):
+        """O preço memoizado (pricing()), se ainda vale para o carrinho; senão None."""
+        return self._pricing
 
+    def forget(self):
+        if self.owner:
+            forget_cart(self.owner)
+            self._state = None
+        else:
+            self._state = _empty_state()
+            self.cookie_dirty = True
+        self._pricing = None
 
-    def clear(self):
-        # Remove o carrinho da sessão
-        del self.session[settings.CART_SESSION_ID]
-        self.save()
+    def _change(self, mutate):
+        owner = self.owner
+        state = self.state
+        self._pricing = None
+        if owner is None:
+            mutate(state)
+            state['version'] += 1
+            self.cookie_dirty = True
+            return
+        with _state_lock:
+            # A mudança vai sobre a cópia mais nova do cache: outro request do mesmo
+            # cliente (ou a gravação em segundo plano) pode ter mexido nela desde a leitura
+            state = cache.get(_cache_key(owner)) or state
+            mutate(state)
+            state['version'] += 1
+            cache.set(_cache_key(owner), state, _timeout())
+        self._state = state
 
-    def save(self):
-        # Marca a sessão como "modificada" para garantir que o Django salve
-        self.session.modified = True
+        delay = getattr(settings, 'CART_WRITE_BEHIND_SECONDS', 2)
+        if delay:
+            _write_behind.schedule(owner, delay)
+        else:
+            persist_cart(owner)
 
-    @property
-    def coupon(self):
-        if self.coupon_id:
-            try:
-                return Coupon.objects.get(id=self.coupon_id)
-            except Coupon.DoesNotExist:
-                return None
-        return None
 
-    def get_discount(self):
-        if self.coupon:
-            return (self.coupon.discount / Decimal(100)) * self.get_total_price()
-        return Decimal(0)
+def get_cart(request):
+    """O carrinho do request (memoizado no próprio request)."""
+    if not hasattr(request, '_cart_store'):
+        request._cart_store = CartStore(request)
+    return request._cart_store
 
-    def get_total_price_after_discount(self):
-        return self.get_total_price() - self.get_discount()
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""
+Carrinho -> Pedido em lote.
+
+Antes, o checkout fazia um select_for_update().get() e um
+OrderItem.objects.create() por item, e depois o update_total() relia os
+itens e salvava o pedido de novo: 30+ idas ao banco num carrinho de 10
+itens, com os produtos travados na ordem do carrinho (dois checkouts com
+os mesmos produtos em ordens diferentes podiam entrar em deadlock).
+
+Aqui o número de queries não depende do tamanho do carrinho:
+    1. preço do carrinho (pricing.py): itens, produtos, totais e cupom numa
+       query, sem lock — ou o que o request já calculou para a tela
+    2. valida o disponível em memória
+    3. INSERT do pedido já com o total + bulk_create dos itens (snapshot)
+    4. reserva o pedido inteiro com prazo (reservations.py): um UPDATE
+       condicional nos produtos decide quem leva a última unidade, sem
+       SELECT ... FOR UPDATE segurando as linhas durante o checkout
+    5. esvazia o carrinho e sobe a revisão dele (cart.py)
+"""
+from django.db.models import F
+from django.utils import timezone
+
+from Assets.stock import InsufficientStock
+from Common.db import write_transaction
+from .models import Cart, Order, OrderItem
+from .pricing import price_cart
+from .reservations import reserve_order
+
+
+class CheckoutError(ValueError):
+    """Problema que o cliente precisa ver (ex.: produto esgotou)."""
+
+
+def create_order_from_cart(cart, client, pricing=None):
+    """
+    `pricing`: o preço do mesmo carrinho já calculado no request
+    (CartStore.pricing()); sem ele, é calculado aqui a partir do Cart.
+    """
+    # Lê e depois escreve: no SQLite, pega o lock de escrita já no BEGIN (Common/db.py)
+    with write_transaction():
+        pricing = pricing or price_cart(cart)
+        quantities = pricing.quantities()
+        if not quantities:
+            raise CheckoutError("Seu carrinho está vazio.")
+
+        products = {line.product.pk: line.product for line in pricing.lines}
+
+        order = Order(client=client, status='QUOTE', coupon_id=cart.coupon_id)
+        items = []
+        for product_id, quantity in sorted(quantities.items()):
+            product = products[product_id]
+            if product.available_quantity < quantity:
+                raise CheckoutError(f"Desculpe, o produto {product.name} acabou de esgotar.")
+            item = OrderItem(order=order, product=product, quantity=quantity)
+            item.fill_snapshot()
+            items.append(item)
+
+        # bulk_create não passa pelos signals dos totais: já grava no INSERT
+        order.subtotal_amount = pricing.subtotal
+        order.total_amount = pricing.total
+        order.save()
+        OrderItem.objects.bulk_create(items)
+        try:
+            # Serviço não tem estoque (mesma regra de Order.stock_quantities)
+            reserve_order(order, {
+                pk: quantity for pk, quantity in quantities.items() if products[pk].product_type != 'SERVICE'
+            })
+        except InsufficientStock as exc:
+            # Outro checkout levou a última unidade entre a leitura e a reserva
+            raise CheckoutError(f"Desculpe, o produto {exc.products[0].name} acabou de esgotar.")
+
+        cart.items.all().delete()
+        # Nova revisão: cópias do carrinho em cache nos outros workers deixam de valer
+        Cart.objects.filter(pk=cart.pk).update(coupon=None, revision=F('revision') + 1, updated_at=timezone.now())
+        cart.coupon = None
+    return order
@@ -0,0 +1,83 @@
+"""
+Limpeza de carrinhos abandonados e sessões vencidas, em lotes pequenos.
+
+Nada apagava essas linhas: carrinho de visitante por session_key (do
+tempo antes do cookie, ver cart.py), carrinho de cliente que nunca virou
+pedido e django_session vencida só cresciam.
+
+Cada lote é uma transação curta e separada (commit a cada lote): o
+SELECT pega as chaves pelo índice de data (Cart (updated_at, user),
+Session.expire_date) e o DELETE apaga por chave primária — em tabela com
+milhões de linhas, o lock de escrita dura um lote, não a limpeza inteira,
+e checkout/login continuam passando entre um lote e outro.
+
+    visitante  Cart sem cliente parado há mais que SESSION_COOKIE_AGE
+               (a sessão dele já venceu, ninguém acha mais esse carrinho)
+    cliente    Cart parado há mais de CART_ABANDONED_DAYS
+    sessões    expire_date no passado (só com sessão no banco)
+
+A limpeza roda em outro processo e não alcança o cache de cada worker; não
+precisa: a cópia em cache de um carrinho apagado deixa de bater com o banco
+(cart.py confere Cart/revisão antes de usar e grava com UPDATE condicional),
+então é descartada em vez de servida ou regravada.
+
+Roda pelo comando purge_stale_carts (cron, ou --loop como worker).
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Cart
+
+DB_SESSION_ENGINES = ('django.contrib.sessions.backends.db', 'django.contrib.sessions.backends.cached_db')
+
+
+def abandoned_after():
+    return timedelta(days=getattr(settings, 'CART_ABANDONED_DAYS', 30))
+
+
+def _purge(queryset, order_field, batch_size, pause):
+    """Apaga `queryset` em lotes de `batch_size` chaves. Retorna {modelo: linhas}."""
+    removed = {}
+    while True:
+        keys = list(queryset.order_by(order_field).values_list('pk', flat=True)[:batch_size])
+        if not keys:
+            return removed
+        # Por chave primária, com o filtro de novo (quem voltou a mexer no carrinho
+        # nesse meio tempo fica); delete() é atômico: commit no fim do lote
+        _, per_model = queryset.filter(pk__in=keys).delete()
+        for label, count in per_model.items():
+            removed[label] = removed.get(label, 0) + count
+        if len(keys) < batch_size:
+            return removed
+        if pause:
+            time.sleep(pause)
+
+
+def stale_carts(now=None):
+    """
+    Carrinhos de visitante e de cliente vencidos, numa consulta só: o
+    updated_at < (maior prazo) explícito faz o banco andar pelo índice
+    (updated_at, user) em ordem, sem ordenar a tabela a cada lote — com
+    user IS NULL sozinho, o SQLite escolhia o índice do FK e ordenava tudo.
+    """
+    now = now or timezone.now()
+    anonymous = now - timedelta(seconds=settings.SESSION_COOKIE_AGE)
+    customer = now - abandoned_after()
+    return Cart.objects.filter(
+        Q(user__isnull=True, updated_at__lt=anonymous) | Q(user__isnull=False, updated_at__lt=customer),
+        updated_at__lt=max(anonymous, customer),
+    )
+
+
+def purge_stale(batch_size=500, pause=0, now=None):
+    """Apaga carrinhos abandonados e sessões vencidas. Retorna {modelo: linhas apagadas}."""
+    now = now or timezone.now()
+    removed = _purge(stale_carts(now), 'updated_at', batch_size, pause)
+    if settings.SESSION_ENGINE in DB_SESSION_ENGINES:
+        removed.update(_purge(Session.objects.filter(expire_date__lt=now), 'expire_date', batch_size, pause))
+    return removed
@@ -0,0 +1,109 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.test import Client as HttpClient, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+
+from Assets.models import Product
+from Common.benchmark import rollback_after
+from Orders.models import Cart, CartItem
+
+PREFIX = 'BENCHANON'
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def _legacy_cart(request):
+    """O carrinho antigo do visitante: sessão no banco + Cart por session_key."""
+    if not request.session.session_key:
+        request.session.create()
+    cart, _ = Cart.objects.get_or_create(session_key=request.session.session_key, user=None)
+    return cart
+
+
+def legacy_cart_detail(request):
+    cart = _legacy_cart(request)
+    return HttpResponse(f"{sum(item.quantity for item in cart.items.select_related('product'))} itens")
+
+
+def legacy_cart_add(request, product_id):
+    cart = _legacy_cart(request)
+    product = get_object_or_404(Product, id=product_id)
+    cart_item, created = CartItem.objects.get_or_create(cart=cart, product=product)
+    if not created:
+        cart_item.quantity += 1
+        cart_item.save()
+    return redirect('bench_legacy_cart_detail')
+
+
+# URLs do site + o fluxo antigo, para os dois passarem pelos mesmos middlewares
+urlpatterns = [
+    path('bench-antigo/carrinho/', legacy_cart_detail, name='bench_legacy_cart_detail'),
+    path('bench-antigo/carrinho/add/<int:product_id>/', legacy_cart_add, name='bench_legacy_cart_add'),
+    path('', include('core.urls')),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede escritas no banco por visitante anônimo: carrinho antigo (sessão + Cart no banco) '
+        'x cookie assinado. Roda dentro de uma transação desfeita no final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--visitors', type=int, default=200, help='Visitantes simulados por fluxo')
+        parser.add_argument('--browse-only', type=float, default=0.7,
+                            help='Fração que só abre o carrinho (robôs, curiosos)')
+
+    def handle(self, *args, **options):
+        with rollback_after(), override_settings(ROOT_URLCONF=__name__, ALLOWED_HOSTS=['testserver']):
+            products = Product.objects.bulk_create([
+                Product(name=f'{PREFIX} {i}', slug=f'{PREFIX.lower()}-{i}', sku=f'{PREFIX}-{i}',
+                        product_type='COMPONENT', selling_price=100, stock_quantity=10 ** 6)
+                for i in range(2)
+            ])
+            flows = (
+                ('antigo', 'bench_legacy_cart_detail', 'bench_legacy_cart_add'),
+                ('cookie', 'cart_detail', 'cart_add'),
+            )
+            # Aquece caches (configuração do site etc.) fora da medição
+            HttpClient().get(reverse('cart_detail'))
+
+            self.stdout.write(
+                f"🍪 {options['visitors']} visitantes por fluxo, {options['browse_only']:.0%} só olhando "
+                f"({connection.vendor})"
+            )
+            self.stdout.write(
+                f"{'fluxo':<8} {'escritas':>9} {'escritas/visitante':>19} {'sessões':>8} {'carts':>6} "
+                f"{'itens':>6} {'visitantes/s':>13}"
+            )
+            for label, detail, add in flows:
+                self._run(label, detail, add, products, options)
+
+    def _run(self, label, detail, add, products, options):
+        sessions, carts, items = Session.objects.count(), Cart.objects.count(), CartItem.objects.count()
+        browsers = int(options['visitors'] * options['browse_only'])
+        writes = 0
+
+        start = time.perf_counter()
+        for i in range(options['visitors']):
+            visitor = HttpClient()
+            with CaptureQueriesContext(connection) as captured:
+                visitor.get(reverse(detail))
+                if i >= browsers:
+                    # Compra: dois produtos, um deles duas vezes, e volta ao carrinho
+                    for product in (products[0], products[1], products[0]):
+                        visitor.get(reverse(add, args=[product.pk]))
+                    visitor.get(reverse(detail))
+            writes += sum(1 for query in captured if query['sql'].lstrip().upper().startswith(WRITES))
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"{label:<8} {writes:>9} {writes / options['visitors']:>19.2f} "
+            f"{Session.objects.count() - sessions:>8} {Cart.objects.count() - carts:>6} "
+            f"{CartItem.objects.count() - items:>6} {options['visitors'] / elapsed:>13.1f}"
+        )
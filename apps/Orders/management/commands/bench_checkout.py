@@ -0,0 +1,146 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from Assets.models import Product
+from Clients.models import Client
+from Common.benchmark import summarize
+from Orders.checkout import CheckoutError, create_order_from_cart
+from Orders.models import Cart, CartItem, Order, OrderItem
+
+PREFIX = 'BENCHCK'
+
+
+def legacy_checkout(cart, client):
+    """O checkout antigo (um lock + um INSERT por item, depois update_total), para comparação."""
+    with transaction.atomic():
+        order = Order.objects.create(client=client, status='QUOTE', coupon=cart.coupon, total_amount=0)
+        for cart_item in cart.items.all():
+            product = cart_item.product
+            product_in_db = Product.objects.select_for_update().get(id=product.id)
+            if product_in_db.stock_quantity < cart_item.quantity:
+                raise CheckoutError(f"Desculpe, o produto {product.name} acabou de esgotar.")
+            OrderItem.objects.create(order=order, product=product, quantity=cart_item.quantity)
+        order.update_total()
+        cart.items.all().delete()
+        cart.coupon = None
+        cart.save()
+    return order
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede checkouts/s com clientes em paralelo (checkout em lote x antigo item a item). '
+        'Grava no banco de verdade (threads não enxergam uma transação aberta) e apaga tudo no fim.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=8, help='Threads (clientes simultâneos)')
+        parser.add_argument('--checkouts', type=int, default=50, help='Checkouts por cliente')
+        parser.add_argument('--items', type=int, default=10, help='Itens por carrinho')
+        parser.add_argument('--products', type=int, default=30,
+                            help='Produtos disputados (menos produtos = mais contenção)')
+
+    def handle(self, *args, **options):
+        self._cleanup()
+        try:
+            products = self._setup_products(options['products'])
+            clients = self._setup_clients(options['clients'])
+            self.stdout.write(
+                f"🛒 {options['clients']} clientes x {options['checkouts']} checkouts, "
+                f"{options['items']} itens de {options['products']} produtos ({connection.vendor})"
+            )
+            self.stdout.write(
+                f"{'checkout':<12} {'queries':>8} {'checkouts/s':>12} {'p50':>9} {'p99':>9} {'erros de lock':>14}"
+            )
+            for label, checkout in (('item a item', legacy_checkout), ('em lote', create_order_from_cart)):
+                queries = self._count_queries(checkout, clients[0], products, options['items'])
+                self._run(label, checkout, queries, clients, products, options)
+        finally:
+            self._cleanup()
+
+    def _run(self, label, checkout, queries, clients, products, options):
+        timings, errors = [], [0]
+        lock = threading.Lock()
+
+        def worker(client):
+            rng = random.Random(client.pk)
+            cart = Cart.objects.get(user=client)
+            try:
+                for _ in range(options['checkouts']):
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            # Só reenche depois de um checkout que deu certo (o que falhou mantém os itens)
+                            if not cart.items.exists():
+                                self._fill_cart(cart, products, options['items'], rng)
+                                start = time.perf_counter()
+                            checkout(cart, client)
+                        except OperationalError:
+                            # Deadlock (PostgreSQL) ou "database is locked" (SQLite): tenta de novo
+                            with lock:
+                                errors[0] += 1
+                            time.sleep(rng.random() / 100)
+                            continue
+                        with lock:
+                            timings.append((time.perf_counter() - start) * 1000)
+                        break
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+            list(pool.map(worker, clients))
+        elapsed = time.perf_counter() - start
+
+        stats = summarize(timings)
+        self.stdout.write(
+            f"{label:<12} {queries:>8} {len(timings) / elapsed:>12.1f} "
+            f"{stats['p50']:>7.1f}ms {stats['p99']:>7.1f}ms {errors[0]:>14}"
+        )
+
+    def _count_queries(self, checkout, client, products, items):
+        cart = Cart.objects.get(user=client)
+        self._fill_cart(cart, products, items, random.Random(0))
+        cart = Cart.objects.get(pk=cart.pk)
+        with CaptureQueriesContext(connection) as captured:
+            checkout(cart, client)
+        return len(captured)
+
+    def _fill_cart(self, cart, products, items, rng):
+        # Ordem aleatória: é a ordem em que o checkout antigo travava os produtos
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, product=product, quantity=rng.randint(1, 3))
+            for product in rng.sample(products, min(items, len(products)))
+        ])
+
+    def _setup_products(self, total):
+        return Product.objects.bulk_create([
+            Product(
+                name=f'{PREFIX} {i}', slug=f'{PREFIX.lower()}-{i}', sku=f'{PREFIX}-{i}',
+                product_type='COMPONENT', selling_price=random.randint(50, 500), stock_quantity=10 ** 9,
+            )
+            for i in range(total)
+        ])
+
+    def _setup_clients(self, total):
+        User = get_user_model()
+        clients = []
+        for i in range(total):
+            user = User.objects.create(email=f'{PREFIX.lower()}{i}@bench.local')
+            client = Client.objects.create(user=user)
+            Cart.objects.create(user=client)
+            clients.append(client)
+        return clients
+
+    def _cleanup(self):
+        clients = Client.objects.filter(user__email__endswith='@bench.local')
+        Order.objects.filter(client__in=clients).delete()
+        get_user_model().objects.filter(email__endswith='@bench.local').delete()
+        Product.objects.filter(sku__startswith=f'{PREFIX}-').delete()
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Orders.cleanup import purge_stale
+
+
+class Command(BaseCommand):
+    help = 'Apaga carrinhos abandonados e sessões vencidas em lotes pequenos (cron, ou --loop para rodar como worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Linhas por lote (uma transação cada)')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Segundos de folga entre os lotes (deixa os outros escreverem)')
+        parser.add_argument('--loop', type=int, metavar='SEGUNDOS',
+                            help='Repete a cada N segundos em vez de sair')
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.perf_counter()
+            removed = purge_stale(batch_size=options['batch_size'], pause=options['pause'])
+            if removed or not options['loop']:
+                summary = ', '.join(f'{count} {label}' for label, count in sorted(removed.items())) or 'nada'
+                self.stdout.write(f'🧹 Removido: {summary} ({time.perf_counter() - start:.1f}s).')
+            if not options['loop']:
+                return
+            time.sleep(options['loop'])
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Orders.models import Order
+from Orders.totals import TOTAL_FIELDS, recompute_totals
+
+
+class Command(BaseCommand):
+    help = 'Recalcula subtotal/total de todos os pedidos a partir dos itens, em lotes, e corrige divergências'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Só conta as divergências (desfaz cada lote)')
+
+    def handle(self, *args, **options):
+        checked = drifted = 0
+        last_pk = 0
+        while True:
+            ids = list(
+                Order.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:options['chunk_size']]
+            )
+            if not ids:
+                break
+            last_pk = ids[-1]
+            chunk = Order.objects.filter(pk__in=ids)
+            # Um lote por transação: não segura o lock da tabela inteira
+            with transaction.atomic():
+                before = set(chunk.values_list('pk', *TOTAL_FIELDS))
+                recompute_totals(chunk)
+                after = set(chunk.values_list('pk', *TOTAL_FIELDS))
+                if options['dry_run']:
+                    transaction.set_rollback(True)
+            checked += len(ids)
+            drifted += len(after - before)
+
+        verb = 'divergente(s)' if options['dry_run'] else 'corrigido(s)'
+        self.stdout.write(self.style.SUCCESS(f'✅ {checked} pedido(s) conferido(s), {drifted} {verb}.'))
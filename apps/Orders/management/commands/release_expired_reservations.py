@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Orders.reservations import release_expired
+
+
+class Command(BaseCommand):
+    help = 'Solta as reservas de estoque vencidas (cron, ou --loop para rodar como worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', type=int, metavar='SEGUNDOS',
+                            help='Repete a cada N segundos em vez de sair')
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired(batch_size=options['batch_size'])
+            if released or not options['loop']:
+                self.stdout.write(f'🔓 {released} unidade(s) reservada(s) devolvida(s) ao estoque.')
+            if not options['loop']:
+                return
+            time.sleep(options['loop'])
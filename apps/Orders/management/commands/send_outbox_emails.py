@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Orders.outbox import send_pending
+
+
+class Command(BaseCommand):
+    help = 'Envia os e-mails pendentes da outbox em lotes (cron, ou --loop para rodar como worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', type=int, metavar='SEGUNDOS',
+                            help='Quando a fila esvaziar, espera N segundos e continua em vez de sair')
+
+    def handle(self, *args, **options):
+        while True:
+            # Lote cheio: provavelmente tem mais na fila, segue sem esperar
+            sent, failed = send_pending(batch_size=options['batch_size'])
+            if sent or failed:
+                self.stdout.write(f'📧 {sent} enviado(s), {failed} falha(s).')
+            if sent + failed >= options['batch_size']:
+                continue
+            if not options['loop']:
+                return
+            time.sleep(options['loop'])
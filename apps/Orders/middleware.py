@@ -0,0 +1,19 @@
+from .cart import write_cookie
+
+
+class CartCookieMiddleware:
+    """Grava (ou apaga) o cookie do carrinho do visitante quando ele mudou no request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        store = getattr(request, '_cart_store', None)
+        if getattr(request, '_cart_cookie_promoted', False):
+            # Já foi somado ao carrinho do cliente no banco
+            write_cookie(response)
+        elif store is not None and store.cookie_dirty:
+            write_cookie(response, store.state)
+        return response
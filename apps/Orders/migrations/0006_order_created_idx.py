@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Clients', '0002_remove_client_created_at_and_more'),
+        ('Orders', '0005_cart_cartitem'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:15
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_subtotals(apps, schema_editor):
+    # Só o subtotal: o total gravado fica como está (recompute_order_totals confere)
+    Order = apps.get_model('Orders', 'Order')
+    OrderItem = apps.get_model('Orders', 'OrderItem')
+    total = (
+        OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+        .annotate(total=Sum(F('quantity') * F('unit_price'))).values('total')
+    )
+    Order.objects.update(subtotal_amount=Coalesce(
+        Subquery(total, output_field=models.DecimalField()), Value(0), output_field=models.DecimalField()
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Orders', '0008_outbox_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='subtotal_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10, verbose_name='Subtotal'),
+        ),
+        migrations.RunPython(fill_subtotals, migrations.RunPython.noop),
+    ]
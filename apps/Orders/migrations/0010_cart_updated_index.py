@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Clients', '0002_remove_client_created_at_and_more'),
+        ('Orders', '0009_order_subtotal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['updated_at', 'user'], name='cart_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Orders', '0010_cart_updated_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Orders', '0011_cart_revision'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('QUOTE', 'Orçamento'), ('PAYMENT_REVIEW', 'Pago - em revisão'), ('APPROVED', 'Aprovado'), ('IN_PROGRESS', 'Em Andamento'), ('READY', 'Pronto'), ('FINISHED', 'Finalizado'), ('CANCELED', 'Cancelado')], default='QUOTE', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='ordertimeline',
+            name='status',
+            field=models.CharField(choices=[('QUOTE', 'Orçamento'), ('PAYMENT_REVIEW', 'Pago - em revisão'), ('APPROVED', 'Aprovado'), ('IN_PROGRESS', 'Em Andamento'), ('READY', 'Pronto'), ('FINISHED', 'Finalizado'), ('CANCELED', 'Cancelado')], max_length=20),
+        ),
+    ]
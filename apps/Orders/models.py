@@ -1,9 +1,16 @@
 from django.db import models
 from django.db import transaction # Importe aqui em cima para ficar limpo
+from django.db.models import Sum
 from Common.models import TimeStampedModel
 from Clients.models import Client
 from Assets.models import Product 
+from Assets.cache import invalidate_catalog
+from Assets.stock import put_back, release_stock, take_stock
+from Assets.related import PAID_STATUSES, record_co_purchases
+from .totals import TOTAL_FIELDS, recompute_totals
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+from django.utils.functional import cached_property
 from decimal import Decimal
 
 class Coupon(models.Model):
@@ -20,6 +27,8 @@ class Coupon(models.Model):
 class Order(TimeStampedModel):
     STATUS_CHOICES = [
         ('QUOTE', 'Orçamento'),
+        # Pagamento confirmado, mas o estoque acabou antes da aprovação: a equipe repõe ou reembolsa
+        ('PAYMENT_REVIEW', 'Pago - em revisão'),
         ('APPROVED', 'Aprovado'),
         ('IN_PROGRESS', 'Em Andamento'),
         ('READY', 'Pronto'),
@@ -35,30 +44,64 @@ class Order(TimeStampedModel):
     
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='QUOTE')
     total_amount = models.DecimalField("Valor Total", max_digits=10, decimal_places=2, default=0.00)
+    # Soma dos itens sem desconto; os dois totais são mantidos por UPDATE (ver Orders/totals.py)
+    subtotal_amount = models.DecimalField("Subtotal", max_digits=10, decimal_places=2, default=0, editable=False)
     
     class Meta:
         verbose_name = "Pedido"
         verbose_name_plural = "Pedidos"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+        ]
 
     def __str__(self):
         return f"Pedido #{self.id} - {self.client}" # Ajustei pois client.user pode falhar se não tiver select_related
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Status como veio do banco: o signal de e-mail compara com ele em vez de reler o pedido
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_coupon_id = instance.__dict__.get('coupon_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Os totais são do banco (UPDATE incremental dos itens): um save() com a
+        # cópia em memória desatualizada não pode sobrescrevê-los
+        coupon_changed = False
+        if not self._state.adding:
+            coupon_changed = getattr(self, '_loaded_coupon_id', self.coupon_id) != self.coupon_id
+            if kwargs.get('update_fields') is None:
+                kwargs['update_fields'] = [
+                    f.name for f in self._meta.concrete_fields if not f.primary_key and f.name not in TOTAL_FIELDS
+                ]
+        super().save(*args, **kwargs)
+        self._loaded_coupon_id = self.coupon_id
+        if coupon_changed:
+            self.update_total()
+
     def update_total(self):
         """
-        Recalcula total somando itens e aplicando desconto se houver.
+        Recalcula subtotal e total a partir dos itens (uma soma + UPDATE direcionado, sem save()).
         """
-        # Soma bruta
-        subtotal = sum(item.subtotal for item in self.items.all())
-        
-        # Aplica desconto do cupom
+        recompute_totals(Order.objects.filter(pk=self.pk))
+        self.refresh_from_db(fields=TOTAL_FIELDS)
+
+    def stock_quantities(self):
+        """{product_id: quantidade} dos itens que movimentam estoque (serviço não tem estoque)."""
+        rows = (
+            self.items.filter(product__isnull=False).exclude(product__product_type='SERVICE')
+            .values('product_id').annotate(total=Sum('quantity')).order_by()
+        )
+        return {row['product_id']: row['total'] for row in rows}
+
+    def apply_discount(self, subtotal):
+        """Subtotal dos itens -> total com o desconto do cupom (se houver)."""
         if self.coupon and self.coupon.active:
             discount_amount = (subtotal * Decimal(self.coupon.discount_percent)) / 100
-            self.total_amount = subtotal - discount_amount
-        else:
-            self.total_amount = subtotal
-            
-        self.save()
+            return subtotal - discount_amount
+        return subtotal
 
     def approve_payment(self):
         """
@@ -68,21 +111,15 @@ class Order(TimeStampedModel):
             return 
 
         with transaction.atomic():
-            # Itera sobre os itens para baixar estoque
-            for item in self.items.all():
-                # Verifica se o produto ainda existe (caso seja nulo)
-                if item.product and item.product.product_type != 'SERVICE':
-                    # Trava o produto no banco (Lock)
-                    product = Product.objects.select_for_update().get(id=item.product.id)
-                    
-                    if product.stock_quantity >= item.quantity:
-                        product.stock_quantity -= item.quantity
-                        product.save()
-                    else:
-                        raise ValueError(f"Estoque insuficiente para: {product.name}")
+            # A reserva do checkout vira baixa de verdade: solta a reserva e baixa o
+            # pedido inteiro num UPDATE condicional (falta -> InsufficientStock, nada muda)
+            self.reservations.all().release()
+            take_stock(self.stock_quantities(), reference=f"Pedido #{self.pk}")
             
             self.status = 'APPROVED'
             self.save()
+            invalidate_catalog()  # estoque mudou
+            record_co_purchases(self)  # alimenta os "relacionados"
             
             # Opcional: Criar registro na timeline aqui automaticamente
             OrderTimeline.objects.create(order=self, status='APPROVED', note="Pagamento aprovado e estoque baixado.")
@@ -92,12 +129,12 @@ class Order(TimeStampedModel):
             return
 
         with transaction.atomic():
+            self.reservations.all().release()
+            if self.status in PAID_STATUSES:
+                record_co_purchases(self, delta=-1)
             if self.status in ['APPROVED', 'READY', 'IN_PROGRESS']:
-                for item in self.items.all():
-                    if item.product and item.product.product_type != 'SERVICE':
-                        product = Product.objects.select_for_update().get(id=item.product.id)
-                        product.stock_quantity += item.quantity
-                        product.save()
+                put_back(self.stock_quantities(), reference=f"Pedido #{self.pk}")
+                invalidate_catalog()  # estoque mudou
             
             self.status = 'CANCELED'
             self.save()
@@ -113,8 +150,21 @@ class OrderItem(models.Model):
     quantity = models.PositiveIntegerField("Quantidade", default=1)
     unit_price = models.DecimalField("Preço Unitário", max_digits=10, decimal_places=2, blank=True, null=True)
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Pedido e subtotal como vieram do banco: base da diferença no total (Orders/totals.py)
+        if all(name in instance.__dict__ for name in ('order_id', 'quantity', 'unit_price')):
+            instance._loaded_line = (instance.order_id, instance.subtotal)
+        return instance
+
     def save(self, *args, **kwargs):
-        # Snapshot dos dados do produto
+        self.fill_snapshot()
+        super().save(*args, **kwargs)
+        # O total do pedido é ajustado pelo signal (post_save), na mesma transação
+
+    def fill_snapshot(self):
+        """Snapshot dos dados do produto (também usado no bulk_create do checkout)."""
         if self.product:
             if self.unit_price is None:
                 self.unit_price = self.product.selling_price or 0
@@ -122,10 +172,6 @@ class OrderItem(models.Model):
             if not self.description:
                 prefix = f"[{self.product.sku}] " if hasattr(self.product, 'sku') and self.product.sku else ""
                 self.description = f"{prefix}{self.product.name}"
-            
-        super().save(*args, **kwargs)
-        # Opcional: Chamar update_total do pedido pai
-        # self.order.update_total() 
 
     @property
     def subtotal(self):
@@ -155,24 +201,33 @@ class Cart(models.Model):
     coupon = models.ForeignKey(Coupon, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Sobe a cada gravação: a cópia do carrinho em cache (cart.py) só vale se saiu desta revisão
+    revision = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        # Limpeza dos abandonados (cleanup.py) pega os mais antigos pelo índice
+        indexes = [models.Index(fields=['updated_at', 'user'], name='cart_updated_idx')]
 
     def __str__(self):
         return f"Carrinho {self.id}"
 
+    @cached_property
+    def pricing(self):
+        """Linhas, subtotal, desconto e total numa query só (Orders/pricing.py)."""
+        from .pricing import price_cart
+        return price_cart(self)
+
     @property
     def total_amount(self):
-        return sum(item.subtotal for item in self.items.all())
+        return self.pricing.subtotal
 
     @property
     def discount_amount(self):
-        if self.coupon and self.coupon.active:
-            # Assumindo que seu Coupon usa discount_percent (inteiro)
-            return (self.total_amount * Decimal(self.coupon.discount_percent)) / 100
-        return Decimal(0)
+        return self.pricing.discount
 
     @property
     def total_with_discount(self):
-        return self.total_amount - self.discount_amount
+        return self.pricing.total
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
@@ -186,4 +241,75 @@ class CartItem(models.Model):
 
     @property
     def subtotal(self):
-        return self.unit_price * self.quantity
\ No newline at end of file
+        return self.unit_price * self.quantity
+
+class StockReservationQuerySet(models.QuerySet):
+    def release(self):
+        """
+        Apaga as reservas e devolve as quantidades ao disponível.
+        Só quem conseguiu travar/apagar a linha devolve (aprovação, cancelamento
+        e a limpeza de vencidas podem disputar a mesma reserva).
+        Retorna {product_id: quantidade devolvida}.
+        """
+        with transaction.atomic():
+            holds = list(self.select_for_update().values_list('pk', 'product_id', 'quantity'))
+            if not holds:
+                return {}
+            StockReservation.objects.filter(pk__in=[pk for pk, _, _ in holds]).delete()
+            quantities = {}
+            for _, product_id, quantity in holds:
+                quantities[product_id] = quantities.get(product_id, 0) + quantity
+            release_stock(quantities)
+        return quantities
+
+
+class StockReservation(models.Model):
+    """Unidades seguradas entre o checkout e o pagamento (ver Orders/reservations.py)."""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = StockReservationQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Reserva de Estoque"
+        verbose_name_plural = "Reservas de Estoque"
+        indexes = [
+            # Varredura das vencidas (release_expired_reservations)
+            models.Index(fields=['expires_at'], name='reservation_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity}x produto {self.product_id} (pedido {self.order_id})"
+
+
+class OutboxEmail(models.Model):
+    """E-mail gravado na mesma transação da mudança que o gerou; enviado pelo worker (ver Orders/outbox.py)."""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pendente'),
+        ('SENT', 'Enviado'),
+        ('FAILED', 'Falhou'),
+    ]
+
+    to = models.EmailField("Para")
+    subject = models.CharField("Assunto", max_length=255)
+    body = models.TextField("Mensagem")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField("Tentativas", default=0)
+    next_attempt_at = models.DateTimeField("Próxima tentativa", default=timezone.now)
+    last_error = models.TextField("Último erro", blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "E-mail (Outbox)"
+        verbose_name_plural = "E-mails (Outbox)"
+        indexes = [
+            # Fila do worker: só as pendentes, na ordem de tentativa
+            models.Index(fields=['next_attempt_at'], name='outbox_pending_idx', condition=models.Q(status='PENDING')),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to} ({self.get_status_display()})"
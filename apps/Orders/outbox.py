@@ -0,0 +1,97 @@
+"""
+Outbox de e-mails transacionais.
+
+Quem muda o pedido não fala com o SMTP: grava um OutboxEmail na mesma
+transação (commit junto com a mudança, rollback some com ela) e o comando
+send_outbox_emails envia depois, fora do request:
+
+    1. pega um lote de pendentes vencidas e "reivindica" com um UPDATE
+       condicional (next_attempt_at vira o prazo de posse): dois workers
+       não pegam a mesma mensagem, e se o worker morrer ela volta sozinha
+    2. envia o lote por UMA conexão SMTP
+    3. marca as enviadas num UPDATE; as que falharam (SMTP ou qualquer outro
+       erro da mensagem) voltam para a fila com espera crescente, até
+       OUTBOX_MAX_ATTEMPTS (aí ficam FAILED)
+
+Um SMTP lento ou fora do ar atrasa o e-mail, não o pedido.
+"""
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+LEASE = timedelta(minutes=5)
+
+
+def enqueue_email(to, subject, body):
+    return OutboxEmail.objects.create(to=to, subject=subject, body=body)
+
+
+def retry_delay(attempts):
+    """1, 2, 4, 8... minutos, no máximo uma hora."""
+    return timedelta(minutes=min(2 ** (attempts - 1), 60))
+
+
+def claim_batch(batch_size, now=None):
+    now = now or timezone.now()
+    ids = list(
+        OutboxEmail.objects.filter(status='PENDING', next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'pk').values_list('pk', flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    lease_until = now + LEASE
+    OutboxEmail.objects.filter(pk__in=ids, status='PENDING', next_attempt_at__lte=now).update(
+        next_attempt_at=lease_until
+    )
+    return list(OutboxEmail.objects.filter(pk__in=ids, status='PENDING', next_attempt_at=lease_until).order_by('pk'))
+
+
+def send_pending(batch_size=100, max_attempts=None):
+    """Envia um lote. Retorna (enviados, falhas)."""
+    max_attempts = max_attempts or getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0, 0
+
+    sent, failed = [], []
+    connection = get_connection(fail_silently=False)
+    try:
+        for email in emails:
+            message = EmailMessage(
+                email.subject, email.body, settings.DEFAULT_FROM_EMAIL, [email.to], connection=connection
+            )
+            try:
+                # Abre só na primeira (ou depois de uma queda); aberta por fora, o send não fecha
+                connection.open()
+                message.send()
+            except Exception as exc:
+                # Qualquer erro fica na mensagem (com backoff, até FAILED): uma mensagem
+                # que nunca vai sair (cabeçalho inválido, por exemplo) não trava a fila
+                failed.append((email, exc))
+                if isinstance(exc, OSError) and (  # smtplib.SMTPException também é OSError
+                    not isinstance(exc, smtplib.SMTPException) or isinstance(exc, smtplib.SMTPServerDisconnected)
+                ):
+                    # Conexão caiu: a próxima mensagem reabre
+                    connection.close()
+            else:
+                sent.append(email.pk)
+    finally:
+        connection.close()
+
+    now = timezone.now()
+    OutboxEmail.objects.filter(pk__in=sent).update(status='SENT', sent_at=now, attempts=F('attempts') + 1)
+    for email, exc in failed:
+        attempts = email.attempts + 1
+        OutboxEmail.objects.filter(pk=email.pk).update(
+            attempts=attempts,
+            last_error=f"{type(exc).__name__}: {exc}"[:1000],
+            status='FAILED' if attempts >= max_attempts else 'PENDING',
+            next_attempt_at=now + retry_delay(attempts),
+        )
+    return len(sent), len(failed)
@@ -0,0 +1,105 @@
+"""
+Preço do carrinho numa query só.
+
+Linhas (produto, quantidade, total da linha), subtotal, desconto do cupom e
+total saem de UMA consulta anotada — o total de cada linha é calculado no
+banco e o cupom (ativo) vem numa subquery na mesma consulta — em vez de
+reler os itens e buscar produto por produto a cada propriedade:
+
+    price_lines   quantidades que estão fora do banco (CartStore: cache ou
+                  cookie): consulta nos produtos, quantidade num CASE
+    price_cart    Cart do banco: consulta nos itens com o produto junto
+
+O número de queries não depende do tamanho do carrinho. Quem precisa do
+preço mais de uma vez no mesmo request usa CartStore.pricing() (memoizado
+no carrinho do request) ou Cart.pricing (cached_property).
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from Assets.models import Product
+from .models import CartItem, Coupon
+
+ZERO = Decimal(0)
+
+
+@dataclass
+class PricedLine:
+    product: Product
+    quantity: int
+    subtotal: Decimal
+
+
+@dataclass
+class CartPricing:
+    lines: list = field(default_factory=list)
+    subtotal: Decimal = ZERO
+    discount: Decimal = ZERO
+    total: Decimal = ZERO
+    coupon_code: str = None
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    def quantities(self):
+        """{product_id: quantidade} (somando linhas repetidas do mesmo produto)."""
+        quantities = {}
+        for line in self.lines:
+            quantities[line.product.pk] = quantities.get(line.product.pk, 0) + line.quantity
+        return quantities
+
+
+def _line_total(quantity, price):
+    return ExpressionWrapper(
+        quantity * Coalesce(price, Value(ZERO)), output_field=DecimalField(max_digits=12, decimal_places=2)
+    )
+
+
+def _coupon(coupon_ref):
+    """Código e desconto do cupom, só se estiver ativo (regra de Order.apply_discount)."""
+    coupons = Coupon.objects.filter(pk=coupon_ref, active=True)
+    return {
+        'coupon_code': Subquery(coupons.values('code')[:1]),
+        'discount_percent': Subquery(coupons.values('discount_percent')[:1]),
+    }
+
+
+def _finish(lines, row):
+    coupon_code = getattr(row, 'coupon_code', None)
+    subtotal = sum((line.subtotal for line in lines), ZERO)
+    discount = subtotal * Decimal(row.discount_percent) / 100 if coupon_code else ZERO
+    return CartPricing(lines, subtotal, discount, subtotal - discount, coupon_code)
+
+
+def price_lines(quantities, coupon_id=None):
+    """Preço de {product_id: quantidade} com o cupom `coupon_id`; produto apagado fica de fora."""
+    if not quantities:
+        return CartPricing()
+    quantity = Case(
+        *[When(pk=pk, then=Value(amount)) for pk, amount in quantities.items()], output_field=IntegerField()
+    )
+    products = Product.objects.filter(pk__in=list(quantities)).annotate(
+        line_total=_line_total(quantity, F('selling_price')),
+        **(_coupon(coupon_id) if coupon_id else {}),
+    )
+    products = {product.pk: product for product in products}
+    # Ordem do carrinho (a do dicionário), não a do banco
+    lines = [
+        PricedLine(products[pk], amount, products[pk].line_total) for pk, amount in quantities.items() if pk in products
+    ]
+    return _finish(lines, next(iter(products.values()), None))
+
+
+def price_cart(cart):
+    """Preço de um Cart do banco (itens + produtos + cupom numa query)."""
+    items = list(
+        CartItem.objects.filter(cart=cart).select_related('product').order_by('pk').annotate(
+            line_total=_line_total(F('quantity'), F('product__selling_price')),
+            **_coupon(OuterRef('cart__coupon_id')),
+        )
+    )
+    lines = [PricedLine(item.product, item.quantity, item.line_total) for item in items]
+    return _finish(lines, items[0] if items else None)
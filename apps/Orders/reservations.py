@@ -0,0 +1,77 @@
+"""
+Reservas de estoque com prazo entre o checkout e o pagamento.
+
+O checkout segura as unidades (StockReservation + contador
+Product.reserved_quantity, num UPDATE condicional): num lançamento, só
+quem conseguiu reservar chega ao Stripe/Pix, em vez de todos pagarem e a
+disputa acontecer no lock da aprovação.
+
+    checkout   -> reserve_order: reserved += n onde estoque - reservado >= n
+    aprovação  -> a reserva é solta e o estoque baixado (Order.approve_payment)
+    cancelamento / prazo vencido -> reserved -= n
+
+As vencidas são soltas em lote pelo comando release_expired_reservations
+(cron ou --loop); uma reserva vencida que ainda não foi varrida continua
+valendo para o próprio pedido. Pagamento que chega depois da varredura é
+aprovado se ainda houver disponível.
+
+Antes de abrir a sessão do cartão, hold_for_payment renova o prazo (ou
+reserva de novo, se a varredura já soltou) e a sessão do Stripe vence junto
+com a reserva: ninguém paga por unidade que já foi para outro pedido.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from Assets.stock import reserve_stock
+from .models import StockReservation
+
+
+def reservation_ttl():
+    return timedelta(minutes=getattr(settings, 'STOCK_RESERVATION_MINUTES', 30))
+
+
+def reserve_order(order, quantities):
+    """quantities: {product_id: quantidade}. InsufficientStock se faltar (nada fica reservado)."""
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity}
+    reserve_stock(quantities)
+    expires_at = timezone.now() + reservation_ttl()
+    StockReservation.objects.bulk_create([
+        StockReservation(order=order, product_id=pk, quantity=quantity, expires_at=expires_at)
+        for pk, quantity in quantities.items()
+    ])
+
+
+def hold_for_payment(order, now=None):
+    """
+    Segura as unidades do pedido por mais um prazo inteiro (a sessão de
+    pagamento vence junto). Retorna o novo expires_at, arredondado para o
+    minuto de cima (dois cliques no mesmo minuto dão o mesmo prazo).
+    InsufficientStock se a reserva já foi solta e não há mais disponível.
+    """
+    now = now or timezone.now()
+    expires_at = (now + reservation_ttl()).replace(second=0, microsecond=0) + timedelta(minutes=1)
+    with transaction.atomic():
+        if not order.reservations.filter(expires_at__gt=now).update(expires_at=expires_at):
+            # Vencida (varrida ou não): devolve o que sobrou e reserva de novo
+            order.reservations.all().release()
+            reserve_order(order, order.stock_quantities())
+            order.reservations.update(expires_at=expires_at)
+    return expires_at
+
+
+def release_expired(batch_size=1000, now=None):
+    """Solta as reservas vencidas em lotes (um UPDATE de contador por lote). Retorna as unidades devolvidas."""
+    now = now or timezone.now()
+    released = 0
+    while True:
+        ids = list(
+            StockReservation.objects.filter(expires_at__lte=now)
+            .order_by('expires_at').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return released
+        quantities = StockReservation.objects.filter(pk__in=ids, expires_at__lte=now).release()
+        released += sum(quantities.values())
@@ -1,55 +1,85 @@
-from django.db.models.signals import post_save, pre_save
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.conf import settings
-from .models import Order
-
-@receiver(pre_save, sender=Order)
-def order_status_change_notification(sender, instance, **kwargs):
-    # Se o pedido ainda não tem ID (está sendo criado agora), ignoramos aqui
-    if not instance.pk:
+from Clients.models import Client
+from .cart import promote_cookie_cart
+from .models import Order, OrderItem
+from .outbox import enqueue_email
+from .totals import adjust_totals, incremental_enabled, recompute_totals
+
+# Mensagem personalizada para cada status
+STATUS_MESSAGES = {
+    'PAYMENT_REVIEW': "Recebemos seu pagamento, mas um item esgotou. Nossa equipe vai falar com você (reposição ou reembolso).",
+    'APPROVED': "Seu pagamento foi aprovado! Estamos preparando seu envio.",
+    'SENT': "Sua bike saiu para entrega! Em breve chegará até você.",
+    'DELIVERED': "Pedido entregue. Obrigado por escolher a EletricBike!",
+    'CANCELED': "Seu pedido foi cancelado. Caso tenha dúvidas, entre em contato.",
+}
+
+
+@receiver(post_save, sender=Order)
+def order_status_change_notification(sender, instance, created, raw=False, **kwargs):
+    # Status de antes vem do próprio objeto (Order.from_db), sem reler o pedido
+    old_status = getattr(instance, '_loaded_status', None)
+    instance._loaded_status = instance.status
+
+    # Pedido novo (ou salvo sem ter sido lido do banco): nada a avisar
+    if created or raw or old_status is None or old_status == instance.status:
         return
-    
-    try:
-        # Buscamos como o pedido estava ANTES de ser salvo
-        old_order = Order.objects.get(pk=instance.pk)
-        
-        # Se o status mudou (ex: de PENDING para APPROVED)
-        if old_order.status != instance.status:
-            
-            subject = f"Atualização do Pedido #{instance.id} - EletricBike"
-            
-            # Mensagem personalizada para cada status
-            status_msg = ""
-            if instance.status == 'APPROVED':
-                status_msg = "Seu pagamento foi aprovado! Estamos preparando seu envio."
-            elif instance.status == 'SENT':
-                status_msg = "Sua bike saiu para entrega! Em breve chegará até você."
-            elif instance.status == 'DELIVERED':
-                status_msg = "Pedido entregue. Obrigado por escolher a EletricBike!"
-            elif instance.status == 'CANCELED':
-                status_msg = "Seu pedido foi cancelado. Caso tenha dúvidas, entre em contato."
-            else:
-                status_msg = f"Novo status: {instance.get_status_display()}"
-
-            message = f"""Olá, {instance.client.user.first_name}!
-            
+
+    email, first_name = (
+        Client.objects.filter(pk=instance.client_id).values_list('user__email', 'user__first_name').get()
+    )
+    status_msg = STATUS_MESSAGES.get(instance.status, f"Novo status: {instance.get_status_display()}")
+    message = f"""Olá, {first_name}!
+
 Temos novidades sobre sua compra.
 {status_msg}
 
 Acesse seu painel para ver mais detalhes:
 http://127.0.0.1:8000/clients/dashboard/
-            """
-            
-            # Envia o e-mail (em dev, vai aparecer no terminal)
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [instance.client.user.email],
-                fail_silently=False
-            )
-            print(f"📧 E-mail de status disparado para {instance.client.user.email}")
-
-    except Order.DoesNotExist:
-        pass
\ No newline at end of file
+"""
+
+    # Vai para a outbox na mesma transação; o worker (send_outbox_emails) envia depois do commit
+    enqueue_email(email, f"Atualização do Pedido #{instance.id} - EletricBike", message)
+
+
+@receiver(pre_delete, sender=Order)
+def release_order_reservations(sender, instance, **kwargs):
+    # O CASCADE apagaria as reservas sem devolver o contador reserved_quantity
+    instance.reservations.all().release()
+
+
+# --- TOTAIS INCREMENTAIS (ver Orders/totals.py) ---
+
+@receiver(post_save, sender=OrderItem)
+def adjust_order_total_on_item_save(sender, instance, created, raw=False, **kwargs):
+    loaded = getattr(instance, '_loaded_line', None)
+    instance._loaded_line = (instance.order_id, instance.subtotal)
+    if raw or not incremental_enabled():
+        return
+    if created:
+        adjust_totals(instance.order_id, instance.subtotal)
+    elif loaded is None:
+        # Item salvo sem ter sido lido do banco: não dá para saber a diferença
+        recompute_totals(Order.objects.filter(pk=instance.order_id))
+    elif loaded[0] != instance.order_id:
+        adjust_totals(loaded[0], -loaded[1])
+        adjust_totals(instance.order_id, instance.subtotal)
+    else:
+        adjust_totals(instance.order_id, instance.subtotal - loaded[1])
+
+
+@receiver(post_delete, sender=OrderItem)
+def adjust_order_total_on_item_delete(sender, instance, **kwargs):
+    if incremental_enabled():
+        order_id, subtotal = getattr(instance, '_loaded_line', (instance.order_id, instance.subtotal))
+        adjust_totals(order_id, -subtotal)
+
+
+# --- CARRINHO DO VISITANTE (ver Orders/cart.py) ---
+
+@receiver(user_logged_in)
+def promote_anonymous_cart(sender, request, user, **kwargs):
+    if request is not None:
+        promote_cookie_cart(request, user)
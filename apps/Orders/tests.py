@@ -1,3 +1,528 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from Assets.models import Product
+from Assets.stock import InsufficientStock
+from Clients.models import Client
+from Common.fake_smtp import FakeSMTPServer
+from .cart import CartStore, flush_pending_carts, persist_cart
+from .checkout import CheckoutError, create_order_from_cart
+from .cleanup import purge_stale
+from .models import Cart, CartItem, Coupon, Order, OrderItem, OutboxEmail, StockReservation
+from .outbox import enqueue_email, send_pending
+from .pricing import price_cart
+from .reservations import release_expired
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(email='cliente@teste.com', password='123')
+        self.client_obj = Client.objects.create(user=user)
+        self.cart = Cart.objects.create(user=self.client_obj)
+        self.products = [
+            Product.objects.create(name=f"Peça {i}", sku=f"PC-{i}", selling_price=100 + i, stock_quantity=5)
+            for i in range(10)
+        ]
+
+    def _fill(self, count):
+        for product in self.products[:count]:
+            CartItem.objects.create(cart=self.cart, product=product, quantity=2)
+        return Cart.objects.get(pk=self.cart.pk)
+
+    def test_query_count_does_not_grow_with_cart(self):
+        # savepoint, preço (itens + produtos + cupom), pedido, itens, reserva
+        # (savepoint + UPDATE + release), reservas, limpa carrinho + revisão, release
+        cart = self._fill(2)
+        with self.assertNumQueries(11):
+            create_order_from_cart(cart, self.client_obj)
+        cart = self._fill(10)
+        with self.assertNumQueries(11):
+            order = create_order_from_cart(cart, self.client_obj)
+
+        self.assertEqual(order.items.count(), 10)
+        self.assertEqual(order.total_amount, sum(2 * (100 + i) for i in range(10)))
+        self.assertEqual(order.items.get(product=self.products[3]).description, "[PC-3] Peça 3")
+        self.assertFalse(self.cart.items.exists())
+
+    def test_coupon_and_stock_validation(self):
+        self.cart.coupon = Coupon.objects.create(code='DEZ', discount_percent=10)
+        self.cart.save()
+        cart = self._fill(1)
+        order = create_order_from_cart(cart, self.client_obj)
+        self.assertEqual(order.total_amount, Decimal('180.00'))
+
+        CartItem.objects.create(cart=self.cart, product=self.products[0], quantity=6)
+        with self.assertRaisesMessage(CheckoutError, "Peça 0 acabou de esgotar"):
+            create_order_from_cart(Cart.objects.get(pk=self.cart.pk), self.client_obj)
+        self.assertEqual(self.client_obj.orders.count(), 1)
+        self.assertTrue(self.cart.items.exists())
+
+
+class StockMovementTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(email='estoque@teste.com', password='123')
+        self.client_obj = Client.objects.create(user=user)
+        self.motor = Product.objects.create(name="Motor", sku="MOT", selling_price=900, stock_quantity=3)
+        self.bateria = Product.objects.create(name="Bateria", sku="BAT", selling_price=1500, stock_quantity=1)
+        self.servico = Product.objects.create(name="Montagem", sku="SVC", product_type='SERVICE', selling_price=100)
+
+    def _order(self, *lines):
+        order = Order.objects.create(client=self.client_obj)
+        for product, quantity in lines:
+            OrderItem.objects.create(order=order, product=product, quantity=quantity)
+        return order
+
+    def _stock(self):
+        return list(Product.objects.order_by('pk').values_list('stock_quantity', flat=True))
+
+    def test_approve_and_cancel_move_whole_order(self):
+        order = self._order((self.motor, 2), (self.bateria, 1), (self.servico, 1), (self.motor, 1))
+        order.approve_payment()
+        self.assertEqual(self._stock(), [0, 0, 0])
+
+        order.cancel_order()
+        self.assertEqual(self._stock(), [3, 1, 0])
+
+    def test_oversell_changes_nothing(self):
+        order = self._order((self.motor, 2), (self.bateria, 2))
+        with self.assertRaisesMessage(InsufficientStock, "Estoque insuficiente para: Bateria"):
+            order.approve_payment()
+        self.assertEqual(self._stock(), [3, 1, 0])
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'QUOTE')
+
+        with self.assertRaises(IntegrityError):
+            Product.objects.filter(pk=self.bateria.pk).update(stock_quantity=F('stock_quantity') - 5)
+
+
+class ReservationTests(TestCase):
+    def setUp(self):
+        self.last_unit = Product.objects.create(name="Bateria", sku="BAT", selling_price=1500, stock_quantity=1)
+        self.clients = []
+        for i in range(2):
+            user = get_user_model().objects.create_user(email=f'reserva{i}@teste.com', password='123')
+            self.clients.append(Client.objects.create(user=user))
+
+    def _checkout(self, client):
+        cart = Cart.objects.create(user=client)
+        CartItem.objects.create(cart=cart, product=self.last_unit, quantity=1)
+        return create_order_from_cart(cart, client)
+
+    def _product(self):
+        return Product.objects.get(pk=self.last_unit.pk)
+
+    def test_checkout_holds_last_unit_until_expired(self):
+        order = self._checkout(self.clients[0])
+        self.assertEqual((self._product().stock_quantity, self._product().available_quantity), (1, 0))
+        with self.assertRaisesMessage(CheckoutError, "Bateria acabou de esgotar"):
+            self._checkout(self.clients[1])
+
+        self.assertEqual(release_expired(), 0)
+        self.assertEqual(release_expired(now=timezone.now() + timedelta(hours=1)), 1)
+        self.assertFalse(order.reservations.exists())
+        self.assertEqual(self._product().available_quantity, 1)
+        self._checkout(self.clients[1])
+
+    def test_approve_turns_hold_into_stock_movement(self):
+        order = self._checkout(self.clients[0])
+        order.approve_payment()
+        product = self._product()
+        self.assertEqual((product.stock_quantity, product.reserved_quantity), (0, 0))
+        self.assertFalse(StockReservation.objects.exists())
+
+        # Cancelar/apagar um pedido reservado devolve a reserva
+        product.stock_quantity = 1
+        product.save()
+        self._checkout(self.clients[1]).delete()
+        self.assertEqual(self._product().reserved_quantity, 0)
+
+    def test_full_save_keeps_reservations(self):
+        # O admin/Staff abre o produto, o checkout reserva, o admin salva a cópia antiga
+        stale = self._product()
+        order = self._checkout(self.clients[0])
+        stale.name = "Bateria 48V"
+        stale.save()
+        self.assertEqual((self._product().name, self._product().reserved_quantity), ("Bateria 48V", 1))
+
+        # ...e o contrário: a reserva sai depois que a cópia foi lida
+        stale = self._product()
+        order.delete()
+        stale.save()
+        self.assertEqual(self._product().reserved_quantity, 0)
+
+    def test_admin_delete_releases_hold(self):
+        admin_user = get_user_model().objects.create_superuser(email='admin@teste.com', password='123')
+        self.client.force_login(admin_user)
+        order = self._checkout(self.clients[0])
+        self.client.post(
+            reverse('admin:Orders_stockreservation_changelist'),
+            {'action': 'delete_selected', '_selected_action': list(order.reservations.values_list('pk', flat=True)),
+             'post': 'yes'},
+        )
+        self.assertFalse(order.reservations.exists())
+        self.assertEqual(self._product().reserved_quantity, 0)
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(email='outbox@teste.com', password='123', first_name="Ana")
+        self.order = Order.objects.create(client=Client.objects.create(user=user))
+
+    def test_status_change_is_queued_not_sent(self):
+        order = Order.objects.get(pk=self.order.pk)
+        order.status = 'READY'
+        # UPDATE do pedido, destinatário (e-mail + nome) e INSERT na outbox
+        with self.assertNumQueries(3):
+            order.save()
+        order.save()
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.to, email.status), ('outbox@teste.com', 'PENDING'))
+        self.assertIn("Olá, Ana!", email.body)
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            order.status = 'CANCELED'
+            order.save()
+            raise RuntimeError("rollback da mudança leva o e-mail junto")
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+
+    def test_worker_sends_batch_over_one_connection_and_retries(self):
+        for to in ('a@teste.com', 'recusar@teste.com', 'b@teste.com'):
+            enqueue_email(to, "Assunto", "Corpo")
+
+        with FakeSMTPServer() as smtp, override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=smtp.port, EMAIL_HOST_USER='', EMAIL_USE_TLS=False,
+        ):
+            self.assertEqual(send_pending(max_attempts=2), (2, 1))
+            self.assertEqual(send_pending(max_attempts=2), (0, 0))  # a recusada espera o backoff
+            OutboxEmail.objects.filter(status='PENDING').update(next_attempt_at=timezone.now())
+            self.assertEqual(send_pending(max_attempts=2), (0, 1))
+
+        self.assertEqual(smtp.connections, 2)
+        self.assertEqual(sorted(to for _, [to], _ in smtp.messages), ['a@teste.com', 'b@teste.com'])
+        failed = OutboxEmail.objects.get(status='FAILED')
+        self.assertEqual((failed.to, failed.attempts), ('recusar@teste.com', 2))
+        self.assertIn("SMTPRecipientsRefused", failed.last_error)
+
+    def test_malformed_message_does_not_block_the_queue(self):
+        enqueue_email('a@teste.com', "Assunto\nBcc: todos@teste.com", "Corpo")
+        enqueue_email('b@teste.com', "Assunto", "Corpo")
+
+        with FakeSMTPServer() as smtp, override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=smtp.port, EMAIL_HOST_USER='', EMAIL_USE_TLS=False,
+        ):
+            self.assertEqual(send_pending(batch_size=1, max_attempts=2), (0, 1))
+            self.assertEqual(send_pending(batch_size=1, max_attempts=2), (1, 0))
+            OutboxEmail.objects.filter(status='PENDING').update(next_attempt_at=timezone.now())
+            self.assertEqual(send_pending(max_attempts=2), (0, 1))
+
+        self.assertEqual([to for _, [to], _ in smtp.messages], ['b@teste.com'])
+        failed = OutboxEmail.objects.get(status='FAILED')
+        self.assertEqual((failed.to, failed.attempts), ('a@teste.com', 2))
+        self.assertIn("BadHeaderError", failed.last_error)
+
+
+class OrderTotalsTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(email='totais@teste.com', password='123')
+        coupon = Coupon.objects.create(code='DEZ', discount_percent=10)
+        self.order = Order.objects.create(client=Client.objects.create(user=user), coupon=coupon)
+        self.pneu = Product.objects.create(name="Pneu", sku="PNE", selling_price=100, stock_quantity=10)
+
+    def _totals(self):
+        return Order.objects.values_list('subtotal_amount', 'total_amount').get(pk=self.order.pk)
+
+    def test_item_changes_adjust_total_in_one_update(self):
+        with self.assertNumQueries(2):  # INSERT do item + UPDATE do pedido
+            OrderItem.objects.create(order=self.order, product=self.pneu, quantity=2)
+        OrderItem.objects.create(order=self.order, description="Montagem", quantity=1, unit_price=Decimal('35.50'))
+        self.assertEqual(self._totals(), (Decimal('235.50'), Decimal('211.95')))
+
+        item = OrderItem.objects.get(product=self.pneu)
+        item.quantity = 3
+        item.save()
+        self.assertEqual(self._totals(), (Decimal('335.50'), Decimal('301.95')))
+
+        # A cópia em memória (total 0) não sobrescreve o que o banco calculou
+        self.order.status = 'READY'
+        self.order.save()
+        item.delete()
+        self.assertEqual(self._totals(), (Decimal('35.50'), Decimal('31.95')))
+
+        self.order.coupon = None
+        self.order.save()
+        self.assertEqual(self.order.total_amount, Decimal('35.50'))
+
+    def test_recompute_command_repairs_drift(self):
+        OrderItem.objects.create(order=self.order, product=self.pneu, quantity=2)
+        Order.objects.filter(pk=self.order.pk).update(subtotal_amount=1, total_amount=1)
+
+        out = io.StringIO()
+        call_command('recompute_order_totals', dry_run=True, stdout=out)
+        self.assertIn("1 divergente(s)", out.getvalue())
+        self.assertEqual(self._totals(), (1, 1))
+
+        call_command('recompute_order_totals', chunk_size=1, stdout=out)
+        self.assertEqual(self._totals(), (Decimal('200.00'), Decimal('180.00')))
+
+
+@override_settings(CART_WRITE_BEHIND_SECONDS=60)
+class CartStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(flush_pending_carts)
+        self.user = get_user_model().objects.create_user(email='carrinho@teste.com', password='123')
+        self.client_obj = Client.objects.create(
+            user=self.user, cpf='123', phone='11', address='Rua A', city='SP', state='SP', zip_code='01000'
+        )
+        self.farol = Product.objects.create(name="Farol", sku="FAR", selling_price=50, stock_quantity=3)
+        self.client.force_login(self.user)
+
+    def _add(self, times=1):
+        for _ in range(times):
+            self.client.get(reverse('cart_add', args=[self.farol.pk]))
+
+    def test_cart_changes_are_written_behind_in_one_go(self):
+        with CaptureQueriesContext(connection) as captured:
+            self._add(times=4)
+        writes = [q['sql'] for q in captured if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        self.assertFalse([sql for sql in writes if 'Orders_cart' in sql])
+
+        response = self.client.get(reverse('cart_detail'))
+        self.assertEqual((response.context['pricing'].subtotal, len(response.context['cart'])), (150, 3))
+
+        flush_pending_carts()
+        self.assertEqual(list(CartItem.objects.values_list('product_id', 'quantity')), [(self.farol.pk, 3)])
+        # O banco é a fonte da verdade: sem o cache, o carrinho volta dele
+        cache.clear()
+        self.assertEqual(len(self.client.get(reverse('cart_detail')).context['cart']), 3)
+
+    def test_checkout_persists_pending_changes(self):
+        self._add(times=2)
+        self.assertFalse(CartItem.objects.exists())
+
+        self.client.get(reverse('checkout_create_order'))
+        order = Order.objects.get(client=self.client_obj)
+        self.assertEqual((order.items.get().quantity, order.total_amount), (2, 100))
+        self.assertEqual(len(self.client.get(reverse('cart_detail')).context['cart']), 0)
+
+    def test_stale_copy_from_another_worker_is_not_written_back(self):
+        self._add(times=2)
+        flush_pending_carts()
+        owner = f'user:{self.user.pk}'
+        key = f'cart:{owner}'
+        # Outro worker (outro cache locmem) ainda tem esta cópia, com uma mudança pendente
+        self._add()
+        other_worker = cache.get(key)
+
+        self.client.get(reverse('checkout_create_order'))
+        self.assertEqual(Order.objects.get(client=self.client_obj).items.get().quantity, 3)
+
+        cache.set(key, other_worker)
+        persist_cart(owner)
+        self.assertFalse(CartItem.objects.exists())
+        # Servir a cópia também não: a revisão do banco mudou no checkout
+        cache.set(key, other_worker)
+        self.assertEqual(len(self.client.get(reverse('cart_detail')).context['cart']), 0)
+
+    def test_pending_line_survives_write_from_another_worker(self):
+        owner = f'user:{self.user.pk}'
+        key = f'cart:{owner}'
+        pedal = Product.objects.create(name="Pedal", sku="PED", selling_price=30, stock_quantity=3)
+        # Worker A: o farol só no cache dele, gravação agendada
+        self._add()
+        worker_a = cache.get(key)
+        # Worker B (outro cache) carrega do banco, põe o pedal e grava primeiro
+        cache.delete(key)
+        self.client.get(reverse('cart_add', args=[pedal.pk]))
+        flush_pending_carts()
+
+        cache.set(key, worker_a)
+        persist_cart(owner)
+        self.assertEqual(
+            dict(CartItem.objects.values_list('product_id', 'quantity')), {self.farol.pk: 1, pedal.pk: 1},
+        )
+        self.assertEqual(len(self.client.get(reverse('cart_detail')).context['cart']), 2)
+
+    def test_checkout_reprices_when_another_worker_wrote_first(self):
+        pedal = Product.objects.create(name="Pedal", sku="PED", selling_price=30, stock_quantity=3)
+        self._add(times=2)
+        request = RequestFactory().get('/')
+        request.user = self.user
+        store = CartStore(request)
+        self.assertEqual(store.pricing().total, 100)
+        # Entre a leitura e o checkout, outro worker grava o pedal no banco
+        flush_pending_carts()
+        cart = Cart.objects.get(user=self.client_obj)
+        CartItem.objects.create(cart=cart, product=pedal, quantity=1)
+        Cart.objects.filter(pk=cart.pk).update(revision=F('revision') + 1)
+
+        db_cart = store.persist()
+        self.assertIsNone(store.priced())
+        order = create_order_from_cart(db_cart, self.client_obj, pricing=store.priced())
+        self.assertEqual((order.items.count(), order.total_amount), (2, 130))
+
+    def test_concurrent_requests_do_not_overwrite_each_other(self):
+        pedal = Product.objects.create(name="Pedal", sku="PED", selling_price=30, stock_quantity=3)
+        request = RequestFactory().get('/')
+        request.user = self.user
+        slow = CartStore(request)
+        self.assertEqual(len(slow), 0)
+        # Outro request do mesmo cliente muda o carrinho depois da leitura deste
+        self._add()
+
+        slow.add(pedal)
+        flush_pending_carts()
+        self.assertEqual(
+            dict(CartItem.objects.values_list('product_id', 'quantity')), {self.farol.pk: 1, pedal.pk: 1},
+        )
+
+
+class AnonymousCartTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='visitante@teste.com', password='123')
+        self.farol = Product.objects.create(name="Farol", sku="FAR", selling_price=50, stock_quantity=5)
+        self.pneu = Product.objects.create(name="Pneu", sku="PNE", selling_price=80, stock_quantity=5)
+
+    def _add(self, product, times=1):
+        for _ in range(times):
+            self.client.get(reverse('cart_add', args=[product.pk]))
+
+    def test_anonymous_cart_lives_in_a_signed_cookie(self):
+        # O primeiro request cria a SiteConfiguration (singleton); não é do carrinho
+        self.client.get(reverse('cart_detail'))
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(reverse('cart_detail'))
+            self._add(self.farol, times=2)
+        self.assertFalse([q['sql'] for q in captured if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))])
+        self.assertFalse(Session.objects.exists() or Cart.objects.exists())
+
+        response = self.client.get(reverse('cart_detail'))
+        self.assertEqual((len(response.context['cart']), response.context['pricing'].subtotal), (2, 100))
+
+        # Cookie mexido na mão não vale
+        self.client.cookies[settings.CART_COOKIE_NAME] = f"{self.farol.pk}.99"
+        self.assertEqual(len(self.client.get(reverse('cart_detail')).context['cart']), 0)
+
+    def test_login_merges_cookie_into_customer_cart(self):
+        client_obj = Client.objects.create(user=self.user)
+        cart = Cart.objects.create(user=client_obj)
+        CartItem.objects.create(cart=cart, product=self.farol, quantity=1)
+        self._add(self.farol, times=2)
+        self._add(self.pneu)
+
+        response = self.client.post(reverse('login'), {'username': 'visitante@teste.com', 'password': '123'})
+        self.assertEqual(response.cookies[settings.CART_COOKIE_NAME].value, '')
+        self.assertEqual(
+            dict(CartItem.objects.filter(cart=cart).values_list('product_id', 'quantity')),
+            {self.farol.pk: 3, self.pneu.pk: 1},
+        )
+        self.assertEqual(len(self.client.get(reverse('cart_detail')).context['cart']), 4)
+
+
+@override_settings(CART_WRITE_BEHIND_SECONDS=0)
+class CartPricingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = get_user_model().objects.create_user(email='preco@teste.com', password='123')
+        self.client_obj = Client.objects.create(
+            user=user, cpf='123', phone='11', address='Rua A', city='SP', state='SP', zip_code='01000'
+        )
+        self.coupon = Coupon.objects.create(code='DEZ', discount_percent=10)
+        self.cart = Cart.objects.create(user=self.client_obj)
+        self.products = [
+            Product.objects.create(name=f"Peça {i}", sku=f"PC-{i}", selling_price=Decimal('19.99'), stock_quantity=10)
+            for i in range(8)
+        ]
+        self.client.force_login(user)
+        # Primeiro request cria a SiteConfiguration (singleton)
+        self.client.get(reverse('cart_detail'))
+
+    def _fill(self, count):
+        cache.clear()
+        Cart.objects.filter(pk=self.cart.pk).update(coupon=self.coupon)
+        CartItem.objects.bulk_create([CartItem(cart=self.cart, product=p, quantity=3) for p in self.products[:count]])
+
+    def test_cart_page_prices_in_constant_queries(self):
+        counts = []
+        for count in (1, 8):
+            CartItem.objects.all().delete()
+            self._fill(count)
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(reverse('cart_detail'))
+            counts.append(len(captured))
+        self.assertEqual(counts[0], counts[1])
+
+        pricing = response.context['pricing']
+        self.assertEqual((pricing.subtotal, pricing.discount, pricing.total), (
+            Decimal('479.76'), Decimal('47.976'), Decimal('431.784'),
+        ))
+        self.assertEqual(pricing.coupon_code, 'DEZ')
+        self.assertEqual(price_cart(Cart.objects.get(pk=self.cart.pk)).total, pricing.total)
+
+    def test_checkout_uses_request_pricing(self):
+        counts = []
+        for count in (1, 8):
+            self._fill(count)
+            with CaptureQueriesContext(connection) as captured:
+                self.client.get(reverse('checkout_create_order'))
+            counts.append(len(captured))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(
+            list(Order.objects.order_by('pk').values_list('total_amount', flat=True)),
+            [Decimal('53.97'), Decimal('431.78')],
+        )
+
+
+class PurgeStaleTests(TestCase):
+    def test_purge_removes_only_stale_rows_in_batches(self):
+        old = timezone.now() - timedelta(days=60)
+        product = Product.objects.create(name="Farol", sku="FAR", selling_price=50, stock_quantity=5)
+        client_obj = Client.objects.create(user=get_user_model().objects.create_user(email='velho@teste.com'))
+        stale = [Cart.objects.create(session_key=f's{i}') for i in range(3)] + [Cart.objects.create(user=client_obj)]
+        fresh = Cart.objects.create(session_key='novo')
+        for cart in stale + [fresh]:
+            CartItem.objects.create(cart=cart, product=product)
+        Cart.objects.filter(pk__in=[cart.pk for cart in stale]).update(updated_at=old)
+        Session.objects.create(session_key='vencida', session_data='', expire_date=old)
+        Session.objects.create(session_key='valendo', session_data='', expire_date=timezone.now() + timedelta(days=1))
+
+        out = io.StringIO()
+        call_command('purge_stale_carts', batch_size=2, stdout=out)
+        self.assertIn("4 Orders.Cart, 4 Orders.CartItem, 1 sessions.Session", out.getvalue())
+        self.assertEqual(list(Cart.objects.values_list('pk', flat=True)), [fresh.pk])
+        self.assertEqual(list(Session.objects.values_list('pk', flat=True)), ['valendo'])
+
+    @override_settings(CART_WRITE_BEHIND_SECONDS=60)
+    def test_purged_cart_is_not_revived_by_a_worker_cache(self):
+        cache.clear()
+        user = get_user_model().objects.create_user(email='sumido@teste.com', password='123')
+        Client.objects.create(user=user)
+        product = Product.objects.create(name="Farol", sku="FAR", selling_price=50, stock_quantity=5)
+        self.client.force_login(user)
+        self.client.get(reverse('cart_add', args=[product.pk]))
+        flush_pending_carts()
+        Cart.objects.update(updated_at=timezone.now() - timedelta(days=60))
+
+        # A limpeza não limpa o cache do worker, que ainda tem uma mudança pendente
+        self.client.get(reverse('cart_add', args=[product.pk]))
+        purge_stale()
+        flush_pending_carts()
+        self.assertFalse(Cart.objects.exists())
+        self.assertEqual(len(self.client.get(reverse('cart_detail')).context['cart']), 0)
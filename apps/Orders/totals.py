@@ -0,0 +1,70 @@
+"""
+Totais do pedido mantidos pelo banco.
+
+Order guarda subtotal_amount (soma dos itens) e total_amount (com o
+desconto do cupom). Os dois só são escritos por UPDATE direcionado:
+
+    - incremental: inserir/alterar/apagar um OrderItem soma a diferença
+      no subtotal e recalcula o total no mesmo UPDATE (signals em
+      Orders/signals.py, na transação de quem mexeu no item). Vale para
+      admin, inlines, scripts — ninguém precisa lembrar de chamar nada.
+    - recompute_totals: um UPDATE com a soma dos itens numa subquery
+      (Order.update_total, comando recompute_order_totals).
+
+O desconto vem do cupom numa subquery no próprio UPDATE, com a mesma regra
+de Order.apply_discount (cupom inativo não desconta). bulk_create de itens
+não dispara signals: quem usa (checkout) grava os totais no INSERT do
+pedido. ORDER_TOTALS_INCREMENTAL=False desliga o modo incremental (ex.:
+carga em massa seguida de recompute_order_totals).
+"""
+from django.conf import settings
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+TOTAL_FIELDS = ('subtotal_amount', 'total_amount')
+
+
+def incremental_enabled():
+    return getattr(settings, 'ORDER_TOTALS_INCREMENTAL', True)
+
+
+def _money(expression):
+    return ExpressionWrapper(expression, output_field=DecimalField(max_digits=10, decimal_places=2))
+
+
+def discounted(subtotal):
+    """Expressão de apply_discount sobre `subtotal` (100.0: divisão real também no SQLite)."""
+    from .models import Coupon
+
+    percent = Coalesce(
+        Subquery(Coupon.objects.filter(pk=OuterRef('coupon_id'), active=True).values('discount_percent')[:1]),
+        Value(0),
+    )
+    return _money(subtotal * (Value(100) - percent) / Value(100.0))
+
+
+def items_subtotal():
+    """Soma quantidade x preço dos itens do pedido (OuterRef('pk')), 0 sem itens."""
+    from .models import OrderItem
+
+    total = (
+        OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+        .annotate(total=Sum(F('quantity') * F('unit_price'))).values('total')
+    )
+    return Coalesce(Subquery(total, output_field=DecimalField()), Value(0), output_field=DecimalField())
+
+
+def adjust_totals(order_id, delta):
+    """Soma `delta` ao subtotal e recalcula o total, num UPDATE."""
+    from .models import Order
+
+    if not delta:
+        return
+    subtotal = _money(F('subtotal_amount') + Value(delta, output_field=DecimalField()))
+    Order.objects.filter(pk=order_id).update(subtotal_amount=subtotal, total_amount=discounted(subtotal))
+
+
+def recompute_totals(orders):
+    """Recalcula subtotal e total de um queryset de pedidos a partir dos itens, num UPDATE."""
+    subtotal = items_subtotal()
+    return orders.update(subtotal_amount=subtotal, total_amount=discounted(subtotal))
@@ -1,93 +1,53 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.views.decorators.http import require_POST
-from django.db import transaction  
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 
 from Assets.models import Product
 from Clients.models import Client 
-# IMPORTANTE: Remova "from .cart import Cart" se ainda tiver
-from .models import Order, OrderItem, Coupon, Cart, CartItem
-
-def _get_cart(request):
-    """
-    Função auxiliar interna: Recupera o carrinho do BD (Usuário ou Sessão).
-    """
-    if not request.session.session_key:
-        request.session.create()
-    
-    session_key = request.session.session_key
-
-    if request.user.is_authenticated:
-        # Tenta pegar pelo cliente logado
-        try:
-            client, created = Client.objects.get_or_create(user=request.user)
-            cart, created = Cart.objects.get_or_create(user=client)
-        except Exception:
-            # Fallback se algo der errado com o Client
-            cart, created = Cart.objects.get_or_create(session_key=session_key)
-    else:
-        # Visitante anônimo
-        cart, created = Cart.objects.get_or_create(session_key=session_key, user=None)
-    
-    return cart
+from .models import Order, Coupon
+from .cart import get_cart
+from .checkout import create_order_from_cart
 
 def cart_detail(request):
-    cart = _get_cart(request)
-
-    items = cart.items.select_related('product').all()
-
-    return render(request, 'public/cart.html', {'cart': cart, 'items': items})
+    cart = get_cart(request)
+    # Linhas + totais + cupom numa query (ver pricing.py)
+    return render(request, 'public/cart.html', {'cart': cart, 'pricing': cart.pricing()})
 
 def cart_add(request, product_id): # Renomeei para cart_add para bater com seu padrão
-    """Adiciona item ao carrinho (Model)."""
-    cart = _get_cart(request)
+    """Adiciona item ao carrinho (cache, gravado no banco em seguida — ver cart.py)."""
+    cart = get_cart(request)
     product = get_object_or_404(Product, id=product_id)
     
-    # Busca ou cria o item
-    cart_item, created = CartItem.objects.get_or_create(cart=cart, product=product)
-    
-    # Validação de Estoque Simples
-    nova_quantidade = cart_item.quantity + 1 if not created else 1
-    
-    if nova_quantidade > product.stock_quantity:
+    ja_tinha = cart.quantity(product.id)
+    if cart.add(product):
          messages.warning(request, f"Estoque limite atingido para {product.name}!")
+    elif ja_tinha:
+        messages.success(request, f"Mais uma unidade de {product.name} adicionada.")
     else:
-        if not created:
-            cart_item.quantity += 1
-            cart_item.save()
-            messages.success(request, f"Mais uma unidade de {product.name} adicionada.")
-        else:
-            # Item novo já vem com qtd 1 por default no model
-            messages.success(request, f"{product.name} adicionado ao carrinho!")
+        messages.success(request, f"{product.name} adicionado ao carrinho!")
         
     return redirect('cart_detail')
 
 def cart_remove(request, product_id):
     """Remove item do carrinho."""
-    cart = _get_cart(request)
-    product = get_object_or_404(Product, id=product_id)
-    
-    CartItem.objects.filter(cart=cart, product=product).delete()
+    get_cart(request).remove(product_id)
     messages.info(request, "Item removido.")
     
     return redirect('cart_detail')
 
 @require_POST
 def coupon_apply(request):
-    """Aplica cupom ao carrinho (Salva no Model Cart)."""
+    """Aplica cupom ao carrinho."""
     code = request.POST.get('code')
-    cart = _get_cart(request)
+    cart = get_cart(request)
     
-    try:
-        coupon = Coupon.objects.get(code__iexact=code, active=True)
-        cart.coupon = coupon
-        cart.save()
+    coupon = Coupon.objects.filter(code__iexact=code, active=True).first()
+    cart.set_coupon(coupon)
+    if coupon:
         messages.success(request, f"Cupom {coupon.code} aplicado!")
-    except Coupon.DoesNotExist:
-        cart.coupon = None
-        cart.save()
+    else:
         messages.error(request, "Cupom inválido ou expirado.")
     
     return redirect('cart_detail')
@@ -95,10 +55,10 @@ def coupon_apply(request):
 @login_required
 def checkout_create_order(request):
     """Transforma o Carrinho (Model) em um Pedido (Order)."""
-    cart = _get_cart(request)
-    
-    # Verifica se tem itens usando .exists()
-    if not cart.items.exists():
+    cart = get_cart(request)
+    pricing = cart.pricing()
+
+    if not pricing:
         messages.warning(request, "Seu carrinho está vazio.")
         return redirect('bike_catalog')
 
@@ -111,45 +71,13 @@ def checkout_create_order(request):
         return redirect(f"{profile_url}?next={checkout_url}")
 
     try:
-        with transaction.atomic():
-            # 1. Cria o Pedido
-            order = Order.objects.create(
-                client=client,
-                status='QUOTE', 
-                coupon=cart.coupon, # Transfere o cupom do carrinho pro pedido
-                # O total será recalculado no update_total(), mas podemos salvar inicial
-                total_amount=0 
-            )
-
-            # 2. Transfere Itens do Carrinho -> Itens do Pedido
-            for cart_item in cart.items.all():
-                product = cart_item.product
-                qty = cart_item.quantity
-                
-                # Bloqueia produto no banco para evitar race condition
-                product_in_db = Product.objects.select_for_update().get(id=product.id)
-                
-                if product_in_db.stock_quantity < qty:
-                    raise ValueError(f"Desculpe, o produto {product.name} acabou de esgotar.")
-
-                # Cria o item do pedido (snapshot do preço acontece no save() do model)
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=qty,
-                    # unit_price será pego automaticamente do produto se omitido, 
-                    # mas podemos forçar se quisermos garantir
-                )
-            
-            # 3. Calcula total final do pedido
-            order.update_total()
-            
-            # 4. Limpa o carrinho (apaga itens e remove cupom)
-            cart.items.all().delete()
-            cart.coupon = None
-            cart.save()
-            
-            return redirect('process_payment', order_id=order.id)
+        # Pedido + itens + total em poucas queries, com os itens reservados por um prazo (ver checkout.py)
+        # O pedido sai do banco: grava o carrinho já, sem esperar o write-behind. Se o
+        # banco tinha outro carrinho (outro worker gravou), o preço é refeito dele
+        db_cart = cart.persist()
+        order = create_order_from_cart(db_cart, client, pricing=cart.priced())
+        cart.forget()
+        return redirect('process_payment', order_id=order.id)
 
     except ValueError as e:
         messages.error(request, str(e))
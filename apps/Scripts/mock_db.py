@@ -1,7 +1,7 @@
 
-from decimal import Decimal
-from django.utils.text import slugify
-from Assets.models import Product, Category, TechnicalSpec
+from Assets.cache import bump_catalog_version
+from Assets.importer import CatalogImporter
+from Assets.models import Category
 
 def run_seed():
     print("--- Iniciando Importação de Dados ---")
@@ -129,44 +129,25 @@ def run_seed():
         }
     ]
 
-    # 3. LOOP DE INSERÇÃO
-    for item in products_data:
-        # Cria ou Atualiza o Produto Base
-        product, created = Product.objects.get_or_create(
-            sku=item['sku'],
-            defaults={
-                'name': item['name'],
-                'category': item['category'],
-                'product_type': item['type'],
-                'selling_price': Decimal(item['price']),
-                'stock_quantity': item['stock'],
-                'description': item['desc'],
-                'ownership': 'SHOP', # É produto de venda
-                'is_active': True,
-                'condition': 'NEW'
-            }
-        )
-        
-        status = "Criado" if created else "Já existia"
-        print(f"🚴 {status}: {product.name}")
-
-        # Cria ou Atualiza a Ficha Técnica (Specs)
-        if 'specs' in item:
-            specs_data = item['specs']
-            
-            # Tenta pegar a spec existente ou cria uma nova
-            spec, spec_created = TechnicalSpec.objects.get_or_create(product=product)
-            
-            # Atualiza os campos
-            updated = False
-            for field, value in specs_data.items():
-                if getattr(spec, field) != value:
-                    setattr(spec, field, value)
-                    updated = True
-            
-            if updated or spec_created:
-                spec.save()
-                print(f"   └── Specs {'criadas' if spec_created else 'atualizadas'}")
+    # 3. IMPORTAÇÃO EM LOTE (upsert por SKU, ver Assets/importer.py)
+    stats = CatalogImporter().import_rows(
+        (line, {
+            'sku': item['sku'],
+            'name': item['name'],
+            'category': item['category'].slug,
+            'product_type': item['type'],
+            'selling_price': item['price'],
+            'stock_quantity': item['stock'],
+            'description': item['desc'],
+            'condition': 'NEW',
+            'specs': item.get('specs', {}),
+        })
+        for line, item in enumerate(products_data, start=1)
+    )
+    bump_catalog_version()
+    print(f"🚴 {stats.created} criados, {stats.updated} atualizados, {stats.unchanged} sem mudança.")
+    for line, message in stats.errors:
+        print(f"   ❌ item {line}: {message}")
 
     print("\n🎉 Processo finalizado com sucesso!")
 
@@ -18,6 +18,7 @@ from Orders.models import Order, OrderItem
 from Assets.models import Product, TechnicalSpec, Maintenance
 from Assets.forms import ProductForm, TechnicalSpecForm
 from Clients.models import Client
+from Common.pagination import CursorPaginator
 from .mixins import StaffRequiredMixin
 from .models import SiteConfiguration
 from .forms import SiteSettingsForm
@@ -96,6 +97,12 @@ class StaffOrderListView(StaffRequiredMixin, ListView):
     def get_queryset(self):
         return Order.objects.select_related('client__user').order_by('-created_at')
 
+    def paginate_queryset(self, queryset, page_size):
+        # Cursor em vez de OFFSET: a tabela de pedidos só cresce
+        paginator = CursorPaginator(queryset, page_size, ['-created_at'], count_mode='estimated')
+        page = paginator.get_page(self.request.GET.get('cursor'))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
 class StaffOrderDetailView(StaffRequiredMixin, DetailView):
     model = Order
     template_name = 'staff/order_detail.html'
@@ -5,6 +5,12 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+O status do pagamento em tempo real (billing/pagamento/<id>/status/, ver
+Billing/status.py) precisa de um servidor ASGI para segurar as conexões
+abertas — por exemplo, `uvicorn core.asgi:application` ou gunicorn com um
+worker uvicorn. Sob WSGI (core.wsgi) o endpoint cai para reconexões
+periódicas do navegador.
 """
 
 import os
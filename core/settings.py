@@ -8,6 +8,25 @@ from django.urls import reverse_lazy
 
 STRIPE_SK = config('STRIPE_SK')
 STRIPE_WH = config('STRIPE_WH')
+# Aponta o cliente stripe para outro servidor (ex.: o Stripe de mentira, comando fake_stripe)
+STRIPE_API_BASE = config('STRIPE_API_BASE', default='https://api.stripe.com')
+# Cliente do Stripe (Billing/gateway.py): timeouts em segundos, retentativas e disjuntor
+STRIPE_CONNECT_TIMEOUT = config('STRIPE_CONNECT_TIMEOUT', default=3.0, cast=float)
+STRIPE_READ_TIMEOUT = config('STRIPE_READ_TIMEOUT', default=10.0, cast=float)
+STRIPE_DEADLINE = config('STRIPE_DEADLINE', default=15.0, cast=float)
+STRIPE_MAX_RETRIES = config('STRIPE_MAX_RETRIES', default=2, cast=int)
+STRIPE_POOL_SIZE = config('STRIPE_POOL_SIZE', default=10, cast=int)
+STRIPE_BREAKER_THRESHOLD = config('STRIPE_BREAKER_THRESHOLD', default=5, cast=int)
+STRIPE_BREAKER_WINDOW = config('STRIPE_BREAKER_WINDOW', default=60, cast=int)
+STRIPE_BREAKER_COOLDOWN = config('STRIPE_BREAKER_COOLDOWN', default=30, cast=int)
+# Webhooks do Stripe: tentativas do worker antes de o evento ficar FAILED (Billing/inbox.py)
+STRIPE_EVENT_MAX_ATTEMPTS = config('STRIPE_EVENT_MAX_ATTEMPTS', default=8, cast=int)
+# Status do pagamento em SSE (Billing/status.py): intervalo do poller compartilhado e
+# duração máxima de cada conexão (o navegador reconecta sozinho), em segundos
+PAYMENT_STATUS_POLL_INTERVAL = config('PAYMENT_STATUS_POLL_INTERVAL', default=1.0, cast=float)
+PAYMENT_STATUS_STREAM_TIMEOUT = config('PAYMENT_STATUS_STREAM_TIMEOUT', default=55, cast=int)
+# Numeração das faturas (Billing/numbering.py): números reservados de uma vez por processo
+INVOICE_NUMBER_BLOCK = config('INVOICE_NUMBER_BLOCK', default=50, cast=int)
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -70,6 +89,7 @@ MIDDLEWARE = [
     'core.middleware.MaintenanceModeMiddleware',
     'Staff.middleware.MaintenanceModeMiddleware',
     'Staff.middleware.OneSessionPerUserMiddleware',
+    'Orders.middleware.CartCookieMiddleware',
 ]
 
 ROOT_URLCONF = "core.urls"
@@ -243,10 +263,62 @@ UNFOLD= {
 
 LOGOUT_REDIRECT_URL = 'home'
 LOGIN_REDIRECT_URL = 'client_dashboard'
-CART_SESSION_ID = 'cart'
+
+# Carrinho no cache com gravação no banco depois (Orders/cart.py):
+# mudanças dentro da janela viram uma escrita só; 0 grava no próprio request
+CART_WRITE_BEHIND_SECONDS = config('CART_WRITE_BEHIND_SECONDS', default=2, cast=float)
+CART_CACHE_TIMEOUT = config('CART_CACHE_TIMEOUT', default=86400, cast=int)
+# Carrinho do visitante: cookie assinado, sem sessão nem linha no banco
+CART_COOKIE_NAME = config('CART_COOKIE_NAME', default='cart')
+CART_COOKIE_MAX_AGE = config('CART_COOKIE_MAX_AGE', default=30 * 86400, cast=int)
+# Carrinho de cliente parado há mais que isso é apagado pelo purge_stale_carts
+CART_ABANDONED_DAYS = config('CART_ABANDONED_DAYS', default=30, cast=int)
+
+# Busca do catálogo: 'auto' (FTS5/tsvector se disponível), 'fts' ou 'icontains'
+CATALOG_SEARCH_BACKEND = config('CATALOG_SEARCH_BACKEND', default='auto')
+
+# Cache compartilhado entre workers (Redis/Memcached/DB em produção).
+# O cache do catálogo e o controle de sessão única dependem dele.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='eletricbike'),
+    }
+}
+
+# Fragmentos HTMX do catálogo (invalidados por versão, ver Assets/cache.py)
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=600, cast=int)
+
+# Thumbnails/WebP das fotos (Assets/images.py): threads em background após o commit.
+# IMAGE_DERIVATIVES_SYNC=True gera dentro do próprio request (útil em testes).
+IMAGE_DERIVATIVE_THREADS = config('IMAGE_DERIVATIVE_THREADS', default=2, cast=int)
+IMAGE_DERIVATIVES_SYNC = config('IMAGE_DERIVATIVES_SYNC', default=False, cast=bool)
+
+# Prazo das reservas de estoque do checkout (Orders/reservations.py);
+# as vencidas são soltas pelo comando release_expired_reservations. A sessão
+# do Stripe vence junto com a reserva, e o Stripe exige no mínimo 30 minutos
+STOCK_RESERVATION_MINUTES = config('STOCK_RESERVATION_MINUTES', default=30, cast=int)
+
+# Totais do pedido ajustados a cada OrderItem salvo/apagado (Orders/totals.py).
+# False só para cargas em massa, seguidas de recompute_order_totals.
+ORDER_TOTALS_INCREMENTAL = config('ORDER_TOTALS_INCREMENTAL', default=True, cast=bool)
+
+# Total das listas paginadas por cursor: 'exact', 'cached' ou 'estimated'
+PAGINATION_COUNT_MODE = config('PAGINATION_COUNT_MODE', default='cached')
 
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 CSRF_TRUSTED_ORIGINS = ['https://ik4kukb02n.onrender.com']
 
 EMAIL_BACKEND = config('EMAIL_BACKEND')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL')
+EMAIL_HOST = config('EMAIL_HOST', default='localhost')
+EMAIL_PORT = config('EMAIL_PORT', default=25, cast=int)
+EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=False, cast=bool)
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=30, cast=int)
+
+# E-mails transacionais saem pela outbox (Orders/outbox.py), enviados pelo
+# comando send_outbox_emails; depois de N tentativas a mensagem fica FAILED.
+# Em dev: python manage.py fake_smtp + EMAIL_PORT=1025.
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=5, cast=int)